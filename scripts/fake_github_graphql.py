@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+GraphQL endpoint for fake_github_server.py
+
+Parses and executes the subset of GraphQL the issue scripts send:
+queries and mutations with variables, aliases, nested selections and the
+@include/@skip directives (no fragments), against a resolver tree. schema() builds that
+tree over a FakeGitHub: repository lookups with label, milestone and issue
+connections, the viewer, rateLimit and the createIssue mutation. Errors
+follow GitHub's shape: a failing field resolves to null and adds an entry
+with its path to the response's errors.
+"""
+
+import re
+
+_TOKEN = re.compile(r'''
+    (?P<skip>[\s,]+|\#[^\n]*)
+  | (?P<punct>\.\.\.|[!$():=@\[\]{}|])
+  | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"\\\n]|\\.)*")
+''', re.VERBOSE)
+
+# Largest page a connection returns, as on GitHub
+MAX_FIRST = 100
+
+
+class GraphQLError(Exception):
+    """A query that cannot be parsed or a field that cannot be resolved"""
+
+
+class Field:
+    __slots__ = ("alias", "name", "arguments", "selections", "directives")
+
+    def __init__(self, alias, name, arguments, selections, directives=()):
+        self.alias = alias
+        self.name = name
+        self.arguments = arguments
+        self.selections = selections
+        self.directives = directives
+
+
+class Variable:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+
+def tokenize(source: str) -> list:
+    tokens = []
+    position = 0
+    while position < len(source):
+        match = _TOKEN.match(source, position)
+        if match is None:
+            raise GraphQLError(f"Unexpected character {source[position]!r} at {position}")
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+        value = match.group()
+        if kind == "string":
+            value = value[1:-1].encode().decode("unicode_escape")
+        tokens.append((kind, value))
+    tokens.append(("end", None))
+    return tokens
+
+
+class Parser:
+    """Recursive-descent parser for one operation"""
+
+    def __init__(self, source: str):
+        self.tokens = tokenize(source)
+        self.index = 0
+
+    def peek(self, value=None) -> bool:
+        kind, token = self.tokens[self.index]
+        return token == value if value is not None else kind != "end"
+
+    def take(self, value=None):
+        kind, token = self.tokens[self.index]
+        if value is not None and token != value:
+            raise GraphQLError(f"Expected {value!r}, found {token!r}")
+        self.index += 1
+        return kind, token
+
+    def operation(self) -> tuple:
+        """(operation type, variable defaults, selections)"""
+        operation = "query"
+        defaults = {}
+        if not self.peek("{"):
+            operation = self.take()[1]
+            if operation not in ("query", "mutation"):
+                raise GraphQLError(f"Unsupported operation {operation!r}")
+            if not self.peek("(") and not self.peek("{"):
+                self.take()
+            if self.peek("("):
+                defaults = self.variable_definitions()
+        selections = self.selection_set()
+        if self.peek():
+            raise GraphQLError("Only one operation per document is supported")
+        return operation, defaults, selections
+
+    def variable_definitions(self) -> dict:
+        defaults = {}
+        self.take("(")
+        while not self.peek(")"):
+            self.take("$")
+            name = self.take()[1]
+            self.take(":")
+            # Types are not checked; skip to the default or the next variable
+            while not (self.peek("$") or self.peek(")") or self.peek("=")):
+                self.take()
+            if self.peek("="):
+                self.take("=")
+                defaults[name] = self.value()
+        self.take(")")
+        return defaults
+
+    def selection_set(self) -> list:
+        self.take("{")
+        selections = []
+        while not self.peek("}"):
+            kind, name = self.take()
+            if kind != "name":
+                raise GraphQLError(f"Expected a field name, found {name!r}")
+            alias = name
+            if self.peek(":"):
+                self.take(":")
+                name = self.take()[1]
+            arguments = self.arguments()
+            directives = []
+            while self.peek("@"):
+                self.take("@")
+                directives.append((self.take()[1], self.arguments()))
+            children = self.selection_set() if self.peek("{") else None
+            selections.append(Field(alias, name, arguments, children, directives))
+        self.take("}")
+        return selections
+
+    def arguments(self) -> dict:
+        arguments = {}
+        if self.peek("("):
+            self.take("(")
+            while not self.peek(")"):
+                argument = self.take()[1]
+                self.take(":")
+                arguments[argument] = self.value()
+            self.take(")")
+        return arguments
+
+    def value(self):
+        kind, token = self.take()
+        if token == "$":
+            return Variable(self.take()[1])
+        if kind == "number":
+            return float(token) if any(c in token for c in ".eE") else int(token)
+        if kind == "string":
+            return token
+        if token == "[":
+            values = []
+            while not self.peek("]"):
+                values.append(self.value())
+            self.take("]")
+            return values
+        if token == "{":
+            values = {}
+            while not self.peek("}"):
+                key = self.take()[1]
+                self.take(":")
+                values[key] = self.value()
+            self.take("}")
+            return values
+        if kind == "name":
+            return {"true": True, "false": False, "null": None}.get(token, token)
+        raise GraphQLError(f"Unexpected {token!r}")
+
+
+def _substitute(value, variables: dict):
+    if isinstance(value, Variable):
+        return variables.get(value.name)
+    if isinstance(value, list):
+        return [_substitute(item, variables) for item in value]
+    if isinstance(value, dict):
+        return {key: _substitute(item, variables) for key, item in value.items()}
+    return value
+
+
+def execute(source: str, variables: dict, query_root: dict, mutation_root: dict) -> dict:
+    """Run one GraphQL document; returns the response body"""
+    try:
+        operation, defaults, selections = Parser(source).operation()
+    except GraphQLError as e:
+        return {"errors": [{"message": str(e)}]}
+    variables = {**defaults, **(variables or {})}
+    root = mutation_root if operation == "mutation" else query_root
+    errors = []
+    data = _select(root, selections, variables, [], errors)
+    body = {"data": data}
+    if errors:
+        body["errors"] = errors
+    return body
+
+
+def _select(obj, selections: list, variables: dict, path: list, errors: list) -> dict:
+    result = {}
+    for field in selections:
+        if not _included(field, variables):
+            continue
+        field_path = path + [field.alias]
+        try:
+            value = _resolve(obj, field, _substitute(field.arguments, variables))
+        except GraphQLError as e:
+            errors.append({"message": str(e), "path": field_path})
+            result[field.alias] = None
+            continue
+        result[field.alias] = _complete(value, field, variables, field_path, errors)
+    return result
+
+
+def _included(field: Field, variables: dict) -> bool:
+    for name, arguments in field.directives:
+        condition = _substitute(arguments.get("if"), variables)
+        if name == "include" and not condition or name == "skip" and condition:
+            return False
+    return True
+
+
+def _resolve(obj, field: Field, arguments: dict):
+    if field.name == "__typename":
+        return obj.get("__typename")
+    if field.name not in obj:
+        raise GraphQLError(f"Field '{field.name}' doesn't exist on type "
+                           f"'{obj.get('__typename', 'Query')}'")
+    value = obj[field.name]
+    if callable(value):
+        try:
+            return value(**arguments)
+        except TypeError as e:
+            raise GraphQLError(f"Invalid arguments for field '{field.name}': {e}") from e
+    return value
+
+
+def _complete(value, field: Field, variables: dict, path: list, errors: list):
+    if field.selections is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [_select(item, field.selections, variables, path + [index], errors)
+                for index, item in enumerate(value)]
+    return _select(value, field.selections, variables, path, errors)
+
+
+def connection(items: list, first: int = None, after: str = None, **_) -> dict:
+    """A cursor connection over items; cursors are list offsets"""
+    if first is None:
+        raise GraphQLError("You must provide a `first` or `last` value to properly "
+                           "paginate the connection.")
+    if first > MAX_FIRST:
+        raise GraphQLError(f"Requesting {first} records on the connection exceeds the "
+                           f"`first` limit of {MAX_FIRST} records.")
+    start = int(after) + 1 if after is not None else 0
+    page = items[start:start + first]
+    end = start + len(page) - 1
+    return {
+        "__typename": "Connection",
+        "nodes": page,
+        "totalCount": len(items),
+        "pageInfo": {"hasNextPage": end + 1 < len(items),
+                     "endCursor": str(end) if page else None},
+    }
+
+
+def schema(github) -> tuple:
+    """(query root, mutation root) resolving against a FakeGitHub"""
+
+    def label(label: dict) -> dict:
+        return {"__typename": "Label", "id": label["node_id"], "name": label["name"],
+                "color": label["color"], "description": label["description"]}
+
+    def milestone(milestone: dict) -> dict:
+        if milestone is None:
+            return None
+        return {"__typename": "Milestone", "id": milestone["node_id"],
+                "number": milestone["number"], "title": milestone["title"],
+                "state": milestone["state"].upper()}
+
+    def issue(issue: dict) -> dict:
+        return {
+            "__typename": "Issue", "id": issue["node_id"], "number": issue["number"],
+            "title": issue["title"], "body": issue["body"] or "",
+            "state": issue["state"].upper(), "url": issue["html_url"],
+            "createdAt": issue["created_at"], "updatedAt": issue["updated_at"],
+            "labels": lambda **page: connection([label(item) for item in issue["labels"]],
+                                                **page),
+            "milestone": milestone(issue["milestone"]),
+        }
+
+    def milestones(states=None, **page) -> dict:
+        return connection([milestone(item) for item in github.milestones.values()
+                           if states is None or item["state"].upper() in states], **page)
+
+    def issues(states=None, filterBy=None, **page) -> dict:
+        filter_by = filterBy or {}
+        selected = []
+        for item in github.issues:
+            if states is not None and item["state"].upper() not in states:
+                continue
+            names = {entry["name"] for entry in item["labels"]}
+            if filter_by.get("labels") and not names & set(filter_by["labels"]):
+                continue
+            if filter_by.get("since") and item["updated_at"] < filter_by["since"]:
+                continue
+            selected.append(issue(item))
+        return connection(selected, **page)
+
+    repository = {
+        "__typename": "Repository", "id": "R_1", "name": github.repo,
+        "nameWithOwner": f"{github.owner}/{github.repo}",
+        "labels": lambda **page: connection([label(item) for item in github.labels.values()],
+                                            **page),
+        "milestones": milestones,
+        "issues": issues,
+    }
+
+    def find_repository(owner: str, name: str) -> dict:
+        if (owner, name) != (github.owner, github.repo):
+            raise GraphQLError(f"Could not resolve to a Repository with the name "
+                               f"'{owner}/{name}'.")
+        return repository
+
+    def create_issue(input: dict) -> dict:
+        if input.get("repositoryId") != repository["id"]:
+            raise GraphQLError(f"Could not resolve to a node with the global id of "
+                               f"'{input.get('repositoryId')}'")
+        if not input.get("title"):
+            raise GraphQLError("Title can't be blank")
+        labels = {item["node_id"]: item["name"] for item in github.labels.values()}
+        milestones_by_id = {item["node_id"]: number
+                            for number, item in github.milestones.items()}
+        for node_id in input.get("labelIds") or []:
+            if node_id not in labels:
+                raise GraphQLError(f"Could not resolve to a node with the global id of "
+                                   f"'{node_id}'")
+        milestone_id = input.get("milestoneId")
+        if milestone_id is not None and milestone_id not in milestones_by_id:
+            raise GraphQLError(f"Could not resolve to a node with the global id of "
+                               f"'{milestone_id}'")
+        created = github.add_issue(input["title"], input.get("body"),
+                                   [labels[node_id] for node_id in input.get("labelIds") or []],
+                                   milestones_by_id.get(milestone_id))
+        return {"__typename": "CreateIssuePayload", "issue": issue(created)}
+
+    query_root = {
+        "__typename": "Query",
+        "repository": find_repository,
+        "viewer": {"__typename": "User", "login": github.owner},
+        "rateLimit": lambda **_: {"__typename": "RateLimit", "cost": 1,
+                                  "limit": github.rate_limit,
+                                  "remaining": github.rate_limit - github.used,
+                                  "used": github.used},
+    }
+    mutation_root = {"__typename": "Mutation", "createIssue": create_issue}
+    return query_root, mutation_root
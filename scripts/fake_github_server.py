@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the GitHub REST API the issue scripts use
+
+Keeps one repository's issues, labels and milestones in memory and serves
+them over HTTP with GitHub's pagination (per_page/page and Link headers),
+so generate_all_issues.py can run offline:
+
+    python3 fake_github_server.py --port 8765 --milestone "Gap Analysis Complete"
+    GITHUB_TOKEN=x GITHUB_API_URL=http://127.0.0.1:8765 python3 generate_all_issues.py
+
+POST /graphql runs GraphQL queries and mutations against the same data
+(see fake_github_graphql.py). Listings and single resources carry ETags and answer If-None-Match with
+304 Not Modified, which like on GitHub costs nothing against the rate
+limit. Any token is accepted. Every response carries X-RateLimit-* headers for
+a primary request budget per window; once it is spent requests get 403
+until the window resets. Optionally writes are held to a secondary limit
+(403 with Retry-After) and a share of requests fail with 502, to exercise
+a client's pacing and retries, and responses can be delayed to model
+network latency. FakeGitHub.traffic counts the calls, writes, listing
+pages and bytes served, for measuring a client's API cost. Use FakeGitHub
+as a context manager to run it on a background thread from a script.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+import fake_github_graphql
+
+DEFAULT_OWNER = "saasx"
+DEFAULT_REPO = "saasx-soc2-certification"
+DEFAULT_PER_PAGE = 30
+MAX_PER_PAGE = 100
+
+# GitHub's budget for authenticated REST requests, per hour
+RATE_LIMIT = 5000
+RATE_WINDOW = 3600
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeGitHub:
+    """In-memory repository plus the HTTP server that exposes it"""
+
+    def __init__(self, owner: str = DEFAULT_OWNER, repo: str = DEFAULT_REPO,
+                 milestones=(), host: str = "127.0.0.1", port: int = 0,
+                 rate_limit: int = RATE_LIMIT, rate_window: float = RATE_WINDOW,
+                 write_limit: int = None, write_window: float = 60,
+                 error_rate: float = 0.0, seed: int = None, latency: float = 0.0):
+        self.owner = owner
+        self.repo = repo
+        self.issues = []
+        self.labels = {}
+        self.milestones = {}
+        self.lock = threading.Lock()
+        self._next_id = 1
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.write_limit = write_limit
+        self.write_window = write_window
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.used = 0
+        self.reset = time.time() + rate_window
+        self.writes = []
+        self.latency = latency
+        self.traffic = Counter()
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.github = self
+        self._thread = None
+        for title in milestones:
+            self.add_milestone(title)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def reset_traffic(self) -> Counter:
+        """Start counting traffic afresh; returns the counts so far"""
+        with self.lock:
+            traffic, self.traffic = self.traffic, Counter()
+        return traffic
+
+    def delay(self):
+        """Sleep for one response's latency, jittered by half either way"""
+        if self.latency:
+            time.sleep(self.latency * self.random.uniform(0.5, 1.5))
+
+    def _id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def rate_headers(self) -> dict:
+        return {"X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(max(0, self.rate_limit - self.used)),
+                "X-RateLimit-Reset": str(math.ceil(self.reset)),
+                "X-RateLimit-Used": str(self.used),
+                "X-RateLimit-Resource": "core"}
+
+    def admit(self, method: str):
+        """Count a request against the limits; (status, message, headers)
+        of the rejection, or None if it may proceed"""
+        now = time.time()
+        if now >= self.reset:
+            self.used = 0
+            self.reset = now + self.rate_window
+        if self.used >= self.rate_limit:
+            return 403, "API rate limit exceeded", {}
+        self.used += 1
+        if method != "GET" and self.write_limit is not None:
+            self.writes = [at for at in self.writes if at > now - self.write_window]
+            if len(self.writes) >= self.write_limit:
+                retry_after = math.ceil(self.writes[0] + self.write_window - now)
+                return 403, "You have exceeded a secondary rate limit", \
+                    {"Retry-After": str(max(1, retry_after))}
+            self.writes.append(now)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return 502, "Server Error", {}
+        return None
+
+    # Resources, shaped like the REST API's
+
+    def repo_url(self, path: str = "") -> str:
+        return f"{self.url}/repos/{self.owner}/{self.repo}{path}"
+
+    def add_label(self, name: str) -> dict:
+        label = self.labels.get(name)
+        if label is None:
+            label = self.labels[name] = {
+                "id": self._id(), "node_id": f"LA_{name}", "name": name,
+                "color": "ededed", "description": None, "default": False,
+                "url": self.repo_url(f"/labels/{name}"),
+            }
+        return label
+
+    def add_milestone(self, title: str, description: str = None) -> dict:
+        number = len(self.milestones) + 1
+        milestone = self.milestones[number] = {
+            "id": self._id(), "node_id": f"MI_{number}", "number": number,
+            "title": title, "description": description, "state": "open",
+            "open_issues": 0, "closed_issues": 0, "created_at": _now(),
+            "updated_at": _now(), "url": self.repo_url(f"/milestones/{number}"),
+        }
+        return milestone
+
+    def add_issue(self, title: str, body: str = None, labels=(), milestone: int = None,
+                  created_at: str = None) -> dict:
+        number = len(self.issues) + 1
+        now = created_at or _now()
+        issue = {
+            "id": self._id(), "node_id": f"I_{number}", "number": number,
+            "title": title, "body": body, "state": "open",
+            "labels": [self.add_label(name) for name in labels],
+            "milestone": self.milestones.get(milestone),
+            "user": {"login": self.owner, "id": 1},
+            "comments": 0, "created_at": now, "updated_at": now, "closed_at": None,
+            "url": self.repo_url(f"/issues/{number}"),
+            "html_url": f"https://github.com/{self.owner}/{self.repo}/issues/{number}",
+        }
+        self.issues.append(issue)
+        return issue
+
+    def user(self) -> dict:
+        return {"login": self.owner, "id": 1, "type": "User",
+                "url": f"{self.url}/users/{self.owner}"}
+
+    def repository(self) -> dict:
+        return {"id": 1, "node_id": "R_1", "name": self.repo,
+                "full_name": f"{self.owner}/{self.repo}", "owner": self.user(),
+                "private": True, "has_issues": True, "url": self.repo_url(),
+                "html_url": f"https://github.com/{self.owner}/{self.repo}"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.wfile = _MeteredWriter(self.wfile, self.server.github)
+
+    @property
+    def github(self) -> FakeGitHub:
+        return self.server.github
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        github = self.github
+        repo_path = f"/repos/{github.owner}/{github.repo}"
+        path = url.path.rstrip("/")
+        # Network latency, outside the lock so concurrent requests overlap
+        github.delay()
+        with github.lock:
+            # GraphQL queries are reads; only mutations count as writes
+            graphql = method == "POST" and path == "/graphql"
+            mutation = graphql and body.get("query", "").lstrip().startswith("mutation")
+            github.traffic["calls"] += 1
+            github.traffic["bytes_in"] += len(self.raw_requestline) + \
+                len(self.headers.as_bytes()) + length
+            if method != "GET" and not graphql or mutation:
+                github.traffic["writes"] += 1
+            elif graphql:
+                # A query reads a page of each connection it selects
+                github.traffic["pages"] += 1
+            rejected = github.admit("GET" if graphql and not mutation else method)
+            if rejected is not None:
+                status, message, headers = rejected
+                return self._send(status, {"message": message}, headers)
+            if graphql:
+                return self._send(200, fake_github_graphql.execute(
+                    body.get("query", ""), body.get("variables"),
+                    *fake_github_graphql.schema(github)))
+            if method == "GET" and path == "/user":
+                return self._send(200, github.user())
+            if not path.startswith(repo_path):
+                return self._send(404, {"message": "Not Found"})
+            path = path[len(repo_path):]
+            if method == "GET" and path == "":
+                return self._send(200, github.repository())
+            if path == "/issues":
+                if method == "POST":
+                    return self._create_issue(body)
+                return self._page(self._issues(query), query)
+            if path == "/milestones":
+                if method == "POST":
+                    if not body.get("title") or any(milestone["title"] == body["title"]
+                                                    for milestone in github.milestones.values()):
+                        return self._send(422, {"message": "Validation Failed"})
+                    return self._send(201, github.add_milestone(body["title"],
+                                                                body.get("description")))
+                state = query.get("state", "open")
+                return self._page([milestone for milestone in github.milestones.values()
+                                   if state == "all" or milestone["state"] == state], query)
+            if path == "/labels":
+                if method == "POST":
+                    name = body.get("name", "")
+                    if not name or name.lower() in {label.lower() for label in github.labels}:
+                        return self._send(422, {"message": "Validation Failed"})
+                    label = github.add_label(name)
+                    label["color"] = body.get("color", label["color"])
+                    return self._send(201, label)
+                return self._page(list(github.labels.values()), query)
+            match = re.fullmatch(r"/issues/(\d+)(/labels)?(?:/([^/]+))?", path)
+            if match:
+                number = int(match.group(1))
+                if not 1 <= number <= len(github.issues):
+                    return self._send(404, {"message": "Not Found"})
+                issue = github.issues[number - 1]
+                if not match.group(2):
+                    if method == "GET":
+                        return self._send(200, issue)
+                    if method == "PATCH":
+                        return self._update_issue(issue, body)
+                elif method == "POST" and not match.group(3):
+                    names = {label["name"] for label in issue["labels"]}
+                    issue["labels"] += [github.add_label(name) for name in body.get("labels", [])
+                                        if name not in names]
+                    issue["updated_at"] = _now()
+                    return self._send(200, issue["labels"])
+                elif method == "DELETE" and match.group(3):
+                    name = unquote(match.group(3))
+                    labels = [label for label in issue["labels"] if label["name"] != name]
+                    if len(labels) == len(issue["labels"]):
+                        return self._send(404, {"message": "Label does not exist"})
+                    issue["labels"] = labels
+                    issue["updated_at"] = _now()
+                    return self._send(200, labels)
+            self._send(404, {"message": "Not Found"})
+
+    def _issues(self, query: dict) -> list:
+        state = query.get("state", "open")
+        labels = set(filter(None, query.get("labels", "").split(",")))
+        since = query.get("since")
+        issues = []
+        for issue in self.github.issues:
+            if state != "all" and issue["state"] != state:
+                continue
+            if labels - {label["name"] for label in issue["labels"]}:
+                continue
+            if since and issue["updated_at"] < since:
+                continue
+            issues.append(issue)
+        # Newest first by default, as on GitHub
+        key = "updated_at" if query.get("sort") == "updated" else "number"
+        return sorted(issues, key=lambda issue: (issue[key], issue["number"]),
+                      reverse=query.get("direction", "desc") == "desc")
+
+    def _create_issue(self, body: dict):
+        if not body.get("title"):
+            return self._send(422, {"message": "Validation Failed"})
+        milestone = body.get("milestone")
+        if milestone is not None and milestone not in self.github.milestones:
+            return self._send(422, {"message": "Validation Failed"})
+        issue = self.github.add_issue(body["title"], body.get("body"),
+                                      body.get("labels", []), milestone)
+        return self._send(201, issue)
+
+    def _update_issue(self, issue: dict, body: dict):
+        milestone = body.get("milestone")
+        if milestone is not None and milestone not in self.github.milestones:
+            return self._send(422, {"message": "Validation Failed"})
+        for key in ("title", "body", "state"):
+            if key in body:
+                issue[key] = body[key]
+        if "milestone" in body:
+            issue["milestone"] = self.github.milestones.get(milestone)
+        if "labels" in body:
+            issue["labels"] = [self.github.add_label(name) for name in body["labels"]]
+        issue["updated_at"] = _now()
+        return self._send(200, issue)
+
+    def _page(self, items: list, query: dict):
+        per_page = min(int(query.get("per_page", DEFAULT_PER_PAGE)), MAX_PER_PAGE)
+        page = int(query.get("page", 1))
+        last = max(1, -(-len(items) // per_page))
+        links = []
+        base = f"{self.github.url}{urlsplit(self.path).path}"
+        for rel, number in (("next", page + 1), ("last", last)):
+            if page < last:
+                links.append(f'<{base}?{urlencode({**query, "page": number})}>; rel="{rel}"')
+        headers = {"Link": ", ".join(links)} if links else {}
+        self.github.traffic["pages"] += 1
+        return self._send(200, items[(page - 1) * per_page:page * per_page], headers)
+
+    def _send(self, status: int, payload, headers: dict = None):
+        data = json.dumps(payload).encode()
+        if self.command == "GET" and status == 200:
+            etag = f'W/"{hashlib.sha1(data).hexdigest()}"'
+            headers = {**(headers or {}), "ETag": etag}
+            if self.headers.get("If-None-Match") == etag:
+                # Conditional requests that match are free
+                self.github.used -= 1
+                status, data = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in {**self.github.rate_headers(), **(headers or {})}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _MeteredWriter:
+    """Response stream that adds the bytes written to FakeGitHub.traffic
+
+    Responses are written under FakeGitHub.lock, so the count needs no lock
+    of its own.
+    """
+
+    def __init__(self, file, github: FakeGitHub):
+        self.file = file
+        self.github = github
+
+    def write(self, data) -> int:
+        self.github.traffic["bytes_out"] += len(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake GitHub REST API for one repository")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--owner", default=DEFAULT_OWNER)
+    parser.add_argument("--repo", default=DEFAULT_REPO)
+    parser.add_argument("--milestone", action="append", default=[],
+                        help="milestone to create up front (repeatable)")
+    parser.add_argument("--rate-limit", type=int, default=RATE_LIMIT,
+                        help="requests allowed per rate-limit window")
+    parser.add_argument("--rate-window", type=float, default=RATE_WINDOW,
+                        help="rate-limit window in seconds")
+    parser.add_argument("--write-limit", type=int,
+                        help="writes allowed per --write-window before a secondary limit")
+    parser.add_argument("--write-window", type=float, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of requests that fail with 502")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="mean delay of each response in milliseconds")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    github = FakeGitHub(args.owner, args.repo, args.milestone, args.host, args.port,
+                        args.rate_limit, args.rate_window, args.write_limit,
+                        args.write_window, args.error_rate, args.seed, args.latency / 1000)
+    print(f"Serving {args.owner}/{args.repo} at {github.url}")
+    try:
+        github.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        github.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,45 @@
 #!/usr/bin/env python3
 """
 Generate all SOC 2 project issues from templates
+
+With --dry-run nothing is sent to GitHub: every sync strategy runs against
+a local fake GitHub (fake_github_server.py) and the API calls, pages,
+bytes and wall time each one costs are reported.
 """
 
+import argparse
+import asyncio
+import copy
+import json
 import os
-from github import Github
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+from github import Auth, Github, GithubException, RateLimitExceededException
+from requests.structures import CaseInsensitiveDict
 from rich.console import Console
 from rich.progress import track
+from rich.table import Table
+
+from issue_graphql import DEFAULT_BATCH_SIZE
+from issue_state import DEFAULT_STATE_FILE
+from issue_sync import DEFAULT_CONCURRENCY, PER_PAGE, api_url_from_env, label_color, sync_issues
+from request_scheduler import RateLimiter
 
 console = Console()
 
+# Strategies compared by --dry-run: (name, engine, name of the strategy
+# whose fake repository and state file it continues from)
+DRY_RUN_STRATEGIES = (
+    ("pygithub", "pygithub", None),
+    ("async", "async", None),
+    ("graphql", "graphql", None),
+    ("async rerun", "async", "async"),
+)
+
 # All issues to create
 ISSUES = [
     # Phase 1: Gap Analysis
@@ -649,57 +679,318 @@ Develop business continuity and disaster recovery plan
 ]
 
 
-def main():
-    token = os.environ.get("GITHUB_TOKEN")
-    if not token:
-        console.print("[red]Error: GITHUB_TOKEN not set[/red]")
-        return
+def existing_issue_index(repo, label: str = None, since: datetime = None) -> dict:
+    """Title -> issue for the repository's issues, listed once
+
+    label and since narrow the listing to issues carrying that label or
+    updated since that time; issues outside the filter are not indexed and
+    would be created again, so only use them when they cover every issue
+    this script manages.
+    """
+    kwargs = {"state": "all"}
+    if label:
+        kwargs["labels"] = [label]
+    if since:
+        kwargs["since"] = since
+    index = {}
+    for issue in repo.get_issues(**kwargs):
+        index.setdefault(issue.title, issue)
+    return index
+
+
+def with_retries(limiter: RateLimiter, method: str, call, idempotent: bool = None):
+    """Run a PyGithub call, retrying it when and as often as limiter allows
     
-    gh = Github(token)
-    user = gh.get_user()
+    A RateLimitExceededException is always a rate limit. Other 403 and 429
+    responses are retried only if they look like one, and server errors
+    only for idempotent calls, so a create is never repeated blindly.
+    """
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except RateLimitExceededException as e:
+            message = "rate limit exceeded"
+            error = e
+        except GithubException as e:
+            message = e.data.get("message", "") if isinstance(e.data, dict) else str(e.data)
+            error = e
+        delay = limiter.retry_delay(method, error.status, CaseInsensitiveDict(error.headers or {}),
+                                    message, attempt, idempotent)
+        if delay is None:
+            raise error
+        attempt += 1
+        limiter.retries += 1
+        limiter.waited += delay
+        time.sleep(delay)
+
+
+def provision_with_pygithub(repo, limiter: RateLimiter) -> dict:
+    """Create the labels and milestones ISSUES uses that repo lacks, after
+    listing each once; returns title -> milestone"""
+    labels = with_retries(limiter, "GET",
+                          lambda: {label.name.lower() for label in repo.get_labels()})
+    milestones = with_retries(limiter, "GET",
+                              lambda: {m.title: m for m in repo.get_milestones(state="all")})
+    for name in dict.fromkeys(name for issue_data in ISSUES for name in issue_data["labels"]):
+        if name.lower() not in labels:
+            try:
+                # A repeat after a create that went through gets a 422
+                with_retries(limiter, "POST", lambda: repo.create_label(name, label_color(name)),
+                             idempotent=True)
+            except GithubException as e:
+                if e.status != 422:
+                    raise
+            console.print(f"[green]Created label {name}[/green]")
+    for title in dict.fromkeys(issue_data["milestone"] for issue_data in ISSUES):
+        if title not in milestones:
+            try:
+                # Milestone titles are unique, so a repeat cannot duplicate one
+                milestones[title] = with_retries(limiter, "POST",
+                                                 lambda: repo.create_milestone(title),
+                                                 idempotent=True)
+            except GithubException as e:
+                if e.status != 422:
+                    raise
+                milestones.update(with_retries(
+                    limiter, "GET",
+                    lambda: {m.title: m for m in repo.get_milestones(state="all")}))
+                if title not in milestones:
+                    raise
+            console.print(f"[green]Created milestone {title}[/green]")
+    return milestones
+
+
+def sync_with_pygithub(args, token: str, repo_name: str):
+    """Create the issues one at a time through PyGithub
     
-    # Get repository
-    repo_name = input("Enter repository name [saasx-soc2-certification]: ") or "saasx-soc2-certification"
+    Rate limits and server errors are retried as the async engine's
+    RateLimiter decides, rather than by PyGithub's own retry policy.
+    """
+    limiter = RateLimiter(reserve=args.reserve, max_retries=args.max_retries)
+    gh = Github(auth=Auth.Token(token), base_url=args.api_url, per_page=PER_PAGE, retry=None)
+    user = gh.get_user()
     
     try:
-        repo = user.get_repo(repo_name)
+        repo = with_retries(limiter, "GET", lambda: user.get_repo(repo_name))
     except:
         console.print(f"[red]Error: Repository '{repo_name}' not found[/red]")
-        return
+        return 1
     
-    # Get milestones
-    milestones = {m.title: m for m in repo.get_milestones()}
+    # Provision labels and milestones, then get existing issues
+    try:
+        milestones = provision_with_pygithub(repo, limiter)
+        existing = with_retries(limiter, "GET",
+                                lambda: existing_issue_index(repo, args.label, args.since))
+    except Exception as e:
+        console.print(f"[red]Error provisioning labels and milestones: {e}[/red]")
+        return 1
     
     console.print(f"\n[cyan]Creating {len(ISSUES)} issues...[/cyan]\n")
     
     created = 0
     skipped = 0
+    failed = 0
     
-    for issue_data in track(ISSUES, description="Creating issues..."):
+    for issue_data in track(ISSUES, description="Creating issues...", console=console):
         try:
             milestone = milestones.get(issue_data["milestone"])
             
             # Check if issue already exists
-            existing = list(repo.get_issues(state="all"))
-            if any(i.title == issue_data["title"] for i in existing):
+            if issue_data["title"] in existing:
                 skipped += 1
                 continue
             
-            repo.create_issue(
+            existing[issue_data["title"]] = with_retries(limiter, "POST", lambda: repo.create_issue(
                 title=issue_data["title"],
                 body=issue_data["body"],
                 labels=issue_data["labels"],
                 milestone=milestone
-            )
+            ))
             created += 1
             
         except Exception as e:
             console.print(f"[red]Error creating {issue_data['title']}: {e}[/red]")
+            failed += 1
     
+    if limiter.retries:
+        console.print(f"[yellow]Rate limits: {limiter.limited} rejected requests, "
+                      f"{limiter.retries} retries, {limiter.waited:.1f}s waited[/yellow]")
     console.print(f"\n[green]✅ Created {created} issues[/green]")
     if skipped:
         console.print(f"[yellow]⚠️  Skipped {skipped} existing issues[/yellow]")
+    return 1 if failed else 0
+
+
+def sync_concurrently(args, token: str, repo_name: str):
+    """Create the issues concurrently and report request latencies"""
+    console.print(f"\n[cyan]Syncing {len(ISSUES)} issues "
+                  f"({args.concurrency} requests in flight)...[/cyan]\n")
+    since = args.since.isoformat() if args.since else None
+    limiter = RateLimiter(reserve=args.reserve, max_retries=args.max_retries)
+    try:
+        result, client = asyncio.run(sync_issues(
+            token, repo_name, ISSUES, args.api_url, args.concurrency, args.ordered,
+            args.label, since, limiter, None if args.no_state else args.state,
+            "graphql" if args.engine == "graphql" else "rest", args.batch_size))
+    except Exception as e:
+        console.print(f"[red]Error: {e}[/red]")
+        return 1
+    
+    for title, error in result.failed.items():
+        console.print(f"[red]Error syncing {title}: {error}[/red]")
+    
+    latency = client.latency
+    table = Table(title=f"{latency.requests} API requests")
+    table.add_column("Request")
+    for column in ("Count", "Mean ms", "p50 ms", "p95 ms", "Max ms"):
+        table.add_column(column, justify="right")
+    for route, count, *seconds in latency.summary():
+        table.add_row(route, str(count), *(f"{value * 1000:.0f}" for value in seconds))
+    console.print(table)
+    if limiter.retries or limiter.waited:
+        console.print(f"[yellow]Rate limits: {limiter.limited} rejected requests, "
+                      f"{limiter.retries} retries, {limiter.waited:.1f}s waited across requests[/yellow]")
+    if limiter.remaining is not None:
+        console.print(f"[cyan]API budget left: {limiter.remaining}"
+                      f"{f'/{limiter.limit}' if limiter.limit else ''}[/cyan]")
+    
+    if result.labels_created or result.milestones_created:
+        console.print(f"\n[green]✅ Created {len(result.labels_created)} labels and "
+                      f"{len(result.milestones_created)} milestones[/green]")
+    console.print(f"\n[green]✅ Created {len(result.created)} issues[/green]")
+    if result.updated:
+        console.print(f"[green]✅ Updated {len(result.updated)} changed issues[/green]")
+    if result.retried:
+        console.print(f"[yellow]↻ Retried {len(result.retried)} creates[/yellow]")
+    if result.labelled:
+        console.print(f"[green]✅ Added missing labels to {len(result.labelled)} issues[/green]")
+    if result.skipped:
+        console.print(f"[yellow]⚠️  Skipped {len(result.skipped)} existing issues[/yellow]")
+    for title in result.drifted:
+        console.print(f"[yellow]⚠️  Edited on GitHub since the last sync: {title}[/yellow]")
+    if result.failed:
+        console.print(f"[red]❌ {len(result.failed)} issues could not be synced[/red]")
+        return 1
+    return 0
+
+
+def dry_run(args, repo_name: str) -> int:
+    """Run every sync strategy against a local fake GitHub and report the
+    API traffic each one causes"""
+    from fake_github_server import FakeGitHub
+    
+    rows = []
+    servers = {}
+    with ExitStack() as stack:
+        state_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        for name, engine, continues in DRY_RUN_STRATEGIES:
+            github = servers.get(continues)
+            if github is None:
+                github = stack.enter_context(FakeGitHub(
+                    repo=repo_name, seed=0, latency=args.latency / 1000))
+                # Unrelated issues, so listings span several pages. They
+                # predate the sync, so a rerun's since listing leaves them out
+                for number in range(args.existing):
+                    github.add_issue(f"Existing issue {number + 1}", labels=["other"],
+                                     created_at="2020-01-01T00:00:00Z")
+            servers[name] = github
+            run_args = copy.copy(args)
+            run_args.engine = engine
+            run_args.api_url = github.url
+            run_args.state = state_dir / f"{continues or name}.json"
+            run_args.no_state = False
+            github.reset_traffic()
+            sync = sync_with_pygithub if engine == "pygithub" else sync_concurrently
+            with console.capture() as capture:
+                start = time.perf_counter()
+                status = sync(run_args, "dry-run", repo_name)
+                seconds = time.perf_counter() - start
+            traffic = github.reset_traffic()
+            titles = [issue["title"] for issue in github.issues]
+            ok = not status and all(titles.count(issue["title"]) == 1 for issue in ISSUES)
+            if not ok:
+                console.print(capture.get())
+            rows.append({"strategy": name, "engine": engine, "ok": ok,
+                         "calls": traffic["calls"], "writes": traffic["writes"],
+                         "pages": traffic["pages"], "bytes_in": traffic["bytes_in"],
+                         "bytes_out": traffic["bytes_out"], "seconds": round(seconds, 3)})
+    
+    table = Table(title=f"Dry run: {len(ISSUES)} issues, {args.existing} unrelated existing "
+                        f"issues, {args.latency:g} ms latency")
+    table.add_column("Strategy")
+    for column in ("Calls", "Writes", "Pages", "KB sent", "KB recv", "Wall s"):
+        table.add_column(column, justify="right")
+    table.add_column("Result")
+    for row in rows:
+        table.add_row(row["strategy"], str(row["calls"]), str(row["writes"]), str(row["pages"]),
+                      f"{row['bytes_in'] / 1024:.1f}", f"{row['bytes_out'] / 1024:.1f}",
+                      f"{row['seconds']:.2f}",
+                      "[green]ok[/green]" if row["ok"] else "[red]failed[/red]")
+    console.print(table)
+    if args.report:
+        args.report.write_text(json.dumps({"issues": len(ISSUES), "existing": args.existing,
+                                           "latency_ms": args.latency, "strategies": rows},
+                                          indent=2) + "\n")
+    return 0 if all(row["ok"] for row in rows) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the SOC 2 project issues")
+    parser.add_argument("--label", help="only look for existing issues with this label")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="only look for existing issues updated since this ISO date")
+    parser.add_argument("--engine", choices=("async", "graphql", "pygithub"), default="async",
+                        help="concurrent REST requests, batched GraphQL mutations, "
+                             "or one PyGithub call at a time")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="issues created per GraphQL request")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="requests in flight at once with the async engine")
+    parser.add_argument("--ordered", action="store_true",
+                        help="create issues one at a time so their numbers follow ISSUES order")
+    parser.add_argument("--state", type=Path, default=DEFAULT_STATE_FILE,
+                        help="incremental sync state file (async and graphql engines)")
+    parser.add_argument("--no-state", action="store_true",
+                        help="ignore the state file and compare titles only")
+    parser.add_argument("--reserve", type=int, default=0,
+                        help="API requests to leave in the rate-limit budget for other clients")
+    parser.add_argument("--max-retries", type=int, default=5,
+                        help="retries of a rate-limited or failed request")
+    parser.add_argument("--api-url", default=api_url_from_env(),
+                        help="REST API root (default: $GITHUB_API_URL or api.github.com)")
+    parser.add_argument("--repo", help="repository name (default: ask)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="run every engine against a local fake GitHub and report API cost")
+    parser.add_argument("--latency", type=float, default=50.0,
+                        help="mean response delay of the dry-run server in milliseconds")
+    parser.add_argument("--existing", type=int, default=150,
+                        help="unrelated issues already in the dry-run repository")
+    parser.add_argument("--report", type=Path,
+                        help="write the dry-run measurements to this JSON file")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    
+    if args.dry_run:
+        return dry_run(args, args.repo or "saasx-soc2-certification")
+    
+    token = os.environ.get("GITHUB_TOKEN")
+    if not token:
+        console.print("[red]Error: GITHUB_TOKEN not set[/red]")
+        return
+    
+    # Get repository
+    repo_name = args.repo or \
+        input("Enter repository name [saasx-soc2-certification]: ") or "saasx-soc2-certification"
+    
+    if args.engine == "pygithub":
+        return sync_with_pygithub(args, token, repo_name)
+    else:
+        return sync_concurrently(args, token, repo_name)
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+GraphQL backend for the issue sync
+
+GraphQLIssueSync replaces the REST listings and creates of IssueSync:
+
+- one query resolves the repository ID, the label and milestone IDs and
+  the existing issues (more pages only if a listing exceeds 100 items)
+- new issues are created with aliased createIssue mutations, batch_size
+  per request
+
+Labels and milestones are still provisioned over REST, since GraphQL has
+no mutation to create milestones, and the IDs are resolved again only if
+something was created. Updates of changed issues and incremental runs use
+the REST paths of IssueSync.
+"""
+
+import asyncio
+
+import requests
+
+from issue_sync import GitHubError, IssueSync, SyncResult
+
+DEFAULT_BATCH_SIZE = 10
+
+RESOLVE_QUERY = """
+query Resolve($owner: String!, $name: String!, $issues: Boolean!, $filterBy: IssueFilters,
+              $labelsAfter: String, $milestonesAfter: String, $issuesAfter: String) {
+  repository(owner: $owner, name: $name) {
+    id
+    labels(first: 100, after: $labelsAfter) {
+      nodes { id name }
+      pageInfo { hasNextPage endCursor }
+    }
+    milestones(first: 100, after: $milestonesAfter, states: [OPEN, CLOSED]) {
+      nodes { id number title }
+      pageInfo { hasNextPage endCursor }
+    }
+    issues(first: 100, after: $issuesAfter, states: [OPEN, CLOSED], filterBy: $filterBy)
+        @include(if: $issues) {
+      nodes { number title updatedAt labels(first: 100) { nodes { name } } }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+
+ISSUE_FIELDS = "issue { number title updatedAt }"
+
+
+class GraphQLError(Exception):
+    """A GraphQL request whose response carries errors"""
+
+    def __init__(self, errors: list):
+        super().__init__("; ".join(error.get("message", str(error)) for error in errors))
+        self.errors = errors
+
+
+def graphql_url(api_url: str) -> str:
+    """GraphQL endpoint for a REST API root (GHES serves REST at /api/v3)"""
+    if api_url.endswith("/api/v3"):
+        return api_url[:-len("/v3")] + "/graphql"
+    return api_url + "/graphql"
+
+
+class GraphQLIssueSync(IssueSync):
+    """IssueSync that resolves IDs and creates issues over GraphQL"""
+
+    def __init__(self, client, owner: str, repo: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 **kwargs):
+        super().__init__(client, owner, repo, **kwargs)
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.owner = owner
+        self.repo = repo
+        self.batch_size = batch_size
+        self.url = graphql_url(client.api_url)
+        self.repository_id = None
+        self.label_ids = {}
+        self.milestone_ids = {}
+
+    async def graphql(self, query: str, variables: dict = None, mutation: bool = False):
+        """(data, errors) of one GraphQL request"""
+        response = await self.client.request(
+            "POST", self.url, json={"query": query, "variables": variables or {}},
+            idempotent=not mutation)
+        body = response.json()
+        return body.get("data") or {}, body.get("errors") or []
+
+    async def resolve(self, issues: bool = True, label: str = None, since: str = None) -> dict:
+        """Repository ID, label and milestone IDs and (if issues) the
+        existing issues, in one query plus one per extra page"""
+        variables = {"owner": self.owner, "name": self.repo, "issues": issues,
+                     "filterBy": {key: value for key, value in
+                                  (("labels", [label] if label else None), ("since", since))
+                                  if value} or None}
+        nodes = {"labels": [], "milestones": [], "issues": []}
+        while True:
+            data, errors = await self.graphql(RESOLVE_QUERY, variables)
+            if errors:
+                raise GraphQLError(errors)
+            repository = data["repository"]
+            self.repository_id = repository["id"]
+            more = False
+            for name in nodes:
+                page = repository.get(name)
+                cursor = f"{name}After"
+                if page is None or variables.get(cursor, "") is None:
+                    continue
+                nodes[name].extend(page["nodes"])
+                # Connections that are complete are not fetched again
+                variables[cursor] = page["pageInfo"]["endCursor"] \
+                    if page["pageInfo"]["hasNextPage"] else None
+                more = more or page["pageInfo"]["hasNextPage"]
+            if not more:
+                return nodes
+
+    def _take_ids(self, nodes: dict) -> tuple:
+        """Store label and milestone IDs; (labels, milestones) as the REST
+        listings return them"""
+        self.label_ids = {label["name"].lower(): label["id"] for label in nodes["labels"]}
+        self.milestone_ids = {milestone["title"]: milestone["id"]
+                              for milestone in nodes["milestones"]}
+        return ({label["name"].lower(): label["name"] for label in nodes["labels"]},
+                {milestone["title"]: milestone["number"] for milestone in nodes["milestones"]})
+
+    async def list_repository(self, label: str = None, since: str = None) -> tuple:
+        nodes = await self.resolve(True, label, since)
+        existing = {}
+        for issue in nodes["issues"]:
+            existing.setdefault(issue["title"], {
+                "number": issue["number"], "title": issue["title"],
+                "updated_at": issue["updatedAt"], "labels": issue["labels"]["nodes"],
+            })
+        return existing, self._take_ids(nodes)
+
+    async def provision(self, issues: list, result: SyncResult, listed: tuple = None):
+        created = len(result.labels_created) + len(result.milestones_created)
+        if listed is None:
+            listed = self._take_ids(await self.resolve(False))
+        provisioned = await super().provision(issues, result, listed)
+        if len(result.labels_created) + len(result.milestones_created) > created:
+            # New labels and milestones need their node IDs
+            self._take_ids(await self.resolve(False))
+        return provisioned
+
+    async def _create_all(self, creates: list, milestones: dict, ordered: bool,
+                          result: SyncResult, retry_queue: dict):
+        batches = [creates[start:start + self.batch_size]
+                   for start in range(0, len(creates), self.batch_size)]
+        if ordered:
+            # Top-level mutation fields run one after another, so issue
+            # numbers follow the batch order
+            for batch in batches:
+                await self._create_batch(batch, result, retry_queue)
+        else:
+            await asyncio.gather(*(self._create_batch(batch, result, retry_queue)
+                                   for batch in batches))
+
+    async def _create_batch(self, batch: list, result: SyncResult, retry_queue: dict):
+        definitions = ", ".join(f"$i{index}: CreateIssueInput!" for index in range(len(batch)))
+        fields = " ".join(f"i{index}: createIssue(input: $i{index}) {{ {ISSUE_FIELDS} }}"
+                          for index in range(len(batch)))
+        variables = {f"i{index}": self._input(issue_data)
+                     for index, issue_data in enumerate(batch)}
+        try:
+            data, errors = await self.graphql(f"mutation CreateIssues({definitions}) {{ {fields} }}",
+                                              variables, mutation=True)
+        except GitHubError as e:
+            for issue_data in batch:
+                if e.transient:
+                    retry_queue[issue_data["title"]] = issue_data, str(e)
+                else:
+                    result.failed[issue_data["title"]] = str(e)
+            return
+        except requests.RequestException as e:
+            for issue_data in batch:
+                retry_queue[issue_data["title"]] = issue_data, str(e)
+            return
+        messages = {}
+        for error in errors:
+            alias = (error.get("path") or [None])[0]
+            messages.setdefault(alias, []).append(error.get("message", str(error)))
+        for index, issue_data in enumerate(batch):
+            payload = data.get(f"i{index}")
+            if payload and payload.get("issue"):
+                issue = payload["issue"]
+                self._created({"number": issue["number"], "updated_at": issue["updatedAt"]},
+                              issue_data, result)
+            else:
+                result.failed[issue_data["title"]] = "; ".join(
+                    messages.get(f"i{index}") or messages.get(None) or ["not created"])
+
+    def _input(self, issue_data: dict) -> dict:
+        fields = {"repositoryId": self.repository_id, "title": issue_data["title"],
+                  "body": issue_data.get("body", ""),
+                  "labelIds": [self.label_ids[name.lower()]
+                               for name in issue_data.get("labels", [])
+                               if name.lower() in self.label_ids]}
+        milestone = self.milestone_ids.get(issue_data.get("milestone"))
+        if milestone is not None:
+            fields["milestoneId"] = milestone
+        return fields
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Local record of which catalog issues were synced to which repository issues
+
+For each repository the state maps every ISSUES title to its issue number,
+a hash of the catalog content last applied to it (body, labels and
+milestone) and the issue's updated_at on GitHub. It also keeps the ETag of
+the last listing of recently updated issues, so a rerun can ask GitHub
+whether anything changed with a conditional request (a 304 is free under
+the rate limit) and only write to issues whose catalog entry changed.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+DEFAULT_STATE_FILE = Path(".issue_sync_state.json")
+
+STATE_VERSION = 1
+
+
+def content_hash(issue_data: dict) -> str:
+    """Hash of the fields of a catalog entry that sync writes to GitHub"""
+    return _hash(issue_data.get("body") or "", issue_data.get("labels", []),
+                 issue_data.get("milestone"))
+
+
+def body_hash(issue_data: dict) -> str:
+    return _hash(issue_data.get("body") or "")
+
+
+def _hash(*values) -> str:
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+
+class IssueState:
+    """Synced issues of one repository, loaded from and saved to a JSON file
+
+    Entries are dicts with number, hash, body_hash, labels, milestone and
+    updated_at. Files written for other repositories are kept intact.
+    """
+
+    def __init__(self, path: Path, repo: str):
+        self.path = Path(path)
+        self.repo = repo
+        self.data = {"version": STATE_VERSION, "repos": {}}
+        if self.path.exists():
+            data = json.loads(self.path.read_text())
+            if data.get("version") == STATE_VERSION:
+                self.data = data
+        self.state = self.data["repos"].setdefault(repo, {"listing": {}, "issues": {}})
+
+    @property
+    def issues(self) -> dict:
+        return self.state["issues"]
+
+    @property
+    def listing(self) -> dict:
+        """since and etag of the last listing of recently updated issues"""
+        return self.state["listing"]
+
+    def get(self, title: str) -> dict:
+        return self.issues.get(title)
+
+    def record(self, title: str, issue: dict, issue_data: dict):
+        """Note that issue now carries the catalog content of issue_data"""
+        self.issues[title] = {
+            "number": issue["number"],
+            "hash": content_hash(issue_data),
+            "body_hash": body_hash(issue_data),
+            "labels": list(issue_data.get("labels", [])),
+            "milestone": issue_data.get("milestone"),
+            "updated_at": issue.get("updated_at"),
+        }
+
+    def seen(self, issues):
+        """Take the updated_at of the listed issues that are in the state"""
+        entries = {entry["number"]: entry for entry in self.issues.values()}
+        for issue in issues:
+            entry = entries.get(issue["number"])
+            if entry is not None:
+                entry["updated_at"] = issue["updated_at"]
+
+    def forget(self, title: str):
+        self.issues.pop(title, None)
+
+    def newest_update(self) -> str:
+        """Latest updated_at of the synced issues, or None"""
+        return max((entry["updated_at"] for entry in self.issues.values()
+                    if entry.get("updated_at")), default=None)
+
+    def save(self):
+        """Write the state atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.data, f, indent=2, sort_keys=True)
+                f.write("\n")
+            os.replace(tmp_name, self.path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+"""
+Concurrent GitHub issue sync over the REST API
+
+Requests are plain blocking HTTP calls on a pooled session, run on worker
+threads and scheduled with asyncio, with at most `concurrency` of them in
+flight. A RateLimiter (request_scheduler.py) paces them to GitHub's rate
+limits and decides when rejected requests are retried; creates that still
+fail go to a retry queue that is worked through after the main pass.
+Every request's latency is recorded, so a sync can report where its time
+went. The API URL is configurable, so a sync can also run against a local
+stand-in such as fake_github_server.py.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from issue_state import IssueState, body_hash, content_hash
+from request_scheduler import WRITE_METHODS, RateLimiter, backoff, is_rate_limited
+
+DEFAULT_API_URL = "https://api.github.com"
+DEFAULT_CONCURRENCY = 8
+
+# Passes over the retry queue of failed creates after the main pass
+RETRY_ROUNDS = 3
+
+BACKENDS = ("rest", "graphql")
+
+# Largest page size the REST API allows, so listing takes the fewest calls
+PER_PAGE = 100
+
+
+class GitHubError(Exception):
+    """A GitHub API request that returned an error status"""
+
+    def __init__(self, method: str, path: str, status: int, message: str,
+                 rate_limited: bool = False):
+        super().__init__(f"{method} {path} failed with {status}: {message}")
+        self.method = method
+        self.path = path
+        self.status = status
+        self.rate_limited = rate_limited
+
+    @property
+    def transient(self) -> bool:
+        """Whether the same request may succeed later"""
+        return self.rate_limited or self.status >= 500
+
+
+@dataclass
+class LatencyLog:
+    """Latency of every request, grouped by method and route"""
+    samples: dict = field(default_factory=dict)
+
+    def add(self, method: str, path: str, seconds: float):
+        # /repos/saasx/soc2/issues/12/labels/audit -> {repo}/issues/{number}/labels/{name}
+        route = re.sub(r"/\d+(?=/|$)", "/{number}", path.split("?")[0])
+        route = re.sub(r"^/repos/[^/]+/[^/]+", "{repo}", route)
+        route = re.sub(r"/labels/[^/]+$", "/labels/{name}", route)
+        self.samples.setdefault(f"{method} {route}", []).append(seconds)
+
+    def summary(self) -> list:
+        """(route, requests, mean, p50, p95, max) rows, seconds, slowest first"""
+        rows = []
+        for route, samples in self.samples.items():
+            ordered = sorted(samples)
+            rows.append((route, len(ordered), sum(ordered) / len(ordered),
+                         _percentile(ordered, 0.5), _percentile(ordered, 0.95), ordered[-1]))
+        return sorted(rows, key=lambda row: row[1] * row[2], reverse=True)
+
+    @property
+    def requests(self) -> int:
+        return sum(len(samples) for samples in self.samples.values())
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _message(response: requests.Response) -> str:
+    try:
+        return response.json().get("message", response.reason)
+    except ValueError:
+        return response.reason
+
+
+class AsyncGitHub:
+    """Minimal asyncio client for the GitHub REST API"""
+
+    def __init__(self, token: str, api_url: str = DEFAULT_API_URL,
+                 concurrency: int = DEFAULT_CONCURRENCY, timeout: float = 15,
+                 limiter: RateLimiter = None):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.api_url = api_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.latency = LatencyLog()
+        self.limiter = limiter or RateLimiter()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # One thread per request slot; the default executor may have fewer
+        self._executor = ThreadPoolExecutor(max_workers=concurrency,
+                                            thread_name_prefix="github")
+        self._slots = None
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _send(self, method: str, url: str, params=None, json=None,
+              headers=None) -> requests.Response:
+        return self.session.request(method, url, params=params, json=json,
+                                    headers=headers, timeout=self.timeout)
+
+    async def request(self, method: str, path: str, params: dict = None,
+                      json: dict = None, idempotent: bool = None,
+                      headers: dict = None) -> requests.Response:
+        """Send one request (path relative to the API URL, or a full URL),
+        waiting out rate limits and retrying where that is safe
+
+        Server and connection errors are only retried for idempotent
+        requests, which by default are the reads.
+        """
+        if idempotent is None:
+            idempotent = method not in WRITE_METHODS
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        url = path if path.startswith(("http://", "https://")) else self.api_url + path
+        route = url[len(self.api_url):] if url.startswith(self.api_url) else url
+        loop = asyncio.get_running_loop()
+        limiter = self.limiter
+        attempt = 0
+        while True:
+            await limiter.acquire(method)
+            async with self._slots:
+                started = time.perf_counter()
+                try:
+                    response = await loop.run_in_executor(
+                        self._executor, lambda: self._send(method, url, params, json, headers))
+                except requests.RequestException:
+                    # A write that is not idempotent may have gone through
+                    if not idempotent or attempt >= limiter.max_retries:
+                        raise
+                    response = None
+                elapsed = time.perf_counter() - started
+            self.latency.add(method, route, elapsed)
+            if response is None:
+                delay = backoff(attempt)
+            else:
+                limiter.update(method, response.status_code, response.headers)
+                if response.status_code < 400:
+                    return response
+                message = _message(response)
+                delay = limiter.retry_delay(method, response.status_code, response.headers,
+                                            message, attempt, idempotent)
+                if delay is None:
+                    raise GitHubError(method, path, response.status_code, message,
+                                      is_rate_limited(response.status_code, response.headers,
+                                                      message))
+            attempt += 1
+            limiter.retries += 1
+            await limiter.wait(delay)
+
+    async def get(self, path: str, params: dict = None):
+        return (await self.request("GET", path, params=params)).json()
+
+    async def paginate(self, path: str, params: dict = None) -> list:
+        """Every item of a listing, following its Link: rel="next" pages"""
+        params = {"per_page": PER_PAGE, **(params or {})}
+        return await self.rest_of(await self.request("GET", path, params=params))
+
+    async def rest_of(self, response: requests.Response) -> list:
+        """Items of a listing's first page and every page after it"""
+        items = response.json()
+        while "next" in response.links:
+            response = await self.request("GET", response.links["next"]["url"])
+            items.extend(response.json())
+        return items
+
+
+@dataclass
+class SyncResult:
+    """Outcome of one sync, with the titles handled each way"""
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    labelled: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+    failed: dict = field(default_factory=dict)
+    retried: list = field(default_factory=list)
+    drifted: list = field(default_factory=list)
+    labels_created: list = field(default_factory=list)
+    milestones_created: list = field(default_factory=list)
+
+
+class IssueSync:
+    """Create a catalog of issues in a repository, concurrently
+
+    Issues whose title already exists are left alone apart from adding any
+    catalog labels they lack. New issues are created concurrently, so their
+    numbers follow completion order; with ordered=True they are created one
+    at a time in catalog order (labelling still runs alongside).
+
+    With an IssueState, entries already in the state are compared by
+    content hash instead: unchanged ones cost no request, and changed ones
+    get a PATCH of the body and milestone plus label additions and
+    removals, so labels added on GitHub are kept. When every entry is in
+    the state the repository's issues are not listed at all; one
+    conditional request for recently updated issues notes which synced
+    issues were edited on GitHub since (drifted). Existing issues adopted
+    into the state take the current catalog as their baseline.
+
+    Before any issue is written, the labels and milestones the catalog
+    refers to are provisioned: each is listed once and the missing ones are
+    created concurrently, so issues never go without their milestone and
+    labels are not created implicitly one issue at a time. Issues that need
+    a label or milestone that could not be created fail; the rest are
+    written without waiting for a rerun.
+
+    Creates that fail with a rate limit, server or connection error go to a
+    retry queue. Each retry round first lists the issues updated since the
+    sync began, so a create that went through despite the error is not
+    repeated.
+    """
+
+    def __init__(self, client: AsyncGitHub, owner: str, repo: str,
+                 retry_rounds: int = RETRY_ROUNDS, state: IssueState = None):
+        self.client = client
+        self.repo_path = f"/repos/{owner}/{repo}"
+        self.retry_rounds = retry_rounds
+        self.state = state
+
+    async def existing_issues(self, label: str = None, since: str = None) -> dict:
+        """Title -> issue for the repository's issues, listed once"""
+        params = {"state": "all"}
+        if label:
+            params["labels"] = label
+        if since:
+            params["since"] = since
+        index = {}
+        for issue in await self.client.paginate(f"{self.repo_path}/issues", params):
+            index.setdefault(issue["title"], issue)
+        return index
+
+    async def labels(self) -> dict:
+        """Lower-cased name -> name of the repository's labels (label names
+        are case-insensitive on GitHub)"""
+        labels = await self.client.paginate(f"{self.repo_path}/labels")
+        return {label["name"].lower(): label["name"] for label in labels}
+
+    async def milestones(self) -> dict:
+        """Title -> milestone number for the repository's milestones, open
+        or closed"""
+        milestones = await self.client.paginate(f"{self.repo_path}/milestones",
+                                                {"state": "all"})
+        return {milestone["title"]: milestone["number"] for milestone in milestones}
+
+    async def list_repository(self, label: str = None, since: str = None) -> tuple:
+        """(title -> issue, (labels, milestones)) for the repository, with
+        the three listings run concurrently"""
+        existing, labels, milestones = await asyncio.gather(
+            self.existing_issues(label, since), self.labels(), self.milestones())
+        return existing, (labels, milestones)
+
+    async def provision(self, issues: list, result: SyncResult, listed: tuple = None):
+        """Create the labels and milestones the catalog uses that the
+        repository lacks; returns (title -> milestone number, title -> error
+        of each issue that needs one that could not be created). listed is
+        the (labels, milestones) listing if it was already fetched."""
+        labels, milestones = listed or await asyncio.gather(self.labels(), self.milestones())
+        wanted_labels = dict.fromkeys(name for issue_data in issues
+                                      for name in issue_data.get("labels", []))
+        wanted_milestones = dict.fromkeys(issue_data["milestone"] for issue_data in issues
+                                          if issue_data.get("milestone"))
+        new_labels = [name for name in wanted_labels if name.lower() not in labels]
+        new_milestones = [title for title in wanted_milestones if title not in milestones]
+        outcomes = await asyncio.gather(
+            *(self._create_label(name) for name in new_labels),
+            *(self._create_milestone(title) for title in new_milestones),
+            return_exceptions=True)
+        failed_labels = {}
+        failed_milestones = {}
+        for name, outcome in zip(new_labels, outcomes):
+            if isinstance(outcome, BaseException):
+                result.failed[f"label '{name}'"] = failed_labels[name.lower()] = str(outcome)
+            else:
+                result.labels_created.append(name)
+        for title, outcome in zip(new_milestones, outcomes[len(new_labels):]):
+            if isinstance(outcome, BaseException):
+                result.failed[f"milestone '{title}'"] = failed_milestones[title] = str(outcome)
+            else:
+                result.milestones_created.append(title)
+                milestones[title] = outcome
+        blocked = {}
+        for issue_data in issues:
+            errors = [f"label '{name}' could not be created: {failed_labels[name.lower()]}"
+                      for name in issue_data.get("labels", []) if name.lower() in failed_labels]
+            if issue_data.get("milestone") in failed_milestones:
+                errors.append(f"milestone '{issue_data['milestone']}' could not be created: "
+                              f"{failed_milestones[issue_data['milestone']]}")
+            if errors:
+                blocked[issue_data["title"]] = "; ".join(errors)
+        return milestones, blocked
+
+    async def _create_label(self, name: str):
+        try:
+            # A repeat after a create that went through gets a 422, so the
+            # request is safe to retry
+            await self.client.request("POST", f"{self.repo_path}/labels",
+                                      json={"name": name, "color": label_color(name)},
+                                      idempotent=True)
+        except GitHubError as e:
+            # Created by someone else since the listing
+            if e.status != 422:
+                raise
+
+    async def _create_milestone(self, title: str) -> int:
+        try:
+            # Milestone titles are unique, so a repeat cannot duplicate one
+            response = await self.client.request("POST", f"{self.repo_path}/milestones",
+                                                 json={"title": title}, idempotent=True)
+        except GitHubError as e:
+            if e.status != 422:
+                raise
+            # Created by an earlier attempt or by someone else: look it up
+            number = (await self.milestones()).get(title)
+            if number is None:
+                raise
+            return number
+        return response.json()["number"]
+
+    async def recently_updated(self) -> list:
+        """Issues updated since the newest update in the state, or [] if
+        GitHub answers the conditional request with 304 Not Modified"""
+        state = self.state
+        since = state.newest_update()
+        params = {"state": "all", "sort": "updated", "direction": "desc",
+                  "per_page": PER_PAGE}
+        if since:
+            params["since"] = since
+        listing = state.listing
+        headers = None
+        if listing.get("etag") and listing.get("since") == since:
+            headers = {"If-None-Match": listing["etag"]}
+        response = await self.client.request("GET", f"{self.repo_path}/issues",
+                                             params=params, headers=headers)
+        if response.status_code == 304:
+            return []
+        listing.update(since=since, etag=response.headers.get("ETag"))
+        return await self.client.rest_of(response)
+
+    async def run(self, issues: list, ordered: bool = False, label: str = None,
+                  since: str = None) -> SyncResult:
+        # Allow for clock skew when asking which issues changed since the start
+        started = datetime.now(timezone.utc) - timedelta(minutes=5)
+        result = SyncResult()
+        state = self.state
+        if state is not None and all(issue_data["title"] in state.issues
+                                     for issue_data in issues):
+            existing, listed = {}, None
+            self._merge_listed(await self.recently_updated(), result)
+        else:
+            existing, listed = await self.list_repository(label, since)
+            if state is not None:
+                self._merge_listed(existing.values(), result)
+
+        retry_queue = {}
+        planned = set()
+        creates = []
+        updates = []
+        labelling = []
+        for issue_data in issues:
+            title = issue_data["title"]
+            if title in planned:
+                result.skipped.append(title)
+                continue
+            planned.add(title)
+            entry = state.get(title) if state is not None else None
+            if entry is not None:
+                if entry["hash"] == content_hash(issue_data):
+                    result.skipped.append(title)
+                else:
+                    updates.append((entry, issue_data))
+                continue
+            issue = existing.get(title)
+            if issue is None:
+                creates.append(issue_data)
+                continue
+            missing = _missing_labels(issue, issue_data.get("labels", []))
+            if state is not None:
+                state.record(title, {**issue, "updated_at": None} if missing else issue,
+                             issue_data)
+            if missing:
+                labelling.append((issue["number"], title, missing))
+            else:
+                result.skipped.append(title)
+
+        milestones = {}
+        if creates or updates or labelling:
+            milestones, blocked = await self.provision(issues, result, listed)
+            if blocked:
+                work = [issue_data["title"] for issue_data in creates] + \
+                    [issue_data["title"] for _, issue_data in updates] + \
+                    [title for _, title, _ in labelling]
+                for title in work:
+                    if title in blocked:
+                        result.failed[title] = blocked[title]
+                        if state is not None and any(title == item[1] for item in labelling):
+                            # Adopted above; adopt it again once its labels exist
+                            state.forget(title)
+                creates = [issue_data for issue_data in creates
+                           if issue_data["title"] not in blocked]
+                updates = [(entry, issue_data) for entry, issue_data in updates
+                           if issue_data["title"] not in blocked]
+                labelling = [item for item in labelling if item[1] not in blocked]
+        tasks = [self._add_labels(number, title, missing, result)
+                 for number, title, missing in labelling]
+        tasks.extend(self._update(entry, issue_data, milestones, result)
+                     for entry, issue_data in updates)
+        tasks.append(self._create_all(creates, milestones, ordered, result, retry_queue))
+        await asyncio.gather(*tasks)
+
+        for attempt in range(self.retry_rounds):
+            if not retry_queue:
+                break
+            await self.client.limiter.wait(backoff(attempt))
+            created = await self.existing_issues(label, started.strftime("%Y-%m-%dT%H:%M:%SZ"))
+            creates = []
+            for issue_data, _ in retry_queue.values():
+                title = issue_data["title"]
+                result.retried.append(title)
+                if title in created:
+                    self._created(created[title], issue_data, result)
+                else:
+                    creates.append(issue_data)
+            retry_queue = {}
+            await self._create_all(creates, milestones, ordered, result, retry_queue)
+        for issue_data, error in retry_queue.values():
+            result.failed[issue_data["title"]] = error
+
+        # Report in catalog order regardless of completion order
+        order = {issue_data["title"]: index for index, issue_data in enumerate(issues)}
+        for titles in (result.created, result.updated, result.labelled, result.retried,
+                       result.drifted):
+            titles.sort(key=order.get)
+        return result
+
+    def _merge_listed(self, issues, result: SyncResult):
+        """Note which synced issues were edited on GitHub since the last sync
+        and take the updated_at of every listed issue in the state"""
+        synced = {entry["number"]: title for title, entry in self.state.issues.items()}
+        for issue in issues:
+            title = synced.get(issue["number"])
+            # None: last changed by our own label request, time unknown
+            if title is not None and \
+                    self.state.get(title)["updated_at"] not in (None, issue["updated_at"]):
+                result.drifted.append(title)
+        self.state.seen(issues)
+
+    async def _create_all(self, creates: list, milestones: dict, ordered: bool,
+                          result: SyncResult, retry_queue: dict):
+        if ordered:
+            for issue_data in creates:
+                await self._create(issue_data, milestones, result, retry_queue)
+        else:
+            await asyncio.gather(*(self._create(issue_data, milestones, result, retry_queue)
+                                   for issue_data in creates))
+
+    async def _create(self, issue_data: dict, milestones: dict, result: SyncResult,
+                      retry_queue: dict):
+        title = issue_data["title"]
+        payload = {"title": title, "body": issue_data.get("body", ""),
+                   "labels": issue_data.get("labels", [])}
+        milestone = milestones.get(issue_data.get("milestone"))
+        if milestone is not None:
+            payload["milestone"] = milestone
+        try:
+            response = await self.client.request("POST", f"{self.repo_path}/issues",
+                                                 json=payload)
+        except GitHubError as e:
+            if e.transient:
+                retry_queue[title] = issue_data, str(e)
+            else:
+                result.failed[title] = str(e)
+            return
+        except requests.RequestException as e:
+            retry_queue[title] = issue_data, str(e)
+            return
+        self._created(response.json(), issue_data, result)
+
+    def _created(self, issue: dict, issue_data: dict, result: SyncResult):
+        result.created.append(issue_data["title"])
+        if self.state is not None:
+            self.state.record(issue_data["title"], issue, issue_data)
+
+    async def _update(self, entry: dict, issue_data: dict, milestones: dict,
+                      result: SyncResult):
+        """Apply the fields of a catalog entry that changed since it was synced"""
+        title = issue_data["title"]
+        path = f"{self.repo_path}/issues/{entry['number']}"
+        patch = {}
+        if entry["body_hash"] != body_hash(issue_data):
+            patch["body"] = issue_data.get("body", "")
+        if entry["milestone"] != issue_data.get("milestone"):
+            # An unknown or removed milestone clears it
+            patch["milestone"] = milestones.get(issue_data.get("milestone"))
+        labels = issue_data.get("labels", [])
+        added = [name for name in labels if name not in entry["labels"]]
+        removed = [name for name in entry["labels"] if name not in labels]
+        issue = {"number": entry["number"], "updated_at": None}
+        try:
+            if patch:
+                response = await self.client.request("PATCH", path, json=patch,
+                                                     idempotent=True)
+                issue = response.json()
+            if added:
+                await self.client.request("POST", f"{path}/labels", json={"labels": added},
+                                          idempotent=True)
+            for name in removed:
+                try:
+                    await self.client.request("DELETE", f"{path}/labels/{quote(name, safe='')}",
+                                              idempotent=True)
+                except GitHubError as e:
+                    # Already removed on GitHub
+                    if e.status != 404:
+                        raise
+        except GitHubError as e:
+            if e.status in (404, 410):
+                # Deleted or transferred: forget it so the next run recreates it
+                self.state.forget(title)
+            result.failed[title] = str(e)
+            return
+        except requests.RequestException as e:
+            result.failed[title] = str(e)
+            return
+        if added or removed:
+            # Label requests bump updated_at without returning it
+            issue = {**issue, "updated_at": None}
+        self.state.record(title, issue, issue_data)
+        result.updated.append(title)
+
+    async def _add_labels(self, number: int, title: str, labels: list, result: SyncResult):
+        try:
+            # Adding labels an issue already has changes nothing, so the
+            # request is safe to repeat
+            await self.client.request("POST", f"{self.repo_path}/issues/{number}/labels",
+                                      json={"labels": labels}, idempotent=True)
+        except (GitHubError, requests.RequestException) as e:
+            result.failed[title] = str(e)
+            return
+        result.labelled.append(title)
+
+
+def label_color(name: str) -> str:
+    """A stable color for a label, derived from its name"""
+    return hashlib.sha1(name.encode()).hexdigest()[:6]
+
+
+def _missing_labels(issue: dict, labels: list) -> list:
+    present = {label["name"] if isinstance(label, dict) else label
+               for label in issue.get("labels", [])}
+    return [label for label in labels if label not in present]
+
+
+async def sync_issues(token: str, repo_name: str, issues: list,
+                      api_url: str = DEFAULT_API_URL,
+                      concurrency: int = DEFAULT_CONCURRENCY, ordered: bool = False,
+                      label: str = None, since: str = None, limiter: RateLimiter = None,
+                      state_path: Path = None, backend: str = "rest", batch_size: int = None):
+    """Sync issues into repo_name ('owner/name', or a repository of the
+    token's user), keeping incremental state in state_path if given;
+    backend 'graphql' creates issues in batches of batch_size mutations.
+    Returns the SyncResult and the (closed) client, whose latency log and
+    rate limiter hold the request statistics"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    with AsyncGitHub(token, api_url, concurrency, limiter=limiter) as client:
+        if "/" in repo_name:
+            owner, repo = repo_name.split("/", 1)
+        else:
+            owner, repo = (await client.get("/user"))["login"], repo_name
+        state = None
+        if state_path is not None:
+            # Keyed by API URL too, so a stand-in server never shares state with GitHub
+            state = IssueState(state_path, f"{client.api_url}/repos/{owner}/{repo}")
+        if backend == "graphql":
+            from issue_graphql import DEFAULT_BATCH_SIZE, GraphQLIssueSync
+
+            # The resolve query fails for a missing repository
+            sync = GraphQLIssueSync(client, owner, repo, batch_size or DEFAULT_BATCH_SIZE,
+                                    state=state)
+        else:
+            await client.get(f"/repos/{owner}/{repo}")
+            sync = IssueSync(client, owner, repo, state=state)
+        try:
+            result = await sync.run(issues, ordered, label, since)
+        finally:
+            if state is not None:
+                state.save()
+    return result, client
+
+
+def api_url_from_env() -> str:
+    """GITHUB_API_URL if set (as in GitHub Actions and GHES), else api.github.com"""
+    return os.environ.get("GITHUB_API_URL", DEFAULT_API_URL)
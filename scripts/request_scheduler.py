@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Rate-limit-aware pacing and retry decisions for GitHub API requests
+
+GitHub enforces a primary limit (a request budget per hour, reported on
+every response in X-RateLimit-Limit/Remaining/Reset) and secondary limits
+on bursts, especially of content-creating requests, which it signals with
+403 or 429 responses and usually a Retry-After header.
+
+RateLimiter keeps a token bucket in step with those headers: each request
+takes a token, the bucket refills when the window resets, and requests wait
+for the reset instead of failing once the budget runs out. Near the end of
+the budget requests are spread evenly over the rest of the window. Writes
+are spaced by an interval that doubles each time a secondary limit is hit
+and decays again as writes succeed, which settles at the fastest rate the
+server accepts. Rejected requests are retried after Retry-After, the reset
+time or an exponential backoff with jitter.
+"""
+
+import asyncio
+import random
+import time
+
+# Requests left in the window below which requests are spread out evenly
+PACE_BELOW = 50
+
+# Exponential backoff base and cap, in seconds, when GitHub gives no wait time
+BACKOFF_BASE = 1.0
+SECONDARY_BACKOFF_BASE = 60.0
+MAX_BACKOFF = 900.0
+
+# Write spacing after a secondary limit hit, and how quickly it decays back
+MIN_WRITE_INTERVAL = 1.0
+WRITE_INTERVAL_DECAY = 0.9
+
+WRITE_METHODS = frozenset(("POST", "PATCH", "PUT", "DELETE"))
+
+
+class RateLimiter:
+    """Token bucket and backoff policy fed by GitHub's rate-limit headers
+
+    reserve tokens are held back for other clients sharing the token.
+    max_retries bounds how often one request is retried.
+    """
+
+    def __init__(self, reserve: int = 0, write_interval: float = 0.0,
+                 max_retries: int = 5, clock=time.time, sleep=asyncio.sleep):
+        self.reserve = reserve
+        self.floor_write_interval = write_interval
+        self.write_interval = write_interval
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.waited = 0.0
+        self.retries = 0
+        self.limited = 0
+        self._next_request = 0.0
+        self._next_write = 0.0
+        self._slowed = float("-inf")
+        self._lock = None
+
+    async def acquire(self, method: str):
+        """Wait until a request may be sent, then take a token for it"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = self.clock()
+            if self.remaining is not None and self.reset is not None:
+                if now >= self.reset:
+                    # New window; the next response reports the real budget
+                    self.remaining = self.limit
+                elif self.remaining <= self.reserve:
+                    await self.wait(self.reset - now + 1)
+                    self.remaining = self.limit
+                    now = self.clock()
+            wait = self._next_request - now
+            if method in WRITE_METHODS:
+                wait = max(wait, self._next_write - now)
+            if wait > 0:
+                await self.wait(wait)
+                now = self.clock()
+            self._next_request = now + self._pace(now)
+            if method in WRITE_METHODS:
+                self._next_write = now + self.write_interval
+            if self.remaining is not None:
+                self.remaining -= 1
+
+    def _pace(self, now: float) -> float:
+        """Gap before the next request, spreading a low budget to the reset"""
+        if self.remaining is None or self.reset is None:
+            return 0.0
+        tokens = self.remaining - self.reserve
+        if tokens >= PACE_BELOW or self.reset <= now:
+            return 0.0
+        return (self.reset - now) / max(tokens, 1)
+
+    async def wait(self, seconds: float):
+        """Sleep, counting the time as waiting on rate limits"""
+        self.waited += seconds
+        await self.sleep(seconds)
+
+    def update(self, method: str, status: int, headers):
+        """Take the budget from a response's headers; note secondary limit
+        hits and successful writes for write pacing"""
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            remaining, reset = int(remaining), int(reset)
+            if self.reset is None or reset > self.reset:
+                # First response, or one from a new window
+                self.remaining, self.reset = remaining, reset
+            else:
+                # Responses arrive out of order; tokens taken by requests
+                # still in flight are already gone
+                self.remaining = min(self.remaining, remaining)
+            limit = headers.get("X-RateLimit-Limit")
+            if limit is not None:
+                self.limit = int(limit)
+        if method in WRITE_METHODS and status < 400:
+            self.write_interval = max(self.floor_write_interval,
+                                      self.write_interval * WRITE_INTERVAL_DECAY)
+
+    def retry_delay(self, method: str, status: int, headers, message: str,
+                    attempt: int, idempotent: bool = None):
+        """Seconds to wait before retrying a response, or None if it should
+        not be retried
+
+        Rate-limited requests were never processed, so any method may be
+        retried. Server errors are only retried for idempotent requests
+        (by default, reads); a write may have taken effect, so the caller
+        decides whether to repeat it.
+        """
+        if idempotent is None:
+            idempotent = method not in WRITE_METHODS
+        if attempt >= self.max_retries:
+            return None
+        if status in (403, 429) and is_rate_limited(status, headers, message):
+            self.limited += 1
+            retry_after = headers.get("Retry-After")
+            if retry_after is not None:
+                delay = float(retry_after)
+            elif headers.get("X-RateLimit-Remaining") == "0" and headers.get("X-RateLimit-Reset"):
+                delay = max(0.0, int(headers["X-RateLimit-Reset"]) - self.clock()) + 1
+            else:
+                delay = backoff(attempt, SECONDARY_BACKOFF_BASE)
+            if headers.get("X-RateLimit-Remaining") != "0":
+                # A secondary limit: hold writes until it lifts and space
+                # them further apart from then on. Concurrent requests hit
+                # the same limit, so slow down once per interval, not once
+                # per rejection.
+                now = self.clock()
+                if now >= self._slowed + self.write_interval:
+                    self.write_interval = max(MIN_WRITE_INTERVAL, self.write_interval * 2)
+                    self._slowed = now
+                self._next_write = max(self._next_write, now + delay)
+            return delay
+        if status >= 500 and idempotent:
+            return backoff(attempt)
+        return None
+
+
+def is_rate_limited(status: int, headers, message: str) -> bool:
+    """Whether a 403/429 response is a primary or secondary rate limit
+    rather than a permission error"""
+    if status == 429 or headers.get("Retry-After") is not None:
+        return True
+    if headers.get("X-RateLimit-Remaining") == "0":
+        return True
+    message = (message or "").lower()
+    return "rate limit" in message or "abuse" in message
+
+
+def backoff(attempt: int, base: float = BACKOFF_BASE) -> float:
+    """Exponential backoff, jittered over its upper half"""
+    delay = min(MAX_BACKOFF, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+NumPy batch engine for high-volume evidence generation
+
+Rows are built a whole column at a time: timestamps as int64 microseconds
+since the epoch, categorical fields as small integer codes, IPv4 addresses
+as uint32 and UUIDs as 16-byte blocks. They only become record tuples in
+``records()``, at the serialization edge.
+"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+
+from evidence_schema import (
+    ACCESS_ACTIONS, ACCESS_RESOURCES, ACCESS_STATUSES, ACCESS_ACTIVITY_RANGE,
+    AUDIT_ACTIONS, AUDIT_OBJECTS, AUDIT_ACTIVITY_RANGE,
+)
+from evidence_records import AccessLogRecord, AuditTrailRecord
+from temporal_model import activity_curve, department_profile
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Microseconds since the epoch for a (naive) datetime"""
+    return int(np.datetime64(value, 'us').astype(np.int64))
+
+
+def random_ipv4(rng: np.random.Generator, size: int) -> np.ndarray:
+    """Random unicast IPv4 addresses as uint32"""
+    first = rng.integers(1, 224, size=size, dtype=np.uint32)
+    rest = rng.integers(0, 1 << 24, size=size, dtype=np.uint32)
+    return (first << np.uint32(24)) | rest
+
+
+def random_uuid4(rng: np.random.Generator, size: int) -> np.ndarray:
+    """Random version 4 UUIDs as an (n, 16) uint8 array"""
+    blocks = rng.integers(0, 256, size=(size, 16), dtype=np.uint8)
+    blocks[:, 6] = (blocks[:, 6] & 0x0F) | 0x40
+    blocks[:, 8] = (blocks[:, 8] & 0x3F) | 0x80
+    return blocks
+
+
+def format_ipv4(ips: np.ndarray) -> list:
+    """Render uint32 addresses as dotted quads"""
+    octets = [((ips >> np.uint32(shift)) & np.uint32(0xFF)).tolist()
+              for shift in (24, 16, 8, 0)]
+    return [f"{a}.{b}.{c}.{d}" for a, b, c, d in zip(*octets)]
+
+
+def format_uuid(blocks: np.ndarray) -> list:
+    """Render (n, 16) UUID blocks in canonical 8-4-4-4-12 form"""
+    hexed = np.ascontiguousarray(blocks).tobytes().hex()
+    return [f"{hexed[i:i + 8]}-{hexed[i + 8:i + 12]}-{hexed[i + 12:i + 16]}-"
+            f"{hexed[i + 16:i + 20]}-{hexed[i + 20:i + 32]}"
+            for i in range(0, len(hexed), 32)]
+
+
+def format_timestamps(timestamps: np.ndarray) -> list:
+    """Convert int64 epoch microseconds to datetime objects"""
+    return timestamps.astype('datetime64[us]').tolist()
+
+
+def decode(table, codes: np.ndarray) -> list:
+    """Look up integer codes in a list of values"""
+    return [table[code] for code in codes.tolist()]
+
+
+class ColumnBatch:
+    """Base for columnar row blocks; subclasses list their array columns"""
+
+    columns = ()
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @classmethod
+    def merge(cls, batches):
+        """Combine batches covering the same time slice into one ordered batch
+
+        The sort is stable, so rows with equal timestamps keep the order of
+        the batches they came from.
+        """
+        first = batches[0]
+        if len(batches) == 1:
+            return first
+        timestamp = np.concatenate([batch.timestamp for batch in batches])
+        order = np.argsort(timestamp, kind='stable')
+        merged = {name: np.concatenate([getattr(batch, name) for batch in batches])[order]
+                  for name in cls.columns}
+        return cls(employee_ids=first.employee_ids, texts=first.texts, **merged)
+
+
+class AccessLogBatch(ColumnBatch):
+    """Columnar block of access-log rows in timestamp order"""
+
+    columns = ('timestamp', 'employee_index', 'action', 'resource', 'status',
+               'ip_address', 'details')
+    __slots__ = columns + ('employee_ids', 'texts')
+
+    def __init__(self, timestamp, employee_index, action, resource, status,
+                 ip_address, details, employee_ids, texts):
+        self.timestamp = timestamp
+        self.employee_index = employee_index
+        self.action = action
+        self.resource = resource
+        self.status = status
+        self.ip_address = ip_address
+        self.details = details
+        self.employee_ids = employee_ids
+        self.texts = texts
+
+    def records(self):
+        """Yield the rows as AccessLogRecords"""
+        rows = zip(format_timestamps(self.timestamp),
+                   decode(self.employee_ids, self.employee_index),
+                   decode(ACCESS_ACTIONS, self.action),
+                   decode(ACCESS_RESOURCES, self.resource),
+                   format_ipv4(self.ip_address),
+                   decode(ACCESS_STATUSES, self.status),
+                   decode(self.texts, self.details))
+        yield from map(AccessLogRecord._make, rows)
+
+
+class AuditTrailBatch(ColumnBatch):
+    """Columnar block of audit-trail rows in timestamp order"""
+
+    columns = ('timestamp', 'employee_index', 'action', 'object_type',
+               'object_id', 'old_value', 'new_value', 'ip_address', 'session_id')
+    __slots__ = columns + ('employee_ids', 'texts')
+
+    def __init__(self, timestamp, employee_index, action, object_type,
+                 object_id, old_value, new_value, ip_address, session_id,
+                 employee_ids, texts):
+        self.timestamp = timestamp
+        self.employee_index = employee_index
+        self.action = action
+        self.object_type = object_type
+        self.object_id = object_id
+        self.old_value = old_value
+        self.new_value = new_value
+        self.ip_address = ip_address
+        self.session_id = session_id
+        self.employee_ids = employee_ids
+        self.texts = texts
+
+    def records(self):
+        """Yield the rows as AuditTrailRecords"""
+        # Pre-encoded JSON strings, so the changes blob is plain concatenation
+        encoded = [json.dumps(text) for text in self.texts]
+        changes = [f'{{"old_value": {encoded[old]}, "new_value": {encoded[new]}}}'
+                   for old, new in zip(self.old_value.tolist(), self.new_value.tolist())]
+        rows = zip(format_timestamps(self.timestamp),
+                   decode(self.employee_ids, self.employee_index),
+                   decode(AUDIT_ACTIONS, self.action),
+                   decode(AUDIT_OBJECTS, self.object_type),
+                   format_uuid(self.object_id),
+                   changes,
+                   format_ipv4(self.ip_address),
+                   format_uuid(self.session_id))
+        yield from map(AuditTrailRecord._make, rows)
+
+
+def plan_slices(rows: int, start_date: datetime, end_date: datetime,
+                batch_rows: int = 65536) -> int:
+    """Number of time slices for about batch_rows rows each, at least daily"""
+    span = to_epoch_us(end_date) - to_epoch_us(start_date)
+    days = -(-span // (86400 * 1_000_000))
+    return max(1, min(span, max(days, -(-rows // batch_rows))))
+
+
+class BatchEngine:
+    """Vectorized access-log and audit-trail generation
+
+    The time window is cut into consecutive slices (see plan_slices). Each
+    employee's rows are spread over the slices with sequential binomial
+    draws, so every slice can be generated and sorted on its own and the
+    batches come out in global timestamp order. Engines that share a slice
+    plan produce batches that line up slice for slice and can be combined
+    with merge().
+
+    employee_range restricts the engine to a contiguous shard of
+    employee_ids; employee_index values stay global.
+
+    departments, aligned with employee_ids, selects each employee's
+    temporal_model activity profile; without it activity is uniform in
+    time. Rows are placed by drawing uniforms on the cumulative activity
+    scale and inverting the curve, so only the final merge of employees
+    within a slice sorts.
+    """
+
+    def __init__(self, employee_ids, details_texts, change_texts,
+                 seed=None, batch_rows: int = 65536, employee_range=None,
+                 departments=None):
+        self.employee_ids = employee_ids
+        self.details_texts = details_texts
+        self.change_texts = change_texts
+        self.rng = np.random.default_rng(seed)
+        self.batch_rows = batch_rows
+        self.employee_range = employee_range or (0, len(employee_ids))
+        self.departments = departments
+
+    def _profiles(self):
+        """(profile names, per-employee profile codes) for the shard"""
+        first, last = self.employee_range
+        if self.departments is None:
+            return ['uniform'], np.zeros(last - first, dtype=np.intp)
+        names = [department_profile(department)
+                 for department in self.departments[first:last]]
+        profiles = sorted(set(names))
+        lookup = {name: code for code, name in enumerate(profiles)}
+        return profiles, np.array([lookup[name] for name in names], dtype=np.intp)
+
+    def _slices(self, activity_range, start_date: datetime, end_date: datetime,
+                n_slices=None):
+        """Yield (timestamps, employee_index) for each time slice"""
+        rng = self.rng
+        low, high = activity_range
+        first, last = self.employee_range
+        employees = np.arange(first, last, dtype=np.int32)
+        if isinstance(low, int) and isinstance(high, int):
+            remaining = rng.integers(low, high + 1, size=len(employees))
+        else:
+            # Fractional range of a short incremental window: round each
+            # draw up with probability equal to its fractional part
+            rate = rng.uniform(low, high, size=len(employees))
+            remaining = np.floor(rate).astype(np.int64)
+            remaining += rng.random(len(employees)) < rate - remaining
+
+        start_us = to_epoch_us(start_date)
+        end_us = to_epoch_us(end_date)
+        span = end_us - start_us
+        if n_slices is None:
+            n_slices = plan_slices(int(remaining.sum()), start_date, end_date,
+                                   self.batch_rows)
+        bounds = start_us + span * np.arange(n_slices + 1, dtype=np.int64) // n_slices
+
+        # Share of each profile's activity before every slice boundary
+        profiles, codes = self._profiles()
+        curves = []
+        for profile in profiles:
+            curve = activity_curve(profile, start_date, end_date)
+            curves.append((np.array(curve.cumulative), np.array(curve.knots)))
+        before = np.array([np.interp((bounds - start_us) / 1e6, knots, cumulative)
+                           for cumulative, knots in curves])
+        before[:, 0], before[:, -1] = 0.0, 1.0
+
+        for k in range(n_slices):
+            lo, hi = int(bounds[k]), int(bounds[k + 1])
+            mass = before[:, k + 1] - before[:, k]
+            if k == n_slices - 1:
+                taken = remaining
+            else:
+                left = 1.0 - before[:, k]
+                share = np.divide(mass, left, out=np.ones_like(mass), where=left > 0)
+                taken = rng.binomial(remaining, np.clip(share, 0.0, 1.0)[codes])
+            remaining = remaining - taken
+
+            employee_index = np.repeat(employees, taken)
+            row_codes = np.repeat(codes, taken)
+            position = before[row_codes, k] + rng.random(len(row_codes)) * mass[row_codes]
+            seconds = np.empty(len(position))
+            for code, (cumulative, knots) in enumerate(curves):
+                rows = row_codes == code
+                seconds[rows] = np.interp(position[rows], cumulative, knots)
+            timestamps = np.clip(start_us + (seconds * 1e6).astype(np.int64), lo, hi - 1)
+            order = np.argsort(timestamps, kind='stable')
+            yield timestamps[order], employee_index[order]
+
+    def access_log_batches(self, start_date: datetime, end_date: datetime,
+                           n_slices=None, activity_range=ACCESS_ACTIVITY_RANGE):
+        """Yield AccessLogBatch blocks in timestamp order"""
+        rng = self.rng
+        for timestamps, employee_index in self._slices(activity_range,
+                                                       start_date, end_date,
+                                                       n_slices):
+            n = len(timestamps)
+            yield AccessLogBatch(
+                timestamp=timestamps,
+                employee_index=employee_index,
+                action=rng.integers(0, len(ACCESS_ACTIONS), size=n, dtype=np.uint8),
+                resource=rng.integers(0, len(ACCESS_RESOURCES), size=n, dtype=np.uint8),
+                status=rng.integers(0, len(ACCESS_STATUSES), size=n, dtype=np.uint8),
+                ip_address=random_ipv4(rng, n),
+                details=rng.integers(0, len(self.details_texts), size=n, dtype=np.uint32),
+                employee_ids=self.employee_ids,
+                texts=self.details_texts,
+            )
+
+    def audit_trail_batches(self, start_date: datetime, end_date: datetime,
+                            n_slices=None, activity_range=AUDIT_ACTIVITY_RANGE):
+        """Yield AuditTrailBatch blocks in timestamp order"""
+        rng = self.rng
+        for timestamps, employee_index in self._slices(activity_range,
+                                                       start_date, end_date,
+                                                       n_slices):
+            n = len(timestamps)
+            yield AuditTrailBatch(
+                timestamp=timestamps,
+                employee_index=employee_index,
+                action=rng.integers(0, len(AUDIT_ACTIONS), size=n, dtype=np.uint8),
+                object_type=rng.integers(0, len(AUDIT_OBJECTS), size=n, dtype=np.uint8),
+                object_id=random_uuid4(rng, n),
+                old_value=rng.integers(0, len(self.change_texts), size=n, dtype=np.uint32),
+                new_value=rng.integers(0, len(self.change_texts), size=n, dtype=np.uint32),
+                ip_address=random_ipv4(rng, n),
+                session_id=random_uuid4(rng, n),
+                employee_ids=self.employee_ids,
+                texts=self.change_texts,
+            )
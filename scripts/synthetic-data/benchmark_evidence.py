@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Benchmark the synthetic evidence generators
+
+Each benchmark runs at several scales (employees x days) with a fixed seed,
+in a fresh process so peak RSS belongs to that case alone. Results are
+saved as JSON and can be compared against a stored baseline:
+
+    python3 benchmark_evidence.py --scale 87x90 --scale 1000x90 \\
+        --output results.json --baseline baseline.json
+
+save_log_evidence generates and writes access logs end to end and runs
+once per --workers value, to show how the process pool scales:
+
+    python3 benchmark_evidence.py --engine numpy --benchmark save_log_evidence \\
+        --scale 20000x90 --workers 1 --workers 4
+
+--cold-start instead times short command-line runs from a fresh
+interpreter, where imports and start-up dominate.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+from generate_evidence import ENGINES, EvidenceGenerator
+from value_pools import DEFAULT_CACHE_DIR, DEFAULT_POOL_SIZE, ValuePools
+
+BENCHMARK_SEED = 20251015
+
+BENCHMARKS = (
+    'generate_access_logs',
+    'generate_audit_trails',
+    'generate_incident_reports',
+    'generate_risk_assessment_reports',
+    'save_evidence',
+    'save_log_evidence',
+)
+
+DEFAULT_SCALES = ('87x30', '87x90', '1000x90')
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Relative slowdown (or RSS growth) tolerated before a case is a regression
+DEFAULT_TOLERANCE = 0.10
+
+
+def parse_scale(value: str):
+    """Parse an EMPLOYEESxDAYS scale such as 1000x90"""
+    try:
+        employees, days = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected EMPLOYEESxDAYS, got '{value}'")
+    return employees, days
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_case(benchmark: str, employees: int, days: int, engine: str,
+             pool_size: int, pool_cache, workers: int = 1) -> dict:
+    """Run one benchmark case; executed in its own process"""
+    with tempfile.TemporaryDirectory() as output_dir, \
+            contextlib.redirect_stdout(io.StringIO()):
+        generator = EvidenceGenerator(Path(output_dir), engine=engine,
+                                      seed=BENCHMARK_SEED, workers=workers,
+                                      pools=ValuePools(pool_size, pool_cache),
+                                      employee_count=employees)
+        bytes_written = 0
+        if benchmark == 'save_log_evidence':
+            start = time.perf_counter()
+            result = generator.save_log_evidence('access_logs', days=days, fmt='ndjson')
+            elapsed = time.perf_counter() - start
+            rows = result.records
+            bytes_written = result.bytes_written
+        elif benchmark == 'save_evidence':
+            data = generator.generate_access_logs(days=days)
+            start = time.perf_counter()
+            result = generator.save_evidence('access_logs', data)
+            elapsed = time.perf_counter() - start
+            rows = result.records
+            bytes_written = result.bytes_written
+        else:
+            method = getattr(generator, benchmark)
+            if benchmark in ('generate_access_logs', 'generate_audit_trails'):
+                kwargs = {'days': days}
+            else:
+                # Report generators scale with the population, one per employee
+                kwargs = {'count': employees}
+                # Faker is built on first use; keep that out of the timing
+                generator.fake
+            start = time.perf_counter()
+            rows = len(method(**kwargs))
+            elapsed = time.perf_counter() - start
+
+    return {
+        'benchmark': benchmark,
+        'engine': engine,
+        'workers': workers,
+        'employees': employees,
+        'days': days,
+        'rows': rows,
+        'seconds': round(elapsed, 6),
+        'rows_per_sec': round(rows / elapsed, 1) if elapsed else None,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'bytes_written': bytes_written,
+    }
+
+
+def case_name(benchmark: str, workers: int) -> str:
+    if benchmark == 'save_log_evidence':
+        return f"{benchmark} [workers={workers}]"
+    return benchmark
+
+
+def run_benchmarks(benchmarks, scales, engine, repeat=1,
+                   pool_size=DEFAULT_POOL_SIZE, pool_cache=DEFAULT_CACHE_DIR,
+                   workers=(1,)):
+    """Run every benchmark at every scale, keeping the fastest of repeat runs
+
+    save_log_evidence runs once per workers value; the others use one process.
+    """
+    # Build the value pool cache once so no case pays for it
+    ValuePools(pool_size, pool_cache).pools
+
+    context = get_context('spawn')
+    results = []
+    for employees, days in scales:
+        cases = [(benchmark, count) for benchmark in benchmarks
+                 for count in (workers if benchmark == 'save_log_evidence' else (1,))]
+        for benchmark, count in cases:
+            best = None
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(run_case, benchmark, employees, days,
+                                         engine, pool_size, pool_cache, count).result()
+                if best is None or result['seconds'] < best['seconds']:
+                    best = result
+            print(f"{case_name(benchmark, count):<34} {employees:>7}x{days:<4} "
+                  f"{best['rows']:>10} rows {best['rows_per_sec'] or 0:>12,.0f} rows/s "
+                  f"{best['peak_rss_bytes'] / 2**20:>8.1f} MiB")
+            results.append(best)
+    return results
+
+
+def cold_start_commands(output_dir: str, pool_cache) -> dict:
+    """Name -> command line of the short runs timed by measure_cold_start"""
+    generate = [sys.executable, str(SCRIPT_DIR / 'generate_evidence.py'),
+                '--output-dir', output_dir, '--employees', '1', '--days', '1',
+                '--seed', str(BENCHMARK_SEED), '--pool-cache', str(pool_cache)]
+    return {
+        # Interpreter start-up alone, the floor for every other command
+        'python': [sys.executable, '-c', 'pass'],
+        'generate_access_logs_numpy': generate + ['--types', 'access_logs',
+                                                  '--engine', 'numpy'],
+        'generate_access_logs': generate + ['--types', 'access_logs'],
+        'generate_incident_reports': generate + ['--types', 'incident_reports'],
+        'validate_evidence': [sys.executable, str(SCRIPT_DIR / 'validate_evidence.py'),
+                              output_dir],
+    }
+
+
+def measure_cold_start(repeat=5, pool_cache=DEFAULT_CACHE_DIR) -> list:
+    """Wall time of each cold-start command, the fastest of repeat runs"""
+    ValuePools(cache_dir=pool_cache).pools
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name, command in cold_start_commands(output_dir, pool_cache).items():
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{name:<34} {best * 1000:>8.1f} ms")
+            results.append({'command': name, 'seconds': round(best, 6)})
+    return results
+
+
+def case_key(result: dict):
+    # Results from before the workers field ran in one process
+    return (result['benchmark'], result['engine'], result.get('workers', 1),
+            result['employees'], result['days'])
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return regression messages for results that fall behind the baseline"""
+    previous = {case_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(case_key(result))
+        if before is None:
+            continue
+        name = "{} {}x{} ({})".format(case_name(result['benchmark'], result.get('workers', 1)),
+                                      result['employees'], result['days'], result['engine'])
+        if before['rows_per_sec'] and result['rows_per_sec'] is not None and \
+                result['rows_per_sec'] < before['rows_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rows_per_sec']:,.0f} rows/s, "
+                               f"baseline {before['rows_per_sec']:,.0f}")
+        if result['peak_rss_bytes'] > before['peak_rss_bytes'] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {result['peak_rss_bytes'] / 2**20:.1f} MiB, "
+                               f"baseline {before['peak_rss_bytes'] / 2**20:.1f} MiB")
+    return regressions
+
+
+def compare_cold_start(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return regression messages for cold starts slower than the baseline"""
+    previous = {result['command']: result for result in baseline.get('cold_start', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result['command'])
+        if before is not None and result['seconds'] > before['seconds'] * (1 + tolerance):
+            regressions.append(f"{result['command']} cold start: "
+                               f"{result['seconds'] * 1000:.1f} ms, "
+                               f"baseline {before['seconds'] * 1000:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the synthetic evidence generators")
+    parser.add_argument('--scale', type=parse_scale, action='append',
+                        help="EMPLOYEESxDAYS, may be repeated "
+                             f"(default: {' '.join(DEFAULT_SCALES)})")
+    parser.add_argument('--benchmark', choices=BENCHMARKS, action='append',
+                        help="benchmark to run, may be repeated (default: all)")
+    parser.add_argument('--engine', choices=ENGINES, default='faker')
+    parser.add_argument('--workers', type=int, action='append',
+                        help="worker processes for save_log_evidence, may be repeated "
+                             "(default: 1)")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="runs per case; the fastest is kept")
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE)
+    parser.add_argument('--pool-cache', type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--output', type=Path,
+                        help="write results to this JSON file")
+    parser.add_argument('--baseline', type=Path,
+                        help="compare against a previous results file")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative regression before failing")
+    parser.add_argument('--cold-start', action='store_true',
+                        help="time short command-line runs from a fresh interpreter "
+                             "instead of the generator benchmarks")
+    args = parser.parse_args()
+
+    results, cold_start = [], []
+    if args.cold_start:
+        cold_start = measure_cold_start(max(args.repeat, 5), args.pool_cache)
+    else:
+        scales = args.scale or [parse_scale(scale) for scale in DEFAULT_SCALES]
+        results = run_benchmarks(args.benchmark or BENCHMARKS, scales, args.engine,
+                                 repeat=args.repeat, pool_size=args.pool_size,
+                                 pool_cache=args.pool_cache,
+                                 workers=args.workers or (1,))
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': BENCHMARK_SEED,
+        'results': results,
+        'cold_start': cold_start,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.tolerance) + \
+            compare_cold_start(cold_start, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Indexed employee roster shared by the evidence generators
+"""
+
+from array import array
+
+
+class AliasSampler:
+    """Weighted random choice in O(1) per draw (Walker's alias method)"""
+
+    __slots__ = ('_prob', '_alias')
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("Weights must contain a positive value")
+        scaled = [weight * n / total for weight in weights]
+        self._prob = array('d', [1.0]) * n
+        self._alias = array('I', range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._prob[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def __len__(self):
+        return len(self._prob)
+
+    def sample(self, rng) -> int:
+        """Draw an index with probability proportional to its weight"""
+        i = rng.randrange(len(self._prob))
+        return i if rng.random() < self._prob[i] else self._alias[i]
+
+
+class EmployeeDirectory:
+    """Employee roster held as parallel arrays with lookup indexes
+
+    Departments and access levels are stored as small integer codes, and
+    the positions of each department and access level are indexed up
+    front, so lookups by id and random selection (uniform, filtered or
+    weighted) cost O(1) however large the roster.
+    """
+
+    __slots__ = ('records', 'ids', 'departments', 'access_levels',
+                 'department_codes', 'access_level_codes',
+                 '_positions', '_groups', '_samplers')
+
+    def __init__(self, employees):
+        self.records = list(employees)
+        self.ids = [employee['employee_id'] for employee in self.records]
+        self.departments = sorted({employee['department'] for employee in self.records})
+        self.access_levels = sorted({employee['access_level'] for employee in self.records})
+        department_code = {name: code for code, name in enumerate(self.departments)}
+        access_level_code = {name: code for code, name in enumerate(self.access_levels)}
+        self.department_codes = array('B', (department_code[employee['department']]
+                                            for employee in self.records))
+        self.access_level_codes = array('B', (access_level_code[employee['access_level']]
+                                              for employee in self.records))
+        self._positions = {employee_id: i for i, employee_id in enumerate(self.ids)}
+        if len(self._positions) != len(self.ids):
+            raise ValueError("Employee ids must be unique")
+
+        self._groups = {(None, None): array('I', range(len(self.ids)))}
+        for i, (department, access_level) in enumerate(zip(self.department_codes,
+                                                           self.access_level_codes)):
+            for key in ((self.departments[department], None),
+                        (None, self.access_levels[access_level]),
+                        (self.departments[department], self.access_levels[access_level])):
+                self._groups.setdefault(key, array('I')).append(i)
+        self._samplers = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, employee_id):
+        return employee_id in self._positions
+
+    def __getitem__(self, employee_id) -> dict:
+        return self.records[self._positions[employee_id]]
+
+    def position(self, employee_id) -> int:
+        """Row of an employee in the parallel arrays"""
+        return self._positions[employee_id]
+
+    def group(self, department: str = None, access_level: str = None):
+        """Positions of the employees matching the filters"""
+        return self._groups.get((department, access_level), array('I'))
+
+    def count(self, department: str = None, access_level: str = None) -> int:
+        return len(self.group(department, access_level))
+
+    def choice(self, rng, department: str = None, access_level: str = None) -> str:
+        """Uniformly random employee id, optionally within a department
+        and/or access level"""
+        group = self.group(department, access_level)
+        if not group:
+            raise LookupError(f"No employees with department={department!r}, "
+                              f"access_level={access_level!r}")
+        return self.ids[group[rng.randrange(len(group))]]
+
+    def weighted_choice(self, rng, weights: dict, key: str = 'access_level') -> str:
+        """Random employee id weighted by the value of a field, e.g.
+        {'privileged': 3, 'admin': 2, 'standard': 1} for access_level
+
+        The alias table for each weighting is built once and reused.
+        """
+        cache_key = (key, tuple(sorted(weights.items())))
+        sampler = self._samplers.get(cache_key)
+        if sampler is None:
+            sampler = self._samplers[cache_key] = AliasSampler(
+                [weights.get(employee[key], 0) for employee in self.records])
+        return self.ids[sampler.sample(rng)]
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Columnar binary evidence datasets and a memory-mapped reader
+
+A dataset is a directory holding one raw little-endian array file per
+column and a meta.json describing dtypes and string dictionaries:
+
+- timestamp: int64 microseconds since the epoch
+- category fields (action, resource, status, object_type): uint8 codes into
+  the fixed domains in evidence_schema
+- dictionary fields (employee_id, details, audit changes): uint32 codes
+  into a string table
+- ip_address: uint32, UUID fields: 16 raw bytes
+
+Writing only needs the standard library; ColumnarReader needs NumPy.
+"""
+
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from evidence_io import WriteResult
+from evidence_records import RECORD_TYPES
+from evidence_schema import (
+    ACCESS_ACTIONS, ACCESS_RESOURCES, ACCESS_STATUSES,
+    AUDIT_ACTIONS, AUDIT_OBJECTS,
+)
+
+COLUMNAR_SUFFIX = '.columnar'
+META_FILE = 'meta.json'
+
+EPOCH = datetime(1970, 1, 1)
+ONE_US = timedelta(microseconds=1)
+
+# (field, kind, category domain or dictionary name) in the field order of
+# the evidence type's record tuple
+SCHEMAS = {
+    'access_logs': [
+        ('timestamp', 'timestamp', None),
+        ('employee_id', 'dictionary', 'employees'),
+        ('action', 'category', ACCESS_ACTIONS),
+        ('resource', 'category', ACCESS_RESOURCES),
+        ('ip_address', 'ipv4', None),
+        ('status', 'category', ACCESS_STATUSES),
+        ('details', 'dictionary', 'details'),
+    ],
+    'audit_trails': [
+        ('timestamp', 'timestamp', None),
+        ('employee_id', 'dictionary', 'employees'),
+        ('action', 'category', AUDIT_ACTIONS),
+        ('object_type', 'category', AUDIT_OBJECTS),
+        ('object_id', 'uuid', None),
+        ('changes', 'changes', 'change_values'),
+        ('ip_address', 'ipv4', None),
+        ('session_id', 'uuid', None),
+    ],
+}
+
+# kind -> (array typecode, numpy dtype, values per row)
+_STORAGE = {
+    'timestamp': ('q', 'i8', 1),
+    'dictionary': ('I', 'u4', 1),
+    'category': ('B', 'u1', 1),
+    'ipv4': ('I', 'u4', 1),
+    'uuid': ('B', 'u1', 16),
+}
+
+_BYTE_ORDER = '<' if sys.byteorder == 'little' else '>'
+
+
+def _column_files(field, kind):
+    """Files backing a field; audit changes are stored as old/new code pairs"""
+    if kind == 'changes':
+        return [(f"{field}.old", 'dictionary'), (f"{field}.new", 'dictionary')]
+    return [(field, kind)]
+
+
+def _encode_changes(value, index):
+    changes = json.loads(value)
+    return index(changes['old_value']), index(changes['new_value'])
+
+
+class ColumnarWriter:
+    """Append records or NumPy batches to a columnar dataset
+
+    Columns are buffered in memory chunk_size rows at a time and appended to
+    files in a temporary directory that is renamed into place on close.
+
+    Dictionaries grow in the order values are first written, or start as
+    the roster IDs and value pool of the first NumPy batch written.
+    """
+
+    def __init__(self, path: Path, evidence_type: str, chunk_size: int = 65536):
+        if evidence_type not in SCHEMAS:
+            raise ValueError(f"Columnar output is only available for {sorted(SCHEMAS)}")
+        self.path = Path(path)
+        self.evidence_type = evidence_type
+        self.schema = SCHEMAS[evidence_type]
+        self.record_type = RECORD_TYPES[evidence_type]
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self._pending = 0
+        self._tmp_dir = Path(tempfile.mkdtemp(dir=self.path.parent,
+                                              prefix=f".{self.path.name}."))
+        self._buffers = {}
+        self._files = {}
+        for field, kind, _ in self.schema:
+            for name, storage in _column_files(field, kind):
+                self._buffers[name] = array(_STORAGE[storage][0])
+                self._files[name] = open(self._tmp_dir / f"{name}.bin", 'wb')
+        self._dictionaries = {}
+        self._indexes = {}
+        self._remaps = {}
+        self._sources = {}
+        for _, kind, source in self.schema:
+            if kind in ('dictionary', 'changes'):
+                self._dictionaries.setdefault(source, [])
+                self._indexes.setdefault(source, {})
+        self._categories = {field: {value: code for code, value in enumerate(domain)}
+                            for field, kind, domain in self.schema if kind == 'category'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _seed(self, name: str, values):
+        """Start a dictionary with values, in their order"""
+        if self._dictionaries[name]:
+            raise ValueError(f"The '{name}' dictionary is already in use")
+        self._dictionaries[name] = list(values)
+        index = self._indexes[name]
+        for code, value in enumerate(values):
+            # Repeated values encode as their first occurrence, as in write()
+            index.setdefault(value, code)
+        self._sources[name] = values
+        if len(index) < len(values):
+            self._remaps[name] = [index[value] for value in values]
+
+    def _code(self, dictionary: str, value: str) -> int:
+        index = self._indexes[dictionary]
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(self._dictionaries[dictionary])
+            self._dictionaries[dictionary].append(value)
+        return code
+
+    def write(self, record):
+        """Append one evidence record, a record tuple or dict"""
+        buffers = self._buffers
+        if type(record) is not self.record_type:
+            record = [record[field] for field, _, _ in self.schema]
+        for (field, kind, source), value in zip(self.schema, record):
+            if kind == 'timestamp':
+                if isinstance(value, str):
+                    value = datetime.fromisoformat(value)
+                buffers[field].append((value - EPOCH) // ONE_US)
+            elif kind == 'category':
+                buffers[field].append(self._categories[field][value])
+            elif kind == 'dictionary':
+                buffers[field].append(self._code(source, value))
+            elif kind == 'ipv4':
+                buffers[field].append(int.from_bytes(socket.inet_aton(value), 'big'))
+            elif kind == 'uuid':
+                buffers[field].frombytes(uuid.UUID(value).bytes)
+            else:
+                old, new = _encode_changes(value, lambda text: self._code(source, text))
+                buffers[f"{field}.old"].append(old)
+                buffers[f"{field}.new"].append(new)
+        self._pending += 1
+        if self._pending >= self.chunk_size:
+            self._flush()
+
+    def write_batch(self, batch):
+        """Append a batch_engine batch without building per-row objects
+
+        The batch's employee list and text pool become the dataset's
+        dictionaries (or must match the ones it was seeded with), so every
+        batch written must share them.
+        """
+        self._flush()
+        dictionaries = {'employees': batch.employee_ids,
+                        'details' if self.evidence_type == 'access_logs'
+                        else 'change_values': batch.texts}
+        for name, values in dictionaries.items():
+            if not self._dictionaries[name]:
+                self._seed(name, values)
+            elif self._sources.get(name) is not values:
+                if self._dictionaries[name] != values:
+                    raise ValueError(f"Batches disagree on the '{name}' dictionary")
+                self._sources[name] = values
+        columns = {'employee_id': batch.employee_index}
+        for field, kind, _ in self.schema:
+            if kind == 'changes':
+                columns[f"{field}.old"] = batch.old_value
+                columns[f"{field}.new"] = batch.new_value
+            elif field != 'employee_id':
+                columns[field] = getattr(batch, field)
+        sources = {field: source for field, kind, source in self.schema
+                   if kind in ('dictionary', 'changes')}
+        for name, values in columns.items():
+            remap = self._remaps.get(sources.get(name.split('.')[0]))
+            if remap is not None:
+                import numpy as np
+
+                values = np.asarray(remap, dtype=values.dtype)[values]
+            dtype = self._dtype(name)
+            self._files[name].write(values.astype(dtype, copy=False).tobytes())
+        self.rows += len(batch)
+
+    def write_all(self, data):
+        """Write every record and/or NumPy batch from an iterable"""
+        for item in data:
+            if isinstance(item, (dict, tuple)):
+                self.write(item)
+            else:
+                self.write_batch(item)
+
+    def _dtype(self, name: str) -> str:
+        typecode = self._buffers[name].typecode
+        for code, dtype, _ in _STORAGE.values():
+            if code == typecode:
+                return _BYTE_ORDER + dtype
+        raise KeyError(name)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        for name, buffer in self._buffers.items():
+            buffer.tofile(self._files[name])
+            del buffer[:]
+        self.rows += self._pending
+        self._pending = 0
+
+    def close(self) -> WriteResult:
+        """Flush remaining rows, write meta.json and publish the dataset"""
+        self._flush()
+        for f in self._files.values():
+            f.close()
+        columns = {}
+        for field, kind, source in self.schema:
+            for name, storage in _column_files(field, kind):
+                _, dtype, width = _STORAGE[storage]
+                columns[name] = {'kind': kind, 'dtype': _BYTE_ORDER + dtype,
+                                 'width': width, 'file': f"{name}.bin"}
+                if kind == 'category':
+                    columns[name]['domain'] = list(source)
+                elif kind in ('dictionary', 'changes'):
+                    columns[name]['dictionary'] = source
+        meta = {
+            'evidence_type': self.evidence_type,
+            'rows': self.rows,
+            'fields': [field for field, _, _ in self.schema],
+            'columns': columns,
+            'dictionaries': {name: list(values)
+                             for name, values in self._dictionaries.items()},
+        }
+        with open(self._tmp_dir / META_FILE, 'w') as f:
+            json.dump(meta, f)
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        os.replace(self._tmp_dir, self.path)
+        return self.result
+
+    @property
+    def result(self) -> WriteResult:
+        directory = self.path if self.path.exists() else self._tmp_dir
+        size = sum(entry.stat().st_size for entry in directory.iterdir())
+        return WriteResult(path=self.path, records=self.rows, bytes_written=size)
+
+    def abort(self):
+        """Discard everything written so far"""
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+def write_columnar(path: Path, evidence_type: str, data) -> WriteResult:
+    """Write records and/or NumPy batches to a columnar dataset"""
+    with ColumnarWriter(path, evidence_type) as writer:
+        writer.write_all(data)
+    return writer.result
+
+
+class ColumnarReader:
+    """Memory-mapped view of a columnar evidence dataset
+
+    Columns are NumPy memmaps, so filters run over the raw arrays without
+    building Python objects; only the selected rows are decoded::
+
+        reader = ColumnarReader(path)
+        failed = reader['status'] == reader.code('status', 'failure')
+        rows = reader.time_range(start, end)
+        for record in reader.records(np.flatnonzero(failed[rows]) + rows.start):
+            ...
+    """
+
+    def __init__(self, path: Path):
+        import numpy as np
+
+        self._np = np
+        self.path = Path(path)
+        with open(self.path / META_FILE) as f:
+            self.meta = json.load(f)
+        self.evidence_type = self.meta['evidence_type']
+        self.rows = self.meta['rows']
+        self.dictionaries = self.meta['dictionaries']
+        self.columns = {}
+        for name, spec in self.meta['columns'].items():
+            shape = (self.rows, spec['width']) if spec['width'] > 1 else (self.rows,)
+            if self.rows:
+                self.columns[name] = np.memmap(self.path / spec['file'],
+                                               dtype=spec['dtype'], mode='r',
+                                               shape=shape)
+            else:
+                self.columns[name] = np.empty(shape, dtype=spec['dtype'])
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+    def code(self, field: str, value: str) -> int:
+        """Integer code stored for a category or dictionary value"""
+        spec = self.meta['columns'][field]
+        if spec['kind'] == 'category':
+            return spec['domain'].index(value)
+        return self.dictionaries[spec['dictionary']].index(value)
+
+    def time_range(self, start: datetime = None, end: datetime = None) -> slice:
+        """Row slice with start <= timestamp < end, by binary search"""
+        timestamps = self.columns['timestamp']
+        lo = 0 if start is None else int(timestamps.searchsorted((start - EPOCH) // ONE_US))
+        hi = self.rows if end is None else int(timestamps.searchsorted((end - EPOCH) // ONE_US))
+        return slice(lo, hi)
+
+    def records(self, rows=None):
+        """Decode rows (a slice, index array or None for all) into dicts"""
+        np = self._np
+        if rows is None:
+            rows = slice(0, self.rows)
+        decoded = {}
+        for field in self.meta['fields']:
+            spec = self.meta['columns'].get(field) or self.meta['columns'][f"{field}.old"]
+            kind = spec['kind']
+            if kind == 'timestamp':
+                values = self.columns[field][rows].astype('datetime64[us]').tolist()
+            elif kind == 'category':
+                domain = spec['domain']
+                values = [domain[code] for code in self.columns[field][rows].tolist()]
+            elif kind == 'dictionary':
+                table = self.dictionaries[spec['dictionary']]
+                values = [table[code] for code in self.columns[field][rows].tolist()]
+            elif kind == 'ipv4':
+                values = [socket.inet_ntoa(int(ip).to_bytes(4, 'big'))
+                          for ip in self.columns[field][rows].tolist()]
+            elif kind == 'uuid':
+                raw = np.ascontiguousarray(self.columns[field][rows]).tobytes()
+                values = [str(uuid.UUID(bytes=raw[i:i + 16]))
+                          for i in range(0, len(raw), 16)]
+            else:
+                table = self.dictionaries[spec['dictionary']]
+                values = [json.dumps({'old_value': table[old], 'new_value': table[new]})
+                          for old, new in zip(self.columns[f"{field}.old"][rows].tolist(),
+                                              self.columns[f"{field}.new"][rows].tolist())]
+            decoded[field] = values
+        fields = self.meta['fields']
+        for row in zip(*(decoded[field] for field in fields)):
+            yield dict(zip(fields, row))
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Sidecar offset indexes for random access into evidence files
+
+An index covers one uncompressed, time-ordered JSON or NDJSON evidence file
+written one record per line (as EvidenceWriter does). It lives next to the
+file in a <file>.index directory holding raw little-endian int64 arrays
+and a meta.json:
+
+- block_timestamps / block_offsets: time and byte offset of every
+  block_rows-th record, for time-range scans
+- posting_timestamps / posting_offsets: every record's time and offset,
+  grouped by employee (posting_starts marks where each employee's run
+  begins, in the order of meta.json's keys)
+
+Queries memory-map the data file and the arrays and binary search them, so
+an employee and time-range lookup reads only the matching lines:
+
+    python3 evidence_index.py build audit_evidence/access_logs_20251015.json
+    python3 evidence_index.py query audit_evidence/access_logs_20251015.json \\
+        --employee 6f1c... --start 2025-09-01 --end 2025-09-08
+
+Building and querying only need the standard library.
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from evidence_io import EvidenceEncoder
+
+INDEX_SUFFIX = '.index'
+META_FILE = 'meta.json'
+INDEX_VERSION = 1
+
+DEFAULT_BLOCK_ROWS = 1024
+
+ARRAYS = ('block_timestamps', 'block_offsets', 'posting_timestamps',
+          'posting_offsets', 'posting_starts')
+
+EPOCH = datetime(1970, 1, 1)
+ONE_US = timedelta(microseconds=1)
+
+
+def index_path(data_path: Path) -> Path:
+    """Sidecar index directory for an evidence file"""
+    data_path = Path(data_path)
+    return data_path.with_name(data_path.name + INDEX_SUFFIX)
+
+
+def to_epoch_us(value) -> int:
+    """Microseconds since the epoch for a datetime, date or ISO string"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return (value - EPOCH) // ONE_US
+
+
+def _record_bytes(line: bytes):
+    """The JSON object on a record line, or None for array brackets"""
+    line = line.strip()
+    if line.endswith(b','):
+        line = line[:-1]
+    if not line or line in (b'[', b']'):
+        return None
+    return line
+
+
+def _parse_line(line: bytes, path) -> dict:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        record = None
+    if not isinstance(record, dict):
+        raise ValueError(f"{path} does not hold one JSON record per line")
+    return record
+
+
+def build_index(data_path: Path, time_field: str = 'timestamp',
+                key_field: str = 'employee_id',
+                block_rows: int = DEFAULT_BLOCK_ROWS) -> Path:
+    """Scan an evidence file once and write its sidecar index"""
+    data_path = Path(data_path)
+    if data_path.suffix not in ('.json', '.ndjson'):
+        raise ValueError(f"Only uncompressed .json/.ndjson files can be indexed, "
+                         f"not {data_path.name}")
+    stat = data_path.stat()
+    block_timestamps = array('q')
+    block_offsets = array('q')
+    postings = {}
+    rows = 0
+    previous = None
+    offset = 0
+    with open(data_path, 'rb') as f:
+        for line in f:
+            line_offset = offset
+            offset += len(line)
+            text = _record_bytes(line)
+            if text is None:
+                continue
+            record = _parse_line(text, data_path)
+            timestamp = to_epoch_us(record[time_field])
+            if previous is not None and timestamp < previous:
+                raise ValueError(f"{data_path} is not in {time_field} order")
+            previous = timestamp
+            if rows % block_rows == 0:
+                block_timestamps.append(timestamp)
+                block_offsets.append(line_offset)
+            posting = postings.get(record[key_field])
+            if posting is None:
+                posting = postings[record[key_field]] = (array('q'), array('q'))
+            posting[0].append(timestamp)
+            posting[1].append(line_offset)
+            rows += 1
+
+    arrays = {name: array('q') for name in ARRAYS}
+    arrays['block_timestamps'] = block_timestamps
+    arrays['block_offsets'] = block_offsets
+    arrays['posting_starts'].append(0)
+    for timestamps, offsets in postings.values():
+        arrays['posting_timestamps'].extend(timestamps)
+        arrays['posting_offsets'].extend(offsets)
+        arrays['posting_starts'].append(len(arrays['posting_timestamps']))
+    if sys.byteorder != 'little':
+        for values in arrays.values():
+            values.byteswap()
+
+    meta = {
+        'version': INDEX_VERSION,
+        'data_file': data_path.name,
+        'data_size': stat.st_size,
+        'data_mtime_ns': stat.st_mtime_ns,
+        'rows': rows,
+        'block_rows': block_rows,
+        'time_field': time_field,
+        'key_field': key_field,
+        'keys': list(postings),
+    }
+    path = index_path(data_path)
+    tmp_dir = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}."))
+    try:
+        for name, values in arrays.items():
+            with open(tmp_dir / f"{name}.bin", 'wb') as f:
+                values.tofile(f)
+        with open(tmp_dir / META_FILE, 'w') as f:
+            json.dump(meta, f)
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp_dir, path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return path
+
+
+class EvidenceIndex:
+    """Query an indexed evidence file through memory maps
+
+        with EvidenceIndex(path) as index:
+            index.query(employee_id, start=datetime(2025, 9, 1),
+                        end=datetime(2025, 9, 8))
+
+    Start is inclusive and end exclusive; either may be None. An index
+    older than its data file is refused rather than silently misread.
+    """
+
+    def __init__(self, data_path: Path):
+        self.data_path = Path(data_path)
+        self.path = index_path(self.data_path)
+        with open(self.path / META_FILE) as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version in {self.path}")
+        stat = self.data_path.stat()
+        if (stat.st_size, stat.st_mtime_ns) != (self.meta['data_size'],
+                                                self.meta['data_mtime_ns']):
+            raise ValueError(f"{self.path} is stale; rebuild it with build_index")
+        self.time_field = self.meta['time_field']
+        self.key_field = self.meta['key_field']
+        self._keys = {key: i for i, key in enumerate(self.meta['keys'])}
+        self._maps = []
+        self._data = self._map(self.data_path)
+        self._arrays = {name: self._map(self.path / f"{name}.bin", 'q')
+                        for name in ARRAYS}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def _map(self, path: Path, fmt: str = None):
+        """Read-only memory map of a file, as int64 values if fmt is given"""
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return array('q') if fmt else b''
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        if fmt is None:
+            return mapped
+        if sys.byteorder != 'little':
+            values = array(fmt)
+            values.frombytes(mapped)
+            values.byteswap()
+            return values
+        view = memoryview(mapped).cast(fmt)
+        self._maps.insert(0, view)
+        return view
+
+    def close(self):
+        for mapped in self._maps:
+            if isinstance(mapped, memoryview):
+                mapped.release()
+            else:
+                mapped.close()
+        self._maps = []
+
+    def _line_at(self, offset: int):
+        """(record bytes, offset of the next line) for the line at offset"""
+        data = self._data
+        end = data.find(b'\n', offset)
+        if end < 0:
+            end = len(data)
+        return _record_bytes(data[offset:end]), end + 1
+
+    def record_at(self, offset: int) -> dict:
+        """Decode the record starting at a byte offset"""
+        return _parse_line(self._line_at(offset)[0], self.data_path)
+
+    def records(self, start=None, end=None):
+        """Yield records with start <= time < end, scanning from the block
+        that contains start"""
+        timestamps = self._arrays['block_timestamps']
+        if not len(timestamps):
+            return
+        start_us = None if start is None else to_epoch_us(start)
+        end_us = None if end is None else to_epoch_us(end)
+        block = 0 if start_us is None else \
+            max(bisect.bisect_left(timestamps, start_us) - 1, 0)
+        offset = self._arrays['block_offsets'][block]
+        size = len(self._data)
+        while offset < size:
+            text, offset = self._line_at(offset)
+            if text is None:
+                continue
+            record = _parse_line(text, self.data_path)
+            timestamp = to_epoch_us(record[self.time_field])
+            if start_us is not None and timestamp < start_us:
+                continue
+            if end_us is not None and timestamp >= end_us:
+                return
+            yield record
+
+    def employee_records(self, employee_id: str, start=None, end=None) -> list:
+        """An employee's records with start <= time < end, read by offset"""
+        position = self._keys.get(employee_id)
+        if position is None:
+            return []
+        starts = self._arrays['posting_starts']
+        lo, hi = starts[position], starts[position + 1]
+        timestamps = self._arrays['posting_timestamps']
+        if start is not None:
+            lo = bisect.bisect_left(timestamps, to_epoch_us(start), lo, hi)
+        if end is not None:
+            hi = bisect.bisect_left(timestamps, to_epoch_us(end), lo, hi)
+        offsets = self._arrays['posting_offsets']
+        return [self.record_at(offsets[i]) for i in range(lo, hi)]
+
+    def query(self, employee_id: str = None, start=None, end=None) -> list:
+        """Records matching an optional employee and time range"""
+        if employee_id is not None:
+            return self.employee_records(employee_id, start, end)
+        return list(self.records(start, end))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query evidence offset indexes")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="index one or more evidence files")
+    build.add_argument('paths', type=Path, nargs='+')
+    build.add_argument('--time-field', default='timestamp')
+    build.add_argument('--key-field', default='employee_id')
+    build.add_argument('--block-rows', type=int, default=DEFAULT_BLOCK_ROWS)
+    query = commands.add_parser('query', help="print matching records as NDJSON")
+    query.add_argument('path', type=Path)
+    query.add_argument('--employee', help="employee_id to select")
+    query.add_argument('--start', help="inclusive ISO date or timestamp")
+    query.add_argument('--end', help="exclusive ISO date or timestamp")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        for path in args.paths:
+            built = build_index(path, args.time_field, args.key_field, args.block_rows)
+            print(f"Indexed {path}: {built}")
+        return
+    encode = EvidenceEncoder(ensure_ascii=False).encode
+    with EvidenceIndex(args.path) as index:
+        for record in index.query(args.employee, args.start, args.end):
+            print(encode(record))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+Streaming, atomic writers and readers for synthetic evidence files
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+
+from evidence_records import is_record, json_encoder, record_fields, record_value
+
+# CSV holds flat records only: a header row, then one row per record
+FORMATS = ('json', 'ndjson', 'csv')
+FORMAT_SUFFIXES = {'json': '.json', 'ndjson': '.ndjson', 'csv': '.csv'}
+
+# gzip ships with Python; zstd needs the optional 'zstandard' package
+COMPRESSIONS = ('gzip', 'zstd')
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+MANIFEST_FILE = 'manifest.json'
+
+# mkstemp creates files as 0600; published evidence gets the usual mode
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class EvidenceEncoder(json.JSONEncoder):
+    """JSON encoder for evidence records"""
+
+    def default(self, o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return super().default(o)
+
+
+@dataclass
+class WriteResult:
+    """Outcome of writing one evidence file or dataset"""
+    path: Path
+    records: int
+    bytes_written: int
+    sha256: str = None
+
+
+class _HashingFile:
+    """Write-only wrapper that counts and hashes bytes on their way to disk"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.raw.write(data)
+        self.size += len(data)
+        self.sha256.update(data)
+        return len(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd compression needs the 'zstandard' package "
+                           "(pip3 install zstandard)")
+    return zstandard
+
+
+def _compressor(fileobj, compression):
+    """Wrap fileobj in a streaming compressor"""
+    if compression is None:
+        return fileobj
+    if compression == 'gzip':
+        # mtime=0 keeps output byte-identical across runs
+        return gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=6, mtime=0)
+    if compression == 'zstd':
+        return _zstandard().ZstdCompressor().stream_writer(fileobj, closefd=False)
+    raise ValueError(f"Unknown compression '{compression}', expected one of {COMPRESSIONS}")
+
+
+def _decompressor(fileobj, compression):
+    """Wrap fileobj in a streaming decompressor"""
+    if compression is None:
+        return fileobj
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if compression == 'zstd':
+        return _zstandard().ZstdDecompressor().stream_reader(fileobj)
+    raise ValueError(f"Unknown compression '{compression}', expected one of {COMPRESSIONS}")
+
+
+def evidence_suffix(fmt: str, compression: str = None) -> str:
+    """File suffix for a format and compression, e.g. .ndjson.gz"""
+    return FORMAT_SUFFIXES[fmt] + COMPRESSION_SUFFIXES[compression]
+
+
+def _csv_cell(field: str, value):
+    if value.__class__ is str:
+        return value
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list, tuple)):
+        raise ValueError(f"CSV evidence needs flat records, but '{field}' holds "
+                         f"a {type(value).__name__}")
+    return value
+
+
+def _csv_line(fields):
+    """Function rendering one row of values as a CSV line, without the newline"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def line(values):
+        writer.writerow([_csv_cell(field, value) for field, value in zip(fields, values)])
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text[:-1]
+
+    return line
+
+
+def record_encoder(fmt: str, fields=None):
+    """Function encoding one record (a dict or record tuple) as a line of fmt
+
+    CSV lines hold the values of fields, in order, so it needs them.
+    """
+    if fmt != 'csv':
+        return json_encoder(EvidenceEncoder(ensure_ascii=False).encode)
+    if not fields:
+        raise ValueError("CSV evidence needs its field names")
+    fields = tuple(fields)
+    line = _csv_line(fields)
+
+    def encode_record(record):
+        if is_record(record) and record._fields == fields:
+            return line(record)
+        return line([record_value(record, field) for field in fields])
+
+    return encode_record
+
+
+class EvidenceWriter:
+    """Incremental, atomic writer for one evidence file
+
+    Records are encoded as they arrive and flushed chunk_size at a time,
+    through an optional gzip/zstd stream, to a temporary file in the
+    destination directory. The temporary file is renamed over path only when
+    the writer is closed cleanly; on error it is removed, so a failed run
+    never leaves a partial artifact behind.
+
+    bytes_written counts bytes on disk, after compression.
+
+    CSV files start with a header of fields, or of the first record's field
+    names when fields is None; pre-encoded CSV lines need fields.
+    """
+
+    def __init__(self, path: Path, fmt: str = 'json', chunk_size: int = 1000,
+                 compression: str = None, fields=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown evidence format '{fmt}', expected one of {FORMATS}")
+        self.path = Path(path)
+        self.fmt = fmt
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self.records = 0
+        self.fields = None
+        self._encode = None
+        self._chunk = []
+        fd, self._tmp_name = tempfile.mkstemp(dir=self.path.parent,
+                                              prefix=f".{self.path.name}.",
+                                              suffix='.tmp')
+        os.chmod(self._tmp_name, 0o666 & ~_UMASK)
+        self._raw = os.fdopen(fd, 'wb')
+        self._hashing = _HashingFile(self._raw)
+        try:
+            self._stream = _compressor(self._hashing, compression)
+        except Exception:
+            self.abort()
+            raise
+        if fmt == 'json':
+            self._write_raw('[\n')
+        if fields:
+            self._set_fields(fields)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def bytes_written(self) -> int:
+        return self._hashing.size
+
+    @property
+    def rows(self) -> int:
+        """Records accepted so far, including any not yet flushed"""
+        return self.records + len(self._chunk)
+
+    def _write_raw(self, text: str):
+        self._stream.write(text.encode('utf-8'))
+
+    def _set_fields(self, fields):
+        self.fields = tuple(fields)
+        self._encode = record_encoder(self.fmt, self.fields)
+        if self.fmt == 'csv':
+            self._write_raw(_csv_line(self.fields)(self.fields) + '\n')
+
+    def _flush_chunk(self):
+        if not self._chunk:
+            return
+        if self.fmt != 'json':
+            self._write_raw('\n'.join(self._chunk) + '\n')
+        else:
+            prefix = ',\n' if self.records else ''
+            self._write_raw(prefix + ',\n'.join(self._chunk))
+        self.records += len(self._chunk)
+        self._chunk = []
+
+    def write(self, record):
+        """Queue one record, flushing a full chunk to disk"""
+        if self._encode is None:
+            self._set_fields(record_fields(record))
+        self.write_encoded(self._encode(record))
+
+    def write_encoded(self, text: str, timestamp=None):
+        """Queue one record that has already been encoded by record_encoder
+
+        timestamp is accepted for interface parity with ChunkedEvidenceWriter.
+        """
+        if self.fmt == 'csv' and self.fields is None:
+            raise ValueError("Pre-encoded CSV lines need the writer's fields")
+        self._chunk.append(text)
+        if len(self._chunk) >= self.chunk_size:
+            self._flush_chunk()
+
+    def write_all(self, records):
+        """Write every record from an iterable"""
+        for record in records:
+            self.write(record)
+
+    def close(self) -> WriteResult:
+        """Flush remaining records and atomically publish the file"""
+        self._flush_chunk()
+        if self.fmt == 'json':
+            self._write_raw('\n]\n' if self.records else ']\n')
+        if self._stream is not self._hashing:
+            self._stream.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        os.replace(self._tmp_name, self.path)
+        return self.result
+
+    def abort(self):
+        """Discard everything written so far"""
+        self._raw.close()
+        if os.path.exists(self._tmp_name):
+            os.unlink(self._tmp_name)
+
+    @property
+    def result(self) -> WriteResult:
+        return WriteResult(path=self.path, records=self.records,
+                           bytes_written=self.bytes_written,
+                           sha256=self._hashing.sha256.hexdigest())
+
+
+def write_evidence(path: Path, records, fmt: str = 'json',
+                   chunk_size: int = 1000, compression: str = None,
+                   fields=None) -> WriteResult:
+    """Stream records to path as a JSON array, NDJSON or CSV"""
+    with EvidenceWriter(path, fmt=fmt, chunk_size=chunk_size,
+                        compression=compression, fields=fields) as writer:
+        writer.write_all(records)
+    return writer.result
+
+
+def atomic_write_text(path: Path, data: str):
+    """Replace path with data, so readers see the old or the new file only"""
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.",
+                                    suffix='.tmp')
+    os.chmod(tmp_name, 0o666 & ~_UMASK)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+class ChunkedEvidenceWriter:
+    """Write an evidence stream as numbered chunk files plus a manifest
+
+    A new chunk is started once the current one holds max_rows records or
+    max_bytes bytes on disk. The manifest lists every chunk's file, row
+    count, size, SHA-256 and the range of time_field it covers, so loaders
+    can read chunks in parallel and skip those outside a time range. The
+    dataset directory is published atomically on close.
+
+    With append=True an existing dataset is extended instead: new chunks
+    continue its numbering and the manifest is replaced atomically on close,
+    so readers see either the old or the new set of chunks.
+    """
+
+    def __init__(self, directory: Path, evidence_type: str, time_field: str,
+                 fmt: str = 'ndjson', compression: str = None,
+                 max_rows: int = None, max_bytes: int = None,
+                 chunk_size: int = 1000, append: bool = False, fields=None):
+        self.path = Path(directory)
+        self.evidence_type = evidence_type
+        self.time_field = time_field
+        self.fmt = fmt
+        self.compression = compression
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.fields = fields
+        self.chunks = []
+        self.appending = append and (self.path / MANIFEST_FILE).exists()
+        if self.appending:
+            manifest = read_manifest(self.path)
+            existing = (manifest['evidence_type'], manifest['format'],
+                        manifest['compression'])
+            if existing != (evidence_type, fmt, compression):
+                raise ValueError(f"Cannot append {evidence_type} as {fmt}/{compression} "
+                                 f"to {self.path}, which holds "
+                                 "{} as {}/{}".format(*existing))
+            self.chunks = manifest['chunks']
+            self._tmp_dir = self.path
+        else:
+            self._tmp_dir = Path(tempfile.mkdtemp(dir=self.path.parent,
+                                                  prefix=f".{self.path.name}."))
+            os.chmod(self._tmp_dir, 0o777 & ~_UMASK)
+        self._existing = len(self.chunks)
+        self._writer = None
+        self._first = None
+        self._last = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _open_chunk(self):
+        name = f"part-{len(self.chunks):05d}{evidence_suffix(self.fmt, self.compression)}"
+        self._writer = EvidenceWriter(self._tmp_dir / name, fmt=self.fmt,
+                                      chunk_size=self.chunk_size,
+                                      compression=self.compression,
+                                      fields=self.fields)
+        self._first = self._last = None
+
+    def _close_chunk(self):
+        result = self._writer.close()
+        self.chunks.append({
+            'file': result.path.name,
+            'rows': result.records,
+            'bytes': result.bytes_written,
+            'sha256': result.sha256,
+            'start': _isoformat(self._first),
+            'end': _isoformat(self._last),
+        })
+        self._writer = None
+
+    def write(self, record):
+        """Append one record"""
+        if self._writer is None:
+            self._open_chunk()
+        self._writer.write(record)
+        self._written(record_value(record, self.time_field))
+
+    def write_encoded(self, text: str, timestamp=None):
+        """Append one pre-encoded record whose time_field value is timestamp"""
+        if self._writer is None:
+            self._open_chunk()
+        self._writer.write_encoded(text)
+        self._written(timestamp)
+
+    def _written(self, timestamp):
+        """Track the chunk's time range and rotate it once it is full"""
+        if timestamp is not None:
+            if self._first is None or timestamp < self._first:
+                self._first = timestamp
+            if self._last is None or timestamp > self._last:
+                self._last = timestamp
+        if (self.max_rows and self._writer.rows >= self.max_rows) or \
+                (self.max_bytes and self._writer.bytes_written >= self.max_bytes):
+            self._close_chunk()
+
+    def write_all(self, records):
+        """Write every record from an iterable"""
+        for record in records:
+            self.write(record)
+
+    @property
+    def manifest(self) -> dict:
+        return {
+            'evidence_type': self.evidence_type,
+            'format': self.fmt,
+            'compression': self.compression,
+            'time_field': self.time_field,
+            'rows': sum(chunk['rows'] for chunk in self.chunks),
+            'bytes': sum(chunk['bytes'] for chunk in self.chunks),
+            'chunks': self.chunks,
+        }
+
+    def close(self) -> WriteResult:
+        """Finish the last chunk, write the manifest and publish the dataset"""
+        if self._writer is not None:
+            self._close_chunk()
+        manifest = self.manifest
+        if self.appending:
+            atomic_write_text(self.path / MANIFEST_FILE, json.dumps(manifest, indent=2))
+            return self.result
+        with open(self._tmp_dir / MANIFEST_FILE, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        os.replace(self._tmp_dir, self.path)
+        return self.result
+
+    @property
+    def result(self) -> WriteResult:
+        manifest = self.manifest
+        return WriteResult(path=self.path, records=manifest['rows'],
+                           bytes_written=manifest['bytes'])
+
+    def abort(self):
+        """Discard every chunk written so far"""
+        if self._writer is not None:
+            self._writer.abort()
+        if self.appending:
+            for chunk in self.chunks[self._existing:]:
+                (self.path / chunk['file']).unlink(missing_ok=True)
+            del self.chunks[self._existing:]
+        else:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+def read_manifest(directory: Path) -> dict:
+    """Load a chunked dataset's manifest"""
+    with open(Path(directory) / MANIFEST_FILE) as f:
+        return json.load(f)
+
+
+def _split_suffix(path: Path):
+    """(format, compression) from a file name such as part-00000.ndjson.gz"""
+    name = path.name
+    compression = None
+    for candidate, suffix in COMPRESSION_SUFFIXES.items():
+        if candidate and name.endswith(suffix):
+            compression = candidate
+            name = name[:-len(suffix)]
+    for fmt, suffix in FORMAT_SUFFIXES.items():
+        if name.endswith(suffix):
+            return fmt, compression
+    raise ValueError(f"Not an evidence file: {path}")
+
+
+def _iter_lines(stream, block_size: int = 1 << 20):
+    """Split a binary stream into lines, block by block"""
+    pending = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def iter_file_records(path: Path):
+    """Stream the records of one evidence file, compressed or not
+
+    NDJSON and the one-record-per-line JSON arrays written by EvidenceWriter
+    are parsed line by line; any other JSON falls back to a full parse. CSV
+    values are read back as strings, with empty cells as None.
+    """
+    path = Path(path)
+    fmt, compression = _split_suffix(path)
+    with open(path, 'rb') as raw:
+        stream = _decompressor(raw, compression)
+        if fmt == 'csv':
+            text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+            for row in csv.DictReader(text):
+                yield {field: value if value != '' else None
+                       for field, value in row.items()}
+            return
+        lines = (line.decode('utf-8') for line in _iter_lines(stream))
+        if fmt == 'ndjson':
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        head = [next(lines, ''), next(lines, '')]
+        first, second = (line.strip() for line in head)
+        if first != '[' or not (second in (']', '') or
+                                second.startswith('{') and second.rstrip(',').endswith('}')):
+            # Not the line-per-record layout, e.g. an indented json.dump
+            text = '\n'.join([*head, *lines])
+            yield from json.loads(text) if text.strip() else []
+            return
+        for line in itertools.chain([second], lines):
+            line = line.strip()
+            if line in ('', ']'):
+                continue
+            yield json.loads(line[:-1] if line.endswith(',') else line)
+
+
+def iter_records(path: Path, start=None, end=None):
+    """Stream records from an evidence file or chunked dataset directory
+
+    For chunked datasets, start/end (inclusive, datetime or ISO string)
+    skip whole chunks outside the range using the manifest, and filter the
+    remaining records on the manifest's time field.
+    """
+    path = Path(path)
+    if not path.is_dir():
+        yield from iter_file_records(path)
+        return
+
+    manifest = read_manifest(path)
+    start = _isoformat(start)
+    end = _isoformat(end)
+    field = manifest['time_field']
+    for chunk in manifest['chunks']:
+        if start is not None and chunk['end'] is not None and chunk['end'] < start:
+            continue
+        if end is not None and chunk['start'] is not None and chunk['start'] > end:
+            continue
+        for record in iter_file_records(path / chunk['file']):
+            value = record.get(field)
+            if value is None and (start is not None or end is not None):
+                # Without a time it is in no range; validate_evidence reports it
+                continue
+            if start is not None and value < start:
+                continue
+            if end is not None and value > end:
+                continue
+            yield record
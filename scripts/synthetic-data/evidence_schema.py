@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Field domains shared by the synthetic evidence generators
+"""
+
+ACCESS_ACTIONS = ['login', 'logout', 'file_access', 'system_change']
+ACCESS_RESOURCES = ['database', 'file_system', 'api_gateway', 'admin_panel']
+ACCESS_STATUSES = ['success', 'failure']
+
+AUDIT_ACTIONS = ['create', 'update', 'delete', 'view']
+AUDIT_OBJECTS = ['customer_record', 'financial_transaction',
+                 'configuration_change', 'access_request']
+
+DEPARTMENTS = ['Engineering', 'Product', 'Sales', 'Marketing', 'Finance',
+               'HR', 'Operations', 'Security', 'Legal']
+JOB_TITLES = {
+    'Engineering': ['Software Engineer', 'DevOps Engineer', 'QA Engineer'],
+    'Product': ['Product Manager', 'Product Owner', 'UX Designer'],
+    'Sales': ['Account Executive', 'Business Development Rep', 'Sales Engineer'],
+    'Marketing': ['Marketing Manager', 'Content Creator', 'Growth Hacker'],
+    'Finance': ['Financial Analyst', 'Accountant', 'Controller'],
+    'HR': ['HR Generalist', 'Recruiter', 'Benefits Administrator'],
+    'Operations': ['Operations Manager', 'Project Manager', 'Business Analyst'],
+    'Security': ['Security Engineer', 'Compliance Officer', 'Incident Responder'],
+    'Legal': ['Legal Counsel', 'Contract Manager', 'Privacy Officer'],
+}
+ACCESS_LEVELS = ['standard', 'admin', 'privileged']
+
+INCIDENT_TYPES = ['security', 'compliance', 'operational']
+INCIDENT_SEVERITIES = ['low', 'medium', 'high', 'critical']
+
+RISK_CATEGORIES = ['strategic', 'operational', 'financial', 'compliance']
+RISK_LIKELIHOODS = ['low', 'medium', 'high']
+RISK_IMPACTS = ['minimal', 'moderate', 'significant', 'critical']
+RISK_SCORE_RANGE = (1.0, 10.0)
+
+# Rows generated per employee over the whole window
+ACCESS_ACTIVITY_RANGE = (50, 200)
+AUDIT_ACTIVITY_RANGE = (20, 100)
+
+# Field each evidence type is ordered and range-filtered by
+TIME_FIELDS = {
+    'employees': 'hire_date',
+    'access_logs': 'timestamp',
+    'audit_trails': 'timestamp',
+    'incident_reports': 'reported_date',
+    'risk_assessment_reports': 'review_date',
+}
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Watermark state for incremental evidence generation
+
+The state file holds what must stay fixed between runs (the run seed, the
+employee roster, and the rows per employee over the original window, which
+set the activity rate) and, per evidence type, the watermark: the end of the
+last window appended to that type's dataset.
+"""
+
+import json
+from datetime import date, datetime
+from pathlib import Path
+
+from evidence_io import EvidenceEncoder, atomic_write_text
+
+STATE_FILE = 'evidence_state.json'
+
+STATE_VERSION = 1
+
+
+def new_state(seed: int, employees, days: int, fmt: str, compression: str = None,
+              activity_ranges: dict = None) -> dict:
+    """State for a generator's first incremental run"""
+    return {
+        'version': STATE_VERSION,
+        'seed': seed,
+        'days': days,
+        'format': fmt,
+        'compression': compression,
+        'activity_ranges': activity_ranges or {},
+        'employees': employees,
+        'datasets': {},
+    }
+
+
+def load_state(path: Path):
+    """Load a state file, or None if there is none yet"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        raise ValueError(f"Unsupported state file version in {path}")
+    for employee in state['employees']:
+        employee['hire_date'] = date.fromisoformat(employee['hire_date'])
+    state['activity_ranges'] = {evidence_type: tuple(activity_range)
+                                for evidence_type, activity_range
+                                in state.get('activity_ranges', {}).items()}
+    for dataset in state['datasets'].values():
+        dataset['watermark'] = datetime.fromisoformat(dataset['watermark'])
+    return state
+
+
+def save_state(path: Path, state: dict):
+    """Atomically replace the state file"""
+    atomic_write_text(path, json.dumps(state, cls=EvidenceEncoder, indent=2))
+
+
+def scale_activity(activity_range, fraction: float):
+    """Per-employee row range for a window that is fraction of the original
+    
+    The bounds stay fractional: rounding them would give short windows no
+    rows at all. The generators round each employee's draw at random
+    instead, so the expected rows per day match the original window.
+    """
+    low, high = activity_range
+    return low * fraction, high * fraction
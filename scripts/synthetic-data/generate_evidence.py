@@ -3,225 +3,938 @@
 Generate synthetic evidence for SOC 2 audit
 """
 
+import argparse
 import csv
+import functools
+import hashlib
+import heapq
+import itertools
 import json
+import pickle
 import random
-from datetime import datetime, timedelta
+import tempfile
+import uuid
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from operator import attrgetter, itemgetter
 from pathlib import Path
-from faker import Faker
 
-fake = Faker()
+from employee_directory import EmployeeDirectory
+from evidence_columnar import COLUMNAR_SUFFIX, ColumnarWriter
+from evidence_index import build_index
+from evidence_io import (
+    COMPRESSIONS, ChunkedEvidenceWriter, EvidenceWriter, FORMATS,
+    evidence_suffix, record_encoder,
+)
+from evidence_records import RECORD_TYPES, AccessLogRecord, AuditTrailRecord
+from evidence_schema import (
+    ACCESS_ACTIONS, ACCESS_LEVELS, ACCESS_RESOURCES, ACCESS_STATUSES,
+    ACCESS_ACTIVITY_RANGE, AUDIT_ACTIONS, AUDIT_OBJECTS, AUDIT_ACTIVITY_RANGE,
+    DEPARTMENTS, INCIDENT_SEVERITIES, INCIDENT_TYPES, JOB_TITLES,
+    RISK_CATEGORIES, RISK_IMPACTS, RISK_LIKELIHOODS, RISK_SCORE_RANGE, TIME_FIELDS,
+)
+from progress import ProgressReporter
+from run_metrics import RunMetrics
+from evidence_state import STATE_FILE, load_state, new_state, save_state, scale_activity
+from temporal_model import activity_curve, department_profile
+from value_pools import DEFAULT_CACHE_DIR, DEFAULT_POOL_SIZE, ValuePools, make_faker
 
-# Install faker if needed
-try:
-    from faker import Faker
-except ImportError:
-    import os
-    os.system("pip3 install faker")
-    from faker import Faker
+# "faker" builds each row with Faker calls; "numpy" uses the vectorized
+# batch engine and needs NumPy installed
+ENGINES = ('faker', 'numpy')
+
+# Record formats plus the columnar dataset layout (log evidence types only)
+OUTPUT_FORMATS = FORMATS + ('columnar',)
+
+# Evidence types generated per employee, which can be sharded across workers
+LOG_EVIDENCE_TYPES = {
+    'access_logs': ACCESS_ACTIVITY_RANGE,
+    'audit_trails': AUDIT_ACTIVITY_RANGE,
+}
+
+EVIDENCE_TYPES = ('employees',) + tuple(LOG_EVIDENCE_TYPES) + \
+    ('incident_reports', 'risk_assessment_reports')
+
+# Evidence types without nested fields, which can be written as CSV
+FLAT_EVIDENCE_TYPES = ('employees',) + tuple(LOG_EVIDENCE_TYPES)
+
+# Employees per shard. Shards, not workers, own the random streams, so the
+# output for a given seed is the same whatever the number of workers. Faker
+# rows are slow enough to shard finely; NumPy shards amortise per-call cost.
+SHARD_SIZES = {'faker': 32, 'numpy': 4096}
+
+# Records per pickled chunk in a worker's spill file
+SPILL_CHUNK = 256
+
+# Incident resolution steps are completed by this department when it has staff
+INCIDENT_RESPONDERS = 'Security'
+
+# Relative chance of owning a risk mitigation plan, by access level
+RISK_OWNER_WEIGHTS = {'privileged': 3, 'admin': 2, 'standard': 1}
+
+# Hire dates fall within this many days before today
+HIRE_WINDOW_DAYS = 5 * 365
+
+# Incidents are resolved within this many days of being reported
+RESOLUTION_WINDOW_DAYS = 30
+
+def derive_seed(seed: int, *keys) -> int:
+    """Derive an independent 64-bit seed for one unit of work"""
+    digest = hashlib.sha256(repr((seed,) + keys).encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+def activity_count(activity_range, rng=random) -> int:
+    """Rows for one employee, drawn uniformly from activity_range
+    
+    A fractional range (see scale_activity) gives a fractional draw, which
+    is rounded up with probability equal to its fractional part, so the
+    expected count is the same as before rounding.
+    """
+    low, high = activity_range
+    if isinstance(low, int) and isinstance(high, int):
+        return rng.randint(low, high)
+    rate = rng.uniform(low, high)
+    count = int(rate)
+    return count + (rng.random() < rate - count)
+
+def sorted_timestamps(count: int, start_date: datetime, end_date: datetime,
+                      rng=random, curve=None):
+    """Lazily yield count random timestamps in ascending order
+    
+    Each value is the minimum of the uniforms still to be drawn, so the
+    sequence has the same distribution as sorting count independent draws
+    without ever holding them in memory. With an ActivityCurve the uniforms
+    are taken on its cumulative activity scale and warped back to time, so
+    timestamps follow its diurnal and weekday rates.
+    """
+    span = (end_date - start_date).total_seconds()
+    position = 0.0
+    for remaining in range(count, 0, -1):
+        position += (1.0 - position) * (1.0 - rng.random() ** (1.0 / remaining))
+        offset = curve.offset(position) if curve else position * span
+        yield start_date + timedelta(seconds=offset)
+
+def random_uuid4(rng) -> str:
+    """Version 4 UUID drawn from rng, as Faker's uuid4() does"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def employee_access_logs(employee, start_date, end_date, rng, pools,
+                         activity_range=ACCESS_ACTIVITY_RANGE):
+    """Yield one employee's access logs in timestamp order"""
+    details = pools['details']
+    ips = pools['ipv4']
+    
+    # Generate random activity patterns
+    num_actions = activity_count(activity_range, rng)
+    
+    curve = activity_curve(department_profile(employee['department']),
+                           start_date, end_date)
+    for timestamp in sorted_timestamps(num_actions, start_date, end_date, rng, curve):
+        yield AccessLogRecord(
+            timestamp,
+            employee['employee_id'],
+            rng.choice(ACCESS_ACTIONS),
+            rng.choice(ACCESS_RESOURCES),
+            ips[rng.randrange(len(ips))],
+            rng.choice(ACCESS_STATUSES),
+            details[rng.randrange(len(details))]
+        )
+
+def employee_audit_trails(employee, start_date, end_date, rng, pools,
+                          activity_range=AUDIT_ACTIVITY_RANGE):
+    """Yield one employee's audit trail entries in timestamp order"""
+    values = pools['change_values']
+    ips = pools['ipv4']
+    
+    # Generate realistic audit activity
+    num_actions = activity_count(activity_range, rng)
+    
+    curve = activity_curve(department_profile(employee['department']),
+                           start_date, end_date)
+    for timestamp in sorted_timestamps(num_actions, start_date, end_date, rng, curve):
+        yield AuditTrailRecord(
+            timestamp,
+            employee['employee_id'],
+            rng.choice(AUDIT_ACTIONS),
+            rng.choice(AUDIT_OBJECTS),
+            random_uuid4(rng),
+            json.dumps({
+                'old_value': values[rng.randrange(len(values))],
+                'new_value': values[rng.randrange(len(values))]
+            }),
+            ips[rng.randrange(len(ips))],
+            random_uuid4(rng)
+        )
+
+def batch_records(batches):
+    """Flatten columnar batches into record tuples"""
+    for batch in batches:
+        yield from batch.records()
+
+def shard_batches(evidence_type, employee_ids, shard_seed, start_date, end_date,
+                  n_slices, pools, employee_range=None, activity_range=None,
+                  departments=None):
+    """Yield one shard's columnar batches from the NumPy engine"""
+    from batch_engine import BatchEngine
+    
+    engine = BatchEngine(employee_ids, pools['details'], pools['change_values'],
+                         seed=shard_seed, employee_range=employee_range,
+                         departments=departments)
+    activity_range = activity_range or LOG_EVIDENCE_TYPES[evidence_type]
+    if evidence_type == 'access_logs':
+        return engine.access_log_batches(start_date, end_date, n_slices, activity_range)
+    return engine.audit_trail_batches(start_date, end_date, n_slices, activity_range)
+
+def shard_records(evidence_type, employees, shard_seed, start_date, end_date,
+                  pools, activity_range=None):
+    """Yield one shard's records in timestamp order"""
+    rng = random.Random(shard_seed)
+    activity_range = activity_range or LOG_EVIDENCE_TYPES[evidence_type]
+    if evidence_type == 'access_logs':
+        streams = [employee_access_logs(employee, start_date, end_date, rng, pools,
+                                        activity_range)
+                   for employee in employees]
+    else:
+        streams = [employee_audit_trails(employee, start_date, end_date, rng, pools,
+                                         activity_range)
+                   for employee in employees]
+    return heapq.merge(*streams, key=attrgetter('timestamp'))
+
+# Value pools for the current worker process, set once by init_worker
+_worker_pools = None
+
+def init_worker(pools):
+    """Process pool initializer: receive the value pools once per worker"""
+    global _worker_pools
+    _worker_pools = pools
+
+def spill_shard(task):
+    """Generate one shard in a worker process and spill it to disk
+    
+    Faker shards spill pickled chunks of (timestamp, record) pairs, merged
+    record by record. NumPy shards spill one pickle per time slice of the
+    shared slice plan, so the parent merges a slice at a time: the column
+    arrays for columnar output, or the timestamps and already-encoded lines
+    for JSON and CSV (fmt).
+    """
+    evidence_type, engine, employees, first_index, shard_seed, start_date, \
+        end_date, n_slices, activity_range, fmt, spill_path = task
+    encode = record_encoder(fmt, RECORD_TYPES[evidence_type]._fields) \
+        if fmt != 'columnar' else None
+    if engine == 'numpy':
+        batches = shard_batches(
+            evidence_type, [emp['employee_id'] for emp in employees],
+            shard_seed, start_date, end_date, n_slices, _worker_pools,
+            activity_range=activity_range,
+            departments=[emp['department'] for emp in employees])
+        with open(spill_path, 'wb') as f:
+            for batch in batches:
+                if encode:
+                    spilled = (batch.timestamp, [encode(record) for record in batch.records()])
+                else:
+                    spilled = {name: getattr(batch, name) for name in batch.columns}
+                    # The shard numbers its employees from zero
+                    spilled['employee_index'] = spilled['employee_index'] + first_index
+                pickle.dump(spilled, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return spill_path
+    
+    records = shard_records(evidence_type, employees, shard_seed,
+                            start_date, end_date, _worker_pools, activity_range)
+    with open(spill_path, 'wb') as f:
+        chunk = []
+        for record in records:
+            chunk.append((record.timestamp, encode(record) if encode else record))
+            if len(chunk) >= SPILL_CHUNK:
+                pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+                chunk = []
+        if chunk:
+            pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return spill_path
+
+def read_spill(spill_path):
+    """Yield each pickled chunk or slice of a spill file in turn"""
+    with open(spill_path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def merge_line_slices(slices):
+    """Merge spilled (timestamps, lines) slices into (timestamp, line) pairs
+    
+    The sort is stable, as in ColumnBatch.merge, so the output matches the
+    single-process batch path line for line.
+    """
+    import numpy as np
+    from batch_engine import format_timestamps
+    
+    for shards in slices:
+        timestamps = np.concatenate([shard_timestamps for shard_timestamps, _ in shards])
+        lines = [line for _, shard_lines in shards for line in shard_lines]
+        order = np.argsort(timestamps, kind='stable')
+        yield from zip(format_timestamps(timestamps[order]),
+                       [lines[index] for index in order.tolist()])
+
+def instrumented(evidence_type):
+    """Charge a generate_* method to its evidence type's generate phase"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self._phase(evidence_type, 'generate'):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
 
 class EvidenceGenerator:
-    def __init__(self, output_dir: Path):
+    def __init__(self, output_dir: Path, engine: str = 'faker', seed=None,
+                 workers: int = 1, pools: ValuePools = None,
+                 employee_count: int = 87, employees=None,
+                 progress: bool = False, metrics: RunMetrics = None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.fake = Faker()
+        self.engine = engine
+        self.workers = workers
+        self.progress = progress
+        self.metrics = metrics
+        self.shard_size = SHARD_SIZES[engine]
         
-        # Generate consistent employee list
-        self.employees = self.generate_employees(87)
+        # Unseeded runs still shard from one run seed so that the worker
+        # count never changes the output
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(63)
+        self.rng = random.Random(self.seed)
+        self._fake = None
+        self.pools = pools if pools is not None else ValuePools()
         
+        # Rows per employee for each log window; incremental runs scale these
+        # to the length of the window they append
+        self.activity_ranges = dict(LOG_EVIDENCE_TYPES)
+        # Incremental runs after the first draw from fresh shard streams
+        self.increment = 0
+        
+        # Generate consistent employee list, unless a saved roster is reused
+        if employees is not None:
+            self.employees = employees
+        else:
+            self.employees = self.generate_employees(employee_count)
+        self.directory = EmployeeDirectory(self.employees)
+        if metrics is not None:
+            metrics.context.update(engine=engine, workers=workers, seed=self.seed,
+                                   employees=len(self.employees))
+        
+    @property
+    def fake(self):
+        """Seeded Faker, built on first use: only the reports need one"""
+        if self._fake is None:
+            self._fake = make_faker(self.seed)
+        return self._fake
+    
+    @instrumented('employees')
     def generate_employees(self, count: int):
         """Generate employee list"""
         employees = []
-        departments = ["Engineering", "Product", "Sales", "Marketing", "Finance", 
-                      "HR", "Operations", "Security", "Legal"]
-        
-        job_titles = {
-            "Engineering": ["Software Engineer", "DevOps Engineer", "QA Engineer"],
-            "Product": ["Product Manager", "Product Owner", "UX Designer"],
-            "Sales": ["Account Executive", "Business Development Rep", "Sales Engineer"],
-            "Marketing": ["Marketing Manager", "Content Creator", "Growth Hacker"],
-            "Finance": ["Financial Analyst", "Accountant", "Controller"],
-            "HR": ["HR Generalist", "Recruiter", "Benefits Administrator"],
-            "Operations": ["Operations Manager", "Project Manager", "Business Analyst"],
-            "Security": ["Security Engineer", "Compliance Officer", "Incident Responder"],
-            "Legal": ["Legal Counsel", "Contract Manager", "Privacy Officer"]
-        }
+        
+        # Names come from the value pools so that rosters of a million
+        # employees take seconds rather than minutes of Faker calls
+        rng = self.rng
+        first_names = self.pools['first_names']
+        last_names = self.pools['last_names']
+        user_names = self.pools['user_names']
+        today = date.today()
         
         for _ in range(count):
-            department = random.choice(departments)
-            employee_id = fake.uuid4()
+            department = rng.choice(DEPARTMENTS)
             employee = {
-                'employee_id': employee_id,
-                'name': fake.name(),
-                'email': f"{fake.user_name()}@example.com",
+                'employee_id': random_uuid4(rng),
+                'name': f"{first_names[rng.randrange(len(first_names))]} "
+                        f"{last_names[rng.randrange(len(last_names))]}",
+                'email': f"{user_names[rng.randrange(len(user_names))]}@example.com",
                 'department': department,
-                'job_title': random.choice(job_titles[department]),
-                'hire_date': fake.date_between(start_date='-5y', end_date='today'),
-                'manager_id': fake.uuid4(),
-                'access_level': random.choice(['standard', 'admin', 'privileged'])
+                'job_title': rng.choice(JOB_TITLES[department]),
+                'hire_date': today - timedelta(days=rng.randrange(HIRE_WINDOW_DAYS + 1)),
+                'manager_id': None,
+                'access_level': rng.choice(ACCESS_LEVELS)
             }
             employees.append(employee)
+        
+        # Managers form a tree: the first employee heads the company, the
+        # first of each department reports to them and everyone else to an
+        # earlier colleague in their department
+        heads = {}
+        for position, employee in enumerate(employees):
+            peers = heads.setdefault(employee['department'], [])
+            if peers:
+                employee['manager_id'] = employees[peers[rng.randrange(len(peers))]]['employee_id']
+            elif position:
+                employee['manager_id'] = employees[0]['employee_id']
+            peers.append(position)
         return employees
     
-    def generate_access_logs(self, days: int = 30):
-        """Generate synthetic access logs"""
-        access_logs = []
-        actions = ['login', 'logout', 'file_access', 'system_change']
-        resources = ['database', 'file_system', 'api_gateway', 'admin_panel']
-        
-        start_date = datetime.now() - timedelta(days=days)
+    def shards(self):
+        """Split the employee list into fixed-size (index, employees) shards"""
+        size = self.shard_size
+        return [(index, self.employees[start:start + size])
+                for index, start in enumerate(range(0, len(self.employees), size))]
+    
+    def _shard_seed(self, evidence_type: str, index: int) -> int:
+        if self.increment:
+            return derive_seed(self.seed, evidence_type, index, self.increment)
+        return derive_seed(self.seed, evidence_type, index)
+    
+    @staticmethod
+    def _window(days: int):
         end_date = datetime.now()
+        return end_date - timedelta(days=days), end_date
+    
+    def _n_slices(self, evidence_type, start_date, end_date):
+        from batch_engine import plan_slices
         
-        for employee in self.employees:
-            # Generate random activity patterns
-            num_actions = random.randint(50, 200)  # Reasonable activity range
-            
-            for _ in range(num_actions):
-                log_entry = {
-                    'timestamp': fake.date_time_between(start_date=start_date, 
-                                                     end_date=end_date),
-                    'employee_id': employee['employee_id'],
-                    'action': random.choice(actions),
-                    'resource': random.choice(resources),
-                    'ip_address': fake.ipv4(),
-                    'status': random.choice(['success', 'failure']),
-                    'details': fake.text(max_nb_chars=100)
-                }
-                access_logs.append(log_entry)
-                
-        return sorted(access_logs, key=lambda x: x['timestamp'])
+        low, high = self.activity_ranges[evidence_type]
+        expected_rows = int(len(self.employees) * (low + high) // 2)
+        return plan_slices(expected_rows, start_date, end_date)
     
+    @instrumented('access_logs')
+    def generate_access_logs(self, days: int = 30):
+        """Generate synthetic access logs"""
+        return list(self.iter_access_logs(days))
+    
+    def iter_access_logs(self, days: int = 30):
+        """Stream synthetic access logs in timestamp order"""
+        return self._iter_log_records('access_logs', *self._window(days))
+    
+    @instrumented('audit_trails')
     def generate_audit_trails(self, days: int = 30):
         """Generate synthetic audit trails"""
-        audit_trails = []
-        actions = ['create', 'update', 'delete', 'view']
-        objects = ['customer_record', 'financial_transaction', 
-                  'configuration_change', 'access_request']
+        return list(self.iter_audit_trails(days))
+    
+    def iter_audit_trails(self, days: int = 30):
+        """Stream synthetic audit trails in timestamp order"""
+        return self._iter_log_records('audit_trails', *self._window(days))
+    
+    def iter_access_log_batches(self, days: int = 30):
+        """Stream columnar access-log batches in timestamp order"""
+        return self._iter_log_batches('access_logs', *self._window(days))
+    
+    def iter_audit_trail_batches(self, days: int = 30):
+        """Stream columnar audit-trail batches in timestamp order"""
+        return self._iter_log_batches('audit_trails', *self._window(days))
+    
+    def _iter_log_records(self, evidence_type, start_date, end_date):
+        if self.engine == 'numpy':
+            return self._timed(evidence_type, 'generate', batch_records(
+                self._iter_log_batches(evidence_type, start_date, end_date)))
         
-        start_date = datetime.now() - timedelta(days=days)
-        end_date = datetime.now()
+        # Each shard stream is already ordered, so a k-way merge keeps only
+        # one pending record per employee in memory
+        streams = [self._timed(evidence_type, 'generate',
+                               shard_records(evidence_type, employees,
+                                             self._shard_seed(evidence_type, index),
+                                             start_date, end_date, self.pools,
+                                             self.activity_ranges[evidence_type]))
+                   for index, employees in self.shards()]
+        return self._timed(evidence_type, 'sort',
+                           heapq.merge(*streams, key=attrgetter('timestamp')))
+    
+    def _iter_log_batches(self, evidence_type, start_date, end_date):
+        """Merge the shards' batches slice by slice"""
+        employee_ids = self.directory.ids
+        departments = [emp['department'] for emp in self.employees]
+        n_slices = self._n_slices(evidence_type, start_date, end_date)
+        streams = [self._timed(evidence_type, 'generate', shard_batches(
+                       evidence_type, employee_ids,
+                       self._shard_seed(evidence_type, index),
+                       start_date, end_date, n_slices, self.pools,
+                       employee_range=(index * self.shard_size,
+                                       index * self.shard_size + len(employees)),
+                       activity_range=self.activity_ranges[evidence_type],
+                       departments=departments))
+                   for index, employees in self.shards()]
+        for batches in zip(*streams):
+            with self._phase(evidence_type, 'sort'):
+                merged = type(batches[0]).merge(batches)
+            yield merged
+    
+    def _merge_batch_slices(self, evidence_type, slices):
+        """Rebuild and merge spilled NumPy batches slice by slice"""
+        from batch_engine import AccessLogBatch, AuditTrailBatch
         
-        for employee in self.employees:
-            # Generate realistic audit activity
-            num_actions = random.randint(20, 100)
-            
-            for _ in range(num_actions):
-                trail_entry = {
-                    'timestamp': fake.date_time_between(start_date=start_date,
-                                                     end_date=end_date),
-                    'employee_id': employee['employee_id'],
-                    'action': random.choice(actions),
-                    'object_type': random.choice(objects),
-                    'object_id': fake.uuid4(),
-                    'changes': json.dumps({
-                        'old_value': fake.text(max_nb_chars=50),
-                        'new_value': fake.text(max_nb_chars=50)
-                    }),
-                    'ip_address': fake.ipv4(),
-                    'session_id': fake.uuid4()
-                }
-                audit_trails.append(trail_entry)
-                
-        return sorted(audit_trails, key=lambda x: x['timestamp'])
+        if evidence_type == 'access_logs':
+            batch_type, texts = AccessLogBatch, self.pools['details']
+        else:
+            batch_type, texts = AuditTrailBatch, self.pools['change_values']
+        for shards in slices:
+            batches = [batch_type(employee_ids=self.directory.ids, texts=texts, **columns)
+                       for columns in shards]
+            with self._phase(evidence_type, 'sort'):
+                merged = batch_type.merge(batches)
+            yield merged
     
+    @instrumented('incident_reports')
     def generate_incident_reports(self, count: int = 10):
         """Generate synthetic incident reports"""
         incidents = []
-        incident_types = ['security', 'compliance', 'operational']
-        severities = ['low', 'medium', 'high', 'critical']
+        directory = self.directory
+        responders = INCIDENT_RESPONDERS \
+            if directory.count(department=INCIDENT_RESPONDERS) else None
+        today = date.today()
         
         for _ in range(count):
+            # Resolution follows the report, and steps are completed in
+            # order between the two
+            reported_date = self.fake.date_between(start_date='-1y', end_date='today')
+            resolved_date = min(reported_date + timedelta(
+                days=self.rng.randint(0, RESOLUTION_WINDOW_DAYS)), today)
+            span = (resolved_date - reported_date).days
+            completed_days = sorted(self.rng.randint(0, span)
+                                    for _ in range(self.rng.randint(2, 5)))
             incident = {
-                'incident_id': fake.uuid4(),
-                'reported_by': random.choice([emp['employee_id'] 
-                                           for emp in self.employees]),
-                'incident_type': random.choice(incident_types),
-                'severity': random.choice(severities),
-                'description': fake.text(max_nb_chars=200),
-                'reported_date': fake.date_between(start_date='-1y',
-                                                 end_date='today'),
-                'resolved_date': fake.date_between(
-                    start_date='-1y', end_date='today'),
+                'incident_id': self.fake.uuid4(),
+                'reported_by': directory.choice(self.rng),
+                'incident_type': self.rng.choice(INCIDENT_TYPES),
+                'severity': self.rng.choice(INCIDENT_SEVERITIES),
+                'description': self.fake.text(max_nb_chars=200),
+                'reported_date': reported_date,
+                'resolved_date': resolved_date,
                 'resolution_steps': [
                     {'step': f"Step {i}", 
-                     'action': fake.text(max_nb_chars=100),
-                     'completed_by': random.choice([emp['employee_id'] 
-                                                 for emp in self.employees]),
-                     'completed_at': fake.date_between(start_date='-1y',
-                                                     end_date='today')}
-                    for i in range(random.randint(2, 5))
+                     'action': self.fake.text(max_nb_chars=100),
+                     'completed_by': directory.choice(self.rng, department=responders),
+                     'completed_at': reported_date + timedelta(days=days)}
+                    for i, days in enumerate(completed_days)
                 ]
             }
             incidents.append(incident)
             
-        return sorted(incidents, key=lambda x: x['reported_date'])
+        with self._phase('incident_reports', 'sort'):
+            return sorted(incidents, key=lambda x: x['reported_date'])
     
+    @instrumented('risk_assessment_reports')
     def generate_risk_assessment_reports(self, count: int = 5):
         """Generate synthetic risk assessment reports"""
         risks = []
-        risk_categories = ['strategic', 'operational', 'financial', 'compliance']
-        likelihoods = ['low', 'medium', 'high']
-        impacts = ['minimal', 'moderate', 'significant', 'critical']
         
         for _ in range(count):
             risk = {
-                'risk_id': fake.uuid4(),
-                'category': random.choice(risk_categories),
-                'description': fake.text(max_nb_chars=150),
-                'likelihood': random.choice(likelihoods),
-                'impact': random.choice(impacts),
-                'risk_score': round(random.uniform(1.0, 10.0), 1),
+                'risk_id': self.fake.uuid4(),
+                'category': self.rng.choice(RISK_CATEGORIES),
+                'description': self.fake.text(max_nb_chars=150),
+                'likelihood': self.rng.choice(RISK_LIKELIHOODS),
+                'impact': self.rng.choice(RISK_IMPACTS),
+                'risk_score': round(self.rng.uniform(*RISK_SCORE_RANGE), 1),
                 'mitigation_plans': [
                     {'plan': f"Plan {i}", 
-                     'description': fake.text(max_nb_chars=100),
-                     'owner': random.choice([emp['employee_id'] 
-                                          for emp in self.employees]),
-                     'target_date': fake.date_between(start_date='today',
-                                                    end_date='+1y')}
-                    for i in range(random.randint(2, 4))
+                     'description': self.fake.text(max_nb_chars=100),
+                     'owner': self.directory.weighted_choice(self.rng,
+                                                             RISK_OWNER_WEIGHTS),
+                     'target_date': self.fake.date_between(start_date='today',
+                                                         end_date='+1y')}
+                    for i in range(self.rng.randint(2, 4))
                 ],
-                'review_date': fake.date_between(start_date='-1y',
-                                               end_date='today'),
-                'next_review_date': fake.date_between(start_date='today',
-                                                     end_date='+1y')
+                'review_date': self.fake.date_between(start_date='-1y',
+                                                    end_date='today'),
+                'next_review_date': self.fake.date_between(start_date='today',
+                                                          end_date='+1y')
             }
             risks.append(risk)
             
-        return sorted(risks, key=lambda x: x['risk_score'], 
-                     reverse=True)
+        with self._phase('risk_assessment_reports', 'sort'):
+            return sorted(risks, key=lambda x: x['risk_score'], 
+                         reverse=True)
+    
+    def _evidence_path(self, evidence_type: str, fmt: str, compression=None,
+                       chunked: bool = False) -> Path:
+        name = f"{evidence_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if chunked:
+            return self.output_dir / name
+        if fmt == 'columnar':
+            return self.output_dir / f"{name}{COLUMNAR_SUFFIX}"
+        return self.output_dir / f"{name}{evidence_suffix(fmt, compression)}"
     
-    def save_evidence(self, evidence_type: str, data):
-        """Save evidence to file"""
-        filename = f"{evidence_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        filepath = self.output_dir / filename
+    def _open_writer(self, evidence_type, fmt, compression, rotate_rows, rotate_bytes,
+                     append=False):
+        """Single-file writer, or a chunked dataset writer when rotating
         
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+        append extends the evidence_type dataset directory, which has a
+        fixed name so that successive incremental runs find it.
+        """
+        if fmt == 'columnar':
+            raise ValueError("Columnar output cannot be compressed, rotated or appended to")
+        # Log types have a fixed record layout; CSV headers for other types
+        # come from their first record
+        record_type = RECORD_TYPES.get(evidence_type)
+        fields = record_type._fields if record_type else None
+        if append:
+            return ChunkedEvidenceWriter(self.output_dir / evidence_type, evidence_type,
+                                         TIME_FIELDS[evidence_type], fmt=fmt,
+                                         compression=compression, max_rows=rotate_rows,
+                                         max_bytes=rotate_bytes, append=True,
+                                         fields=fields)
+        if rotate_rows or rotate_bytes:
+            path = self._evidence_path(evidence_type, fmt, compression, chunked=True)
+            return ChunkedEvidenceWriter(path, evidence_type, TIME_FIELDS[evidence_type],
+                                         fmt=fmt, compression=compression,
+                                         max_rows=rotate_rows, max_bytes=rotate_bytes,
+                                         fields=fields)
+        path = self._evidence_path(evidence_type, fmt, compression)
+        return EvidenceWriter(path, fmt=fmt, compression=compression, fields=fields)
+    
+    def save_evidence(self, evidence_type: str, data, fmt: str = 'json',
+                      compression: str = None, rotate_rows: int = None,
+                      rotate_bytes: int = None, append: bool = False):
+        """Save evidence to file
+        
+        data may be any iterable, including the iter_* streams, and is
+        written incrementally; the file appears atomically once complete.
+        The columnar format also accepts the iter_*_batches streams.
+        
+        compression ('gzip' or 'zstd') compresses the stream as it is
+        written. rotate_rows/rotate_bytes split the output into numbered
+        chunks in a directory with a manifest.json. append adds the data as
+        new chunks of the dataset named after evidence_type.
+        """
+        if fmt == 'columnar' and not (compression or rotate_rows or rotate_bytes or append):
+            writer = ColumnarWriter(self._evidence_path(evidence_type, fmt), evidence_type)
+        else:
+            writer = self._open_writer(evidence_type, fmt, compression,
+                                       rotate_rows, rotate_bytes, append)
+        result = self._write(evidence_type, writer, data)
         
-        print(f"Generated {evidence_type} evidence: {filepath}")
+        self._report(evidence_type, result)
+        return result
+    
+    def _write(self, evidence_type, writer, data, encoded=False):
+        """Write data (or encoded (timestamp, line) pairs) and publish the
+        file, timing the serialize and fsync phases"""
+        try:
+            with self._phase(evidence_type, 'serialize'):
+                if encoded:
+                    for timestamp, line in data:
+                        writer.write_encoded(line, timestamp)
+                else:
+                    writer.write_all(data)
+        except BaseException:
+            writer.abort()
+            raise
+        with self._phase(evidence_type, 'fsync'):
+            return writer.close()
+    
+    def _report(self, evidence_type, result):
+        if self.metrics is not None:
+            self.metrics.add_rows(evidence_type, result.records, result.bytes_written)
+        print(f"Generated {evidence_type} evidence: {result.path} "
+              f"({result.records} records, {result.bytes_written} bytes)")
+    
+    def save_log_evidence(self, evidence_type: str, days: int = 30,
+                          fmt: str = 'json', compression: str = None,
+                          rotate_rows: int = None, rotate_bytes: int = None):
+        """Generate and save access logs or audit trails
+        
+        With more than one worker, shards are generated and encoded in a
+        process pool and their sorted spill files are merged into a single
+        timestamp-ordered evidence file, a time slice at a time for NumPy.
+        """
+        return self._save_log_window(evidence_type, *self._window(days), fmt,
+                                     compression, rotate_rows, rotate_bytes)
+    
+    def append_log_evidence(self, evidence_type: str, start_date: datetime,
+                            end_date: datetime, fmt: str = 'json',
+                            compression: str = None, rotate_rows: int = None,
+                            rotate_bytes: int = None):
+        """Generate logs for start_date to end_date and append them as new
+        chunks of the evidence_type dataset, creating it on first use"""
+        return self._save_log_window(evidence_type, start_date, end_date, fmt,
+                                     compression, rotate_rows, rotate_bytes,
+                                     append=True)
+    
+    def _track(self, label, items, size=None, unit='rows'):
+        """Report rows/sec for items as they are consumed, if enabled"""
+        if not self.progress:
+            return items
+        return ProgressReporter(label, unit).track(items, size)
+    
+    def _timed(self, evidence_type, phase, items):
+        """Charge the time spent producing items to a phase, if measuring"""
+        if self.metrics is None:
+            return items
+        return self.metrics.timed(evidence_type, phase, items)
+    
+    def _phase(self, evidence_type, phase):
+        """Context manager timing one phase, if measuring"""
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.phase(evidence_type, phase)
+    
+    def _save_log_window(self, evidence_type, start_date, end_date, fmt,
+                         compression, rotate_rows, rotate_bytes, append=False):
+        # Fail before generating anything, whatever the number of workers
+        if fmt == 'columnar' and (compression or rotate_rows or rotate_bytes or append):
+            raise ValueError("Columnar output cannot be compressed, rotated or appended to")
+        if self.workers <= 1:
+            if fmt == 'columnar' and self.engine == 'numpy':
+                data = self._track(evidence_type,
+                                   self._iter_log_batches(evidence_type, start_date, end_date),
+                                   size=len)
+            else:
+                data = self._track(evidence_type,
+                                   self._iter_log_records(evidence_type, start_date, end_date))
+            return self.save_evidence(evidence_type, data, fmt, compression,
+                                      rotate_rows, rotate_bytes, append)
+        
+        n_slices = self._n_slices(evidence_type, start_date, end_date) \
+            if self.engine == 'numpy' else None
+        
+        # Only multi-worker runs pay for importing multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with tempfile.TemporaryDirectory(prefix='.shards-', dir=self.output_dir) as spill_dir:
+            tasks = [(evidence_type, self.engine, employees, index * self.shard_size,
+                      self._shard_seed(evidence_type, index), start_date,
+                      end_date, n_slices, self.activity_ranges[evidence_type],
+                      fmt,
+                      Path(spill_dir) / f"shard-{index:05d}.pkl")
+                     for index, employees in self.shards()]
+            with ProcessPoolExecutor(max_workers=self.workers,
+                                     initializer=init_worker,
+                                     initargs=(self.pools.pools,)) as pool:
+                spill_paths = list(self._track(evidence_type,
+                                               self._timed(evidence_type, 'generate',
+                                                           pool.map(spill_shard, tasks)),
+                                               unit='shards'))
+            
+            spills = [read_spill(path) for path in spill_paths]
+            if self.engine == 'numpy' and fmt == 'columnar':
+                data = self._track(evidence_type,
+                                   self._merge_batch_slices(evidence_type, zip(*spills)),
+                                   size=len)
+            elif self.engine == 'numpy':
+                data = self._track(evidence_type, self._timed(
+                    evidence_type, 'sort', merge_line_slices(zip(*spills))))
+            else:
+                data = self._track(evidence_type, self._timed(
+                    evidence_type, 'sort',
+                    heapq.merge(*(itertools.chain.from_iterable(spill) for spill in spills),
+                                key=itemgetter(0))))
+            if fmt == 'columnar':
+                writer = ColumnarWriter(self._evidence_path(evidence_type, fmt),
+                                        evidence_type)
+                if self.engine != 'numpy':
+                    data = (record for _, record in data)
+                result = self._write(evidence_type, writer, data)
+            else:
+                writer = self._open_writer(evidence_type, fmt, compression,
+                                           rotate_rows, rotate_bytes, append)
+                result = self._write(evidence_type, writer, data, encoded=True)
+        
+        self._report(evidence_type, result)
+        return result
+
+def run_incremental(output_dir: Path, state_path: Path = None, days: int = 90,
+                    engine: str = 'faker', seed=None, workers: int = 1,
+                    pools: ValuePools = None, fmt: str = 'ndjson',
+                    compression: str = None, rotate_rows: int = None,
+                    rotate_bytes: int = None, now: datetime = None,
+                    evidence_types=tuple(LOG_EVIDENCE_TYPES), employee_count: int = 87,
+                    activity_ranges: dict = None, progress: bool = False,
+                    metrics: RunMetrics = None) -> dict:
+    """Append access logs and audit trails generated since the last run
+    
+    The first run writes the employee roster as evidence, generates the
+    trailing days and saves the seed, roster and a watermark per evidence
+    type to the state file. Later runs reuse
+    that roster, generate only the window from each watermark to now, at
+    the original rows-per-day rate, and append it to the existing chunked
+    datasets. Format, compression, population and rows per employee
+    (activity_ranges, by evidence type) are fixed by the first run.
+    """
+    if fmt == 'columnar':
+        raise ValueError("Incremental output needs a record format, not columnar")
+    state_path = state_path or output_dir / STATE_FILE
+    end_date = now or datetime.now()
+    state = load_state(state_path)
+    if state is None:
+        generator = EvidenceGenerator(output_dir, engine=engine, seed=seed,
+                                      workers=workers, pools=pools,
+                                      employee_count=employee_count, progress=progress,
+                                      metrics=metrics)
+        state = new_state(generator.seed, generator.employees, days, fmt, compression,
+                          dict(LOG_EVIDENCE_TYPES, **(activity_ranges or {})))
+        # The roster is evidence too: log employee_ids must resolve against it
+        generator.save_evidence('employees', generator.employees, fmt, compression)
+    else:
+        generator = EvidenceGenerator(output_dir, engine=engine, seed=state['seed'],
+                                      workers=workers, pools=pools,
+                                      employees=state['employees'], progress=progress,
+                                      metrics=metrics)
+    
+    for evidence_type in evidence_types:
+        activity_range = state['activity_ranges'].get(evidence_type,
+                                                      LOG_EVIDENCE_TYPES[evidence_type])
+        dataset = state['datasets'].get(evidence_type)
+        if dataset is None:
+            dataset = {'watermark': end_date - timedelta(days=state['days']), 'runs': 0}
+        start_date = dataset['watermark']
+        if start_date >= end_date:
+            print(f"{evidence_type} evidence is already up to date")
+            continue
+        
+        window = (end_date - start_date) / timedelta(days=state['days'])
+        generator.activity_ranges[evidence_type] = scale_activity(activity_range, window)
+        generator.increment = dataset['runs']
+        generator.append_log_evidence(evidence_type, start_date, end_date,
+                                      state['format'], state['compression'],
+                                      rotate_rows, rotate_bytes)
+        
+        # Saved per type, so an interrupted run never appends a window twice
+        dataset.update(watermark=end_date, runs=dataset['runs'] + 1)
+        state['datasets'][evidence_type] = dataset
+        save_state(state_path, state)
+    return state
+
+def parse_rows(value: str):
+    """Parse a rows-per-employee range such as 50-200, or a fixed count"""
+    try:
+        low, _, high = value.partition('-')
+        low, high = int(low), int(high or low)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected LOW-HIGH or COUNT, got '{value}'")
+    if not 0 <= low <= high:
+        raise argparse.ArgumentTypeError(f"Invalid rows per employee '{value}'")
+    return low, high
 
 def main():
-    # Create generator instance
-    generator = EvidenceGenerator(Path("./audit_evidence"))
+    parser = argparse.ArgumentParser(description="Generate synthetic SOC 2 audit evidence")
+    parser.add_argument('--output-dir', type=Path, default=Path("./audit_evidence"),
+                        help="directory evidence is written to")
+    parser.add_argument('--types', nargs='+', choices=EVIDENCE_TYPES, metavar='TYPE',
+                        help=f"evidence types to generate, from {', '.join(EVIDENCE_TYPES)} "
+                             "(default: all; only the log types for columnar or "
+                             "incremental output, and the roster and log types for csv)")
+    parser.add_argument('--employees', type=int, default=87,
+                        help="size of the employee population")
+    parser.add_argument('--days', type=int, default=90,
+                        help="length of the log window, ending now")
+    parser.add_argument('--access-rows', type=parse_rows, default=ACCESS_ACTIVITY_RANGE,
+                        metavar='LOW-HIGH',
+                        help="access log rows per employee over the window "
+                             "(default: %(default)s)")
+    parser.add_argument('--audit-rows', type=parse_rows, default=AUDIT_ACTIVITY_RANGE,
+                        metavar='LOW-HIGH',
+                        help="audit trail rows per employee over the window "
+                             "(default: %(default)s)")
+    parser.add_argument('--incidents', type=int, default=15,
+                        help="number of incident reports")
+    parser.add_argument('--risks', type=int, default=8,
+                        help="number of risk assessment reports")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='json',
+                        help="output format; csv is for the roster and log types, "
+                             "columnar for log types only")
+    parser.add_argument('--engine', choices=ENGINES, default='faker',
+                        help="row generator for access logs and audit trails")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes used for access logs and audit trails")
+    parser.add_argument('--seed', type=int,
+                        help="seed for reproducible output")
+    parser.add_argument('--progress', action='store_true',
+                        help="report rows written and rows/sec on stderr")
+    parser.add_argument('--index', action='store_true',
+                        help="build an offset index (see evidence_index.py) next to "
+                             "each access log and audit trail file")
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help="pre-generated values per text/IP pool")
+    parser.add_argument('--pool-cache', type=Path, default=DEFAULT_CACHE_DIR,
+                        help="directory where value pools are cached between runs")
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        help="compress evidence files as they are written")
+    parser.add_argument('--rotate-rows', type=int,
+                        help="split evidence into chunks of at most this many rows")
+    parser.add_argument('--rotate-bytes', type=int,
+                        help="split evidence into chunks of about this many bytes")
+    parser.add_argument('--incremental', action='store_true',
+                        help="append only the logs generated since the last "
+                             "incremental run, keeping its employee roster")
+    parser.add_argument('--state-file', type=Path,
+                        help=f"incremental state (default: OUTPUT_DIR/{STATE_FILE})")
+    parser.add_argument('--metrics', action='store_true',
+                        help="write phase timings and rows/sec per evidence type to "
+                             "OUTPUT_DIR/metrics_<timestamp>.json")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="add tracemalloc peaks to the metrics (slows the run down)")
+    parser.add_argument('--profile', action='store_true',
+                        help="add a cProfile capture of this process to the metrics")
+    args = parser.parse_args()
+    if args.types:
+        types = list(dict.fromkeys(args.types))
+    elif args.format == 'columnar' or args.incremental:
+        types = list(LOG_EVIDENCE_TYPES)
+    elif args.format == 'csv':
+        types = list(FLAT_EVIDENCE_TYPES)
+    else:
+        types = list(EVIDENCE_TYPES)
+    report_types = [t for t in types if t not in LOG_EVIDENCE_TYPES]
+    if args.format == 'columnar' and report_types:
+        parser.error(f"columnar output is for log types only, not {', '.join(report_types)}")
+    nested_types = [t for t in types if t not in FLAT_EVIDENCE_TYPES]
+    if args.format == 'csv' and nested_types:
+        parser.error(f"csv output is for flat evidence types only, not {', '.join(nested_types)}")
+    if args.incremental and report_types:
+        parser.error("--incremental only generates access_logs and audit_trails")
+    if args.format == 'columnar' and (args.compression or args.rotate_rows
+                                      or args.rotate_bytes or args.incremental):
+        parser.error("columnar output cannot be combined with --compression, "
+                     "--rotate-rows, --rotate-bytes or --incremental")
+    if args.index and (args.format in ('columnar', 'csv') or args.compression
+                       or args.rotate_rows or args.rotate_bytes or args.incremental):
+        parser.error("--index needs single, uncompressed json or ndjson files")
+    if args.employees < 1 or args.days < 1:
+        parser.error("--employees and --days must be at least 1")
     
-    # Generate and save various types of evidence
-    print("Generating SOC 2 audit evidence...")
+    metrics = RunMetrics(args.trace_memory, args.profile) \
+        if args.metrics or args.trace_memory or args.profile else None
+    with metrics or nullcontext():
+        run(args, types, metrics)
+    if metrics is not None:
+        print(f"Wrote run metrics: {metrics.write(args.output_dir)}")
+
+def run(args, types, metrics: RunMetrics = None):
+    """Generate the evidence types selected on the command line"""
+    output = {'fmt': args.format, 'compression': args.compression,
+              'rotate_rows': args.rotate_rows, 'rotate_bytes': args.rotate_bytes}
+    activity_ranges = {'access_logs': args.access_rows, 'audit_trails': args.audit_rows}
+    pools = ValuePools(args.pool_size, args.pool_cache)
     
-    # Generate access logs
-    access_logs = generator.generate_access_logs(days=90)
-    generator.save_evidence("access_logs", access_logs)
+    if args.incremental:
+        run_incremental(args.output_dir, args.state_file, days=args.days,
+                        engine=args.engine, seed=args.seed, workers=args.workers,
+                        pools=pools, evidence_types=types,
+                        employee_count=args.employees, activity_ranges=activity_ranges,
+                        progress=args.progress, metrics=metrics, **output)
+        return
     
-    # Generate audit trails
-    audit_trails = generator.generate_audit_trails(days=90)
-    generator.save_evidence("audit_trails", audit_trails)
+    # Create generator instance
+    generator = EvidenceGenerator(args.output_dir, engine=args.engine, seed=args.seed,
+                                  workers=args.workers, pools=pools,
+                                  employee_count=args.employees, progress=args.progress,
+                                  metrics=metrics)
+    generator.activity_ranges.update(activity_ranges)
     
-    # Generate incident reports
-    incidents = generator.generate_incident_reports(count=15)
-    generator.save_evidence("incident_reports", incidents)
+    # Generate and save the requested types of evidence
+    print(f"Generating SOC 2 audit evidence for {args.employees} employees...")
     
-    # Generate risk assessment reports
-    risks = generator.generate_risk_assessment_reports(count=8)
-    generator.save_evidence("risk_assessment_reports", risks)
+    for evidence_type in types:
+        if evidence_type == 'employees':
+            generator.save_evidence(evidence_type, generator.employees, **output)
+        elif evidence_type in LOG_EVIDENCE_TYPES:
+            result = generator.save_log_evidence(evidence_type, days=args.days, **output)
+            if args.index:
+                print(f"Indexed {evidence_type} evidence: {build_index(result.path)}")
+        elif evidence_type == 'incident_reports':
+            incidents = generator.generate_incident_reports(count=args.incidents)
+            generator.save_evidence(evidence_type, incidents, **output)
+        else:
+            risks = generator.generate_risk_assessment_reports(count=args.risks)
+            generator.save_evidence(evidence_type, risks, **output)
 
 if __name__ == "__main__":
     main()
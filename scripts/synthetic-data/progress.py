@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Row-count and throughput reporting for long generation runs
+"""
+
+import sys
+import time
+
+
+class ProgressReporter:
+    """Count rows flowing through an iterator and report their rate
+
+    A line is written to stream at most every interval seconds while rows
+    arrive, and a summary line once the iterator is exhausted.
+    """
+
+    def __init__(self, label: str, unit: str = 'rows', interval: float = 2.0,
+                 stream=None):
+        self.label = label
+        self.unit = unit
+        self.interval = interval
+        self.stream = stream if stream is not None else sys.stderr
+        self.rows = 0
+        self.started = None
+
+    def track(self, items, size=None):
+        """Yield items unchanged; size(item) gives its row count (default 1)"""
+        self.started = time.perf_counter()
+        next_report = self.started + self.interval
+        for item in items:
+            self.rows += 1 if size is None else size(item)
+            yield item
+            now = time.perf_counter()
+            if now >= next_report:
+                self._write(now)
+                next_report = now + self.interval
+        self._write(time.perf_counter(), done=True)
+
+    def _write(self, now: float, done: bool = False):
+        elapsed = now - self.started
+        rate = self.rows / elapsed if elapsed else 0.0
+        status = "done in" if done else "after"
+        print(f"{self.label}: {self.rows:,} {self.unit} {status} {elapsed:.1f}s "
+              f"({rate:,.0f} {self.unit}/s)", file=self.stream, flush=True)
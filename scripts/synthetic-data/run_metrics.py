@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Phase timings, row rates, memory peaks and profiles for generation runs
+
+Time is attributed to the innermost active phase of an evidence type:
+
+- generate: building rows (Faker calls, NumPy batches, report dicts)
+- sort: ordering them (k-way merges of shard streams, report sorts)
+- serialize: encoding, compressing and writing records
+- fsync: flushing, syncing and atomically publishing the finished file
+
+Streams are lazy, so a merge pulls rows from generators while a writer
+pulls from the merge. Phases therefore nest and each one is charged only
+its own (exclusive) time, so the phases of a type add up to its wall time.
+With worker processes, generate covers waiting for the pool, which also
+encodes rows, and sort covers merging the workers' spill files.
+"""
+
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+PHASES = ('generate', 'sort', 'serialize', 'fsync')
+
+# Functions listed in the metrics file when profiling, by cumulative time
+PROFILE_TOP = 30
+
+
+class RunMetrics:
+    """Collect metrics for one run; use as a context manager around it
+
+        with RunMetrics(trace_memory=True) as metrics:
+            generator = EvidenceGenerator(output_dir, metrics=metrics)
+            ...
+        metrics.write(output_dir)
+
+    trace_memory records the tracemalloc peak of each evidence type (which
+    slows generation down several times); profile captures the whole run
+    with cProfile.
+    """
+
+    def __init__(self, trace_memory: bool = False, profile: bool = False):
+        self.trace_memory = trace_memory
+        self.profiler = None
+        if profile:
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+        self.context = {}
+        self.evidence = {}
+        self.started = None
+        self.finished = None
+        self._stack = []
+        self._since = None
+        self._clock = None
+        self._wall = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        self.started = datetime.now()
+        self._clock = time.perf_counter()
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory:
+            tracemalloc.stop()
+        self._wall = time.perf_counter() - self._clock
+        self.finished = datetime.now()
+
+    def _entry(self, evidence_type: str) -> dict:
+        entry = self.evidence.get(evidence_type)
+        if entry is None:
+            entry = self.evidence[evidence_type] = {
+                'rows': 0,
+                'bytes': 0,
+                'phases': dict.fromkeys(PHASES, 0.0),
+                'tracemalloc_peak_bytes': None,
+            }
+        return entry
+
+    def _frame(self, evidence_type: str, phase: str) -> tuple:
+        """(phase totals, phase, evidence type) entry of the phase stack"""
+        if phase not in PHASES:
+            raise ValueError(f"Unknown phase '{phase}', expected one of {PHASES}")
+        return self._entry(evidence_type)['phases'], phase, evidence_type
+
+    def _record_peak(self, evidence_type: str):
+        entry = self._entry(evidence_type)
+        peak = tracemalloc.get_traced_memory()[1]
+        entry['tracemalloc_peak_bytes'] = max(entry['tracemalloc_peak_bytes'] or 0, peak)
+
+    def enter(self, evidence_type: str, phase: str):
+        self._push(self._frame(evidence_type, phase))
+
+    def exit(self):
+        self._pop()
+
+    def _push(self, frame: tuple):
+        # Charge the time since the last switch to the phase being suspended
+        now = time.perf_counter()
+        stack = self._stack
+        if stack:
+            totals, phase, _ = stack[-1]
+            totals[phase] += now - self._since
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        self._since = now
+        stack.append(frame)
+
+    def _pop(self):
+        now = time.perf_counter()
+        totals, phase, evidence_type = self._stack.pop()
+        totals[phase] += now - self._since
+        self._since = now
+        if not self._stack and self.trace_memory:
+            self._record_peak(evidence_type)
+
+    def phase(self, evidence_type: str, phase: str):
+        """Context manager timing a block as one phase of an evidence type"""
+        return _Phase(self, evidence_type, phase)
+
+    def timed(self, evidence_type: str, phase: str, items):
+        """Yield items unchanged, charging the time spent producing each one
+        to a phase"""
+        iterator = iter(items)
+        frame = self._frame(evidence_type, phase)
+        push, pop = self._push, self._pop
+        while True:
+            push(frame)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                pop()
+            yield item
+
+    def add_rows(self, evidence_type: str, rows: int, bytes_written: int = 0):
+        """Count rows (and bytes) written for an evidence type"""
+        entry = self._entry(evidence_type)
+        entry['rows'] += rows
+        entry['bytes'] += bytes_written
+
+    def report(self) -> dict:
+        """The collected metrics as a JSON-serializable dict"""
+        evidence = {}
+        for evidence_type, entry in self.evidence.items():
+            seconds = sum(entry['phases'].values())
+            evidence[evidence_type] = {
+                'rows': entry['rows'],
+                'bytes': entry['bytes'],
+                'seconds': round(seconds, 6),
+                'rows_per_sec': round(entry['rows'] / seconds, 1) if seconds else None,
+                'phases': {phase: round(value, 6) for phase, value in entry['phases'].items()},
+            }
+            if self.trace_memory:
+                evidence[evidence_type]['tracemalloc_peak_bytes'] = \
+                    entry['tracemalloc_peak_bytes']
+        return {
+            'started': self.started.isoformat() if self.started else None,
+            'finished': self.finished.isoformat() if self.finished else None,
+            'wall_seconds': round(self._wall, 6) if self._wall is not None else None,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'argv': sys.argv[1:],
+            'run': self.context,
+            'evidence': evidence,
+        }
+
+    def profile_top(self, limit: int = PROFILE_TOP) -> list:
+        """The most expensive functions by cumulative time"""
+        import pstats
+
+        stats = pstats.Stats(self.profiler).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [{'function': f"{path}:{line}({name})", 'calls': calls,
+                 'own_seconds': round(own, 6), 'cumulative_seconds': round(cumulative, 6)}
+                for (path, line, name), (_, calls, own, cumulative, _) in ranked[:limit]]
+
+    def write(self, directory: Path) -> Path:
+        """Write metrics_<timestamp>.json (and the raw .prof capture when
+        profiling) to directory"""
+        stamp = (self.started or datetime.now()).strftime('%Y%m%d_%H%M%S')
+        directory = Path(directory)
+        report = self.report()
+        if self.profiler is not None:
+            profile_path = directory / f"metrics_{stamp}.prof"
+            self.profiler.dump_stats(profile_path)
+            report['profile'] = {'file': profile_path.name, 'top': self.profile_top()}
+        path = directory / f"metrics_{stamp}.json"
+        path.write_text(json.dumps(report, indent=2) + '\n')
+        return path
+
+
+class _Phase:
+    __slots__ = ('metrics', 'evidence_type', 'phase')
+
+    def __init__(self, metrics: RunMetrics, evidence_type: str, phase: str):
+        self.metrics = metrics
+        self.evidence_type = evidence_type
+        self.phase = phase
+
+    def __enter__(self):
+        self.metrics.enter(self.evidence_type, self.phase)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.exit()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Draw reproducible audit samples from generated evidence
+
+Records are read in one streaming pass from evidence files, chunked
+datasets (any format and compression evidence_io reads) or columnar
+datasets (through ColumnarReader, which needs NumPy). They are grouped
+into strata by field values and time period, and each stratum keeps a
+fixed-size reservoir, so memory grows with the sample, not the population:
+
+    python3 sample_evidence.py audit_evidence/access_logs_20251015.json \\
+        --stratify action status --period quarter --per-stratum 25 --seed 2025
+
+The selected records and a methodology report are written to --output-dir.
+"""
+
+import argparse
+import random
+from datetime import date, datetime
+from pathlib import Path
+
+from evidence_columnar import META_FILE
+from evidence_io import iter_records, write_evidence
+
+PERIODS = ('day', 'week', 'month', 'quarter', 'year')
+
+
+def period_key(value, period: str) -> str:
+    """Label of the period a date, datetime or ISO string falls in"""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    elif isinstance(value, datetime):
+        value = value.date()
+    if period == 'day':
+        return value.isoformat()
+    if period == 'week':
+        year, week, _ = value.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == 'month':
+        return f"{value.year}-{value.month:02d}"
+    if period == 'quarter':
+        return f"{value.year}-Q{(value.month - 1) // 3 + 1}"
+    if period == 'year':
+        return str(value.year)
+    raise ValueError(f"Unknown period '{period}', expected one of {PERIODS}")
+
+
+class Reservoir:
+    """Uniform random sample of fixed size from a stream (Algorithm R)
+
+    After n items every item has been kept with probability size / n.
+    """
+
+    __slots__ = ('size', 'seen', 'items')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.seen = 0
+        self.items = []
+
+    def offer(self, item, rng):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append((self.seen, item))
+            return
+        slot = rng.randrange(self.seen)
+        if slot < self.size:
+            self.items[slot] = (self.seen, item)
+
+    def sample(self) -> list:
+        """Kept items in the order they were read"""
+        return [item for _, item in sorted(self.items, key=lambda pair: pair[0])]
+
+
+class StratifiedSampler:
+    """Stratified simple random sampling without replacement
+
+    Each record's stratum is its values for fields plus, if period is set,
+    the period of its time_field. Every stratum gets its own reservoir of
+    per_stratum records; one shared seeded RNG makes the selection
+    reproducible for the same inputs read in the same order.
+    """
+
+    def __init__(self, per_stratum: int, fields=(), period: str = None,
+                 time_field: str = 'timestamp', seed: int = None, start=None,
+                 end=None):
+        if per_stratum < 1:
+            raise ValueError("per_stratum must be at least 1")
+        if period is not None and period not in PERIODS:
+            raise ValueError(f"Unknown period '{period}', expected one of {PERIODS}")
+        self.per_stratum = per_stratum
+        self.fields = tuple(fields)
+        self.period = period
+        self.time_field = time_field
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(63)
+        self.start = _isoformat(start)
+        self.end = _isoformat(end)
+        self.rng = random.Random(self.seed)
+        self.strata = {}
+        self.population = 0
+
+    def stratum(self, record) -> tuple:
+        key = tuple(record.get(field) for field in self.fields)
+        if self.period is not None:
+            key += (period_key(record[self.time_field], self.period),)
+        return key
+
+    def in_range(self, record) -> bool:
+        """Whether a record falls inside the start (inclusive) to end
+        (exclusive) population window"""
+        if self.start is None and self.end is None:
+            return True
+        value = _isoformat(record[self.time_field])
+        return (self.start is None or value >= self.start) and \
+            (self.end is None or value < self.end)
+
+    def add(self, record):
+        if not self.in_range(record):
+            return
+        self.population += 1
+        key = self.stratum(record)
+        reservoir = self.strata.get(key)
+        if reservoir is None:
+            reservoir = self.strata[key] = Reservoir(self.per_stratum)
+        reservoir.offer(record, self.rng)
+
+    def add_all(self, records):
+        for record in records:
+            self.add(record)
+
+    def sample(self) -> list:
+        """Selected records, stratum by stratum in sorted stratum order"""
+        return [record for key in sorted(self.strata, key=_sort_key)
+                for record in self.strata[key].sample()]
+
+    def summary(self) -> list:
+        """(stratum, population, sampled) for every stratum"""
+        return [(key, reservoir.seen, len(reservoir.items))
+                for key, reservoir in sorted(self.strata.items(),
+                                             key=lambda item: _sort_key(item[0]))]
+
+
+def iter_population(path: Path, start: str = None, end: str = None):
+    """Records of an evidence file, chunked dataset or columnar dataset
+
+    start/end narrow what is read where the layout allows it; the sampler
+    still applies its own window to every record.
+    """
+    path = Path(path)
+    if not (path.is_dir() and (path / META_FILE).exists()):
+        return iter_records(path, start=start, end=end)
+    from evidence_columnar import ColumnarReader
+
+    reader = ColumnarReader(path)
+    # Timestamps are sorted, so the window is one slice of rows
+    rows = reader.time_range(start and datetime.fromisoformat(start),
+                             end and datetime.fromisoformat(end))
+    return reader.records(rows)
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def _sort_key(key: tuple):
+    return tuple('' if part is None else str(part) for part in key)
+
+
+def methodology_report(sampler: StratifiedSampler, sources, sample_path: Path) -> str:
+    """Markdown description of how a sample was drawn, for the audit file"""
+    strata = ', '.join(f"`{field}`" for field in sampler.fields) or 'none'
+    if sampler.period:
+        strata += f"; {sampler.period} of `{sampler.time_field}`"
+    if sampler.start is None and sampler.end is None:
+        window = "all records"
+    else:
+        window = f"{sampler.start or 'the first record'} (inclusive) to " \
+                 f"{sampler.end or 'the last record'} (exclusive)"
+    lines = [
+        "# Audit sample methodology",
+        "",
+        f"- Drawn: {datetime.now().isoformat(timespec='seconds')}",
+        f"- Sample file: `{sample_path.name}`",
+        f"- Population sources: {', '.join(f'`{source}`' for source in sources)}",
+        f"- Population window on `{sampler.time_field}`: {window}",
+        f"- Population size: {sampler.population} records",
+        f"- Strata: {strata}",
+        f"- Sample size: up to {sampler.per_stratum} records per stratum, "
+        f"{sum(sampled for _, _, sampled in sampler.summary())} in total",
+        f"- Random seed: {sampler.seed}",
+        "",
+        "## Method",
+        "",
+        "Stratified simple random sampling without replacement. The population "
+        "was read once, in source order, and each record was assigned to its "
+        "stratum. Every stratum was sampled with reservoir sampling "
+        "(Algorithm R), which gives each of its N records the same selection "
+        "probability k/N, where k is the stratum sample size. Strata with no "
+        "more than k records were selected in full.",
+        "",
+        "Re-running the sampler with the same seed over the same sources in "
+        "the same order selects exactly the same records.",
+        "",
+        "## Strata",
+        "",
+        "| " + " | ".join(list(sampler.fields) + ([sampler.period] if sampler.period else [])
+                         + ['Population', 'Sampled', 'Selection probability']) + " |",
+        "|" + "---|" * (len(sampler.fields) + bool(sampler.period) + 3),
+    ]
+    for key, population, sampled in sampler.summary():
+        values = ['' if part is None else str(part) for part in key]
+        lines.append("| " + " | ".join(values + [str(population), str(sampled),
+                                                 f"{sampled / population:.4f}"]) + " |")
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw a stratified audit sample from evidence")
+    parser.add_argument('paths', type=Path, nargs='+',
+                        help="evidence files, or chunked or columnar dataset directories")
+    parser.add_argument('--per-stratum', type=int, default=25,
+                        help="records sampled from each stratum")
+    parser.add_argument('--stratify', nargs='*', default=[], metavar='FIELD',
+                        help="fields whose values define the strata, e.g. action status")
+    parser.add_argument('--period', choices=PERIODS,
+                        help="also stratify by this period of the time field")
+    parser.add_argument('--time-field', default='timestamp')
+    parser.add_argument('--start', help="population start, inclusive ISO date or timestamp")
+    parser.add_argument('--end', help="population end, exclusive ISO date or timestamp")
+    parser.add_argument('--seed', type=int, help="seed for a reproducible sample")
+    parser.add_argument('--output-dir', type=Path, default=Path("./audit_samples"))
+    parser.add_argument('--name', help="output file name stem (default: first source's)")
+    args = parser.parse_args()
+
+    sampler = StratifiedSampler(args.per_stratum, args.stratify, args.period,
+                                args.time_field, args.seed, args.start, args.end)
+    for path in args.paths:
+        sampler.add_all(iter_population(path, start=args.start, end=args.end))
+
+    name = args.name or args.paths[0].name.split('.')[0]
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    result = write_evidence(args.output_dir / f"{name}_sample.json", sampler.sample())
+    report_path = args.output_dir / f"{name}_sample_methodology.md"
+    report_path.write_text(methodology_report(sampler, [str(path) for path in args.paths],
+                                              result.path))
+    print(f"Sampled {result.records} of {sampler.population} records "
+          f"from {len(sampler.strata)} strata: {result.path}")
+    print(f"Methodology: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Diurnal and weekday activity model for log timestamps
+
+Activity follows an hour-of-week rate curve chosen by department: office
+staff work weekday business hours, engineering runs late and on-call teams
+never fully stop. Timestamps come from a non-homogeneous Poisson process by
+time-warping: ordered arrivals are drawn on the cumulative activity scale
+(cumulative inter-arrival times) and mapped back through the inverse of the
+cumulative rate, so every stream is generated in order and never sorted.
+"""
+
+import bisect
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# Relative activity by hour of day (0-23) and by weekday (Monday first)
+PROFILES = {
+    'office': (
+        [0.05, 0.03, 0.03, 0.03, 0.03, 0.05, 0.1, 0.3, 0.8, 1.0, 1.0, 1.0,
+         0.7, 1.0, 1.0, 1.0, 0.9, 0.7, 0.35, 0.15, 0.12, 0.1, 0.08, 0.06],
+        [1.0, 1.0, 1.0, 1.0, 0.9, 0.12, 0.08],
+    ),
+    'extended': (
+        [0.15, 0.1, 0.05, 0.03, 0.03, 0.03, 0.05, 0.1, 0.3, 0.6, 0.9, 1.0,
+         0.8, 1.0, 1.0, 1.0, 1.0, 0.9, 0.7, 0.5, 0.4, 0.35, 0.3, 0.2],
+        [1.0, 1.0, 1.0, 1.0, 0.85, 0.2, 0.2],
+    ),
+    'on_call': (
+        [0.35, 0.3, 0.3, 0.3, 0.3, 0.35, 0.5, 0.7, 0.9, 1.0, 1.0, 1.0,
+         0.9, 1.0, 1.0, 1.0, 1.0, 0.9, 0.7, 0.6, 0.5, 0.45, 0.4, 0.4],
+        [1.0, 1.0, 1.0, 1.0, 1.0, 0.6, 0.6],
+    ),
+    'uniform': ([1.0] * 24, [1.0] * 7),
+}
+
+DEPARTMENT_PROFILES = {
+    'Engineering': 'extended',
+    'Product': 'extended',
+    'Operations': 'on_call',
+    'Security': 'on_call',
+}
+
+DEFAULT_PROFILE = 'office'
+
+
+def department_profile(department: str) -> str:
+    """Name of the activity profile used for a department"""
+    return DEPARTMENT_PROFILES.get(department, DEFAULT_PROFILE)
+
+
+class ActivityCurve:
+    """Cumulative activity of one profile over a time window
+
+    knots are seconds from start at every hour boundary in the window, and
+    cumulative is the share of the window's activity before each knot,
+    rising piecewise linearly from 0 to 1.
+    """
+
+    __slots__ = ('start', 'end', 'knots', 'cumulative')
+
+    def __init__(self, profile: str, start: datetime, end: datetime):
+        hourly, weekday = PROFILES[profile]
+        self.start = start
+        self.end = end
+        span = (end - start).total_seconds()
+        boundary = start.replace(minute=0, second=0, microsecond=0)
+        knots = [0.0]
+        masses = []
+        while knots[-1] < span:
+            rate = hourly[boundary.hour] * weekday[boundary.weekday()]
+            boundary += timedelta(hours=1)
+            knot = min((boundary - start).total_seconds(), span)
+            masses.append(rate * (knot - knots[-1]))
+            knots.append(knot)
+        total = sum(masses) or 1.0
+        cumulative = [0.0]
+        for mass in masses:
+            cumulative.append(cumulative[-1] + mass / total)
+        cumulative[-1] = 1.0
+        self.knots = knots
+        self.cumulative = cumulative
+
+    def offset(self, fraction: float) -> float:
+        """Seconds from start by which fraction of the activity has happened"""
+        cumulative = self.cumulative
+        i = min(bisect.bisect_right(cumulative, fraction), len(cumulative) - 1)
+        low, high = cumulative[i - 1], cumulative[i]
+        start, end = self.knots[i - 1], self.knots[i]
+        if high <= low:
+            return start
+        return start + (end - start) * (fraction - low) / (high - low)
+
+
+@lru_cache(maxsize=64)
+def activity_curve(profile: str, start: datetime, end: datetime) -> ActivityCurve:
+    """Shared ActivityCurve for a profile and window"""
+    return ActivityCurve(profile, start, end)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Tests for evidence readers and writers
+"""
+
+from evidence_io import ChunkedEvidenceWriter, iter_records
+
+
+def test_iter_records_skips_records_without_a_time_in_a_range(tmp_path):
+    records = [
+        {'timestamp': '2026-01-01T09:00:00', 'action': 'login'},
+        {'action': 'logout'},
+        {'timestamp': None, 'action': 'login'},
+        {'timestamp': '2026-01-02T09:00:00', 'action': 'logout'},
+    ]
+    with ChunkedEvidenceWriter(tmp_path / 'access_logs', 'access_logs', 'timestamp',
+                               max_rows=2) as writer:
+        for record in records:
+            writer.write(record)
+
+    assert list(iter_records(tmp_path / 'access_logs')) == records
+    assert list(iter_records(tmp_path / 'access_logs', start='2026-01-01')) == \
+        [records[0], records[3]]
+    assert list(iter_records(tmp_path / 'access_logs', end='2026-01-01T12:00:00')) == \
+        [records[0]]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental generation's watermark state
+"""
+
+import json
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+
+from evidence_state import scale_activity
+from generate_evidence import LOG_EVIDENCE_TYPES, run_incremental
+
+START = datetime(2026, 1, 5)
+
+
+def dataset_rows(output_dir, evidence_type):
+    with open(output_dir / evidence_type / 'manifest.json') as f:
+        return json.load(f)['rows']
+
+
+def test_scale_activity_keeps_fractional_rate():
+    assert scale_activity((50, 200), 1 / 2160) == pytest.approx((50 / 2160, 200 / 2160))
+
+
+@pytest.mark.parametrize('engine', ['faker', 'numpy'])
+def test_short_runs_add_up_to_one_long_run(tmp_path, engine):
+    hourly = tmp_path / 'hourly'
+    run_incremental(hourly, days=90, engine=engine, seed=7, employee_count=50, now=START)
+    daily = tmp_path / 'daily'
+    shutil.copytree(hourly, daily)
+    initial = {evidence_type: dataset_rows(hourly, evidence_type)
+               for evidence_type in LOG_EVIDENCE_TYPES}
+
+    for hour in range(1, 25):
+        run_incremental(hourly, engine=engine, now=START + timedelta(hours=hour))
+    run_incremental(daily, engine=engine, now=START + timedelta(days=1))
+
+    for evidence_type, (low, high) in LOG_EVIDENCE_TYPES.items():
+        expected = 50 * (low + high) / 2 / 90
+        added_hourly = dataset_rows(hourly, evidence_type) - initial[evidence_type]
+        added_daily = dataset_rows(daily, evidence_type) - initial[evidence_type]
+        assert added_hourly == pytest.approx(expected, rel=0.35)
+        assert added_hourly == pytest.approx(added_daily, rel=0.35)
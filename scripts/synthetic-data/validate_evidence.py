@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Validate the referential integrity and consistency of an evidence set
+
+Every record is streamed once and checked for:
+
+- foreign keys: employee ids in logs and reports, and each employee's
+  manager, must exist in the employee roster (held as a hash set)
+- date ordering: incidents are resolved after being reported, resolution
+  steps fall between the two, reviews precede their next review and log
+  files are in timestamp order
+- enum domains: categorical fields hold values from evidence_schema
+
+Work is split into units (byte ranges of large uncompressed files, whole
+compressed files or chunks, row ranges of columnar datasets) and spread
+over a process pool. Violations are counted per rule, with the first few
+examples of each, in a JSON report:
+
+    python3 validate_evidence.py audit_evidence --workers 8 --report violations.json
+
+The exit status is 1 if any violation was found.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+
+from evidence_io import MANIFEST_FILE, iter_file_records, read_manifest
+from evidence_schema import (
+    ACCESS_ACTIONS, ACCESS_LEVELS, ACCESS_RESOURCES, ACCESS_STATUSES,
+    AUDIT_ACTIONS, AUDIT_OBJECTS, DEPARTMENTS, INCIDENT_SEVERITIES,
+    INCIDENT_TYPES, JOB_TITLES, RISK_CATEGORIES, RISK_IMPACTS,
+    RISK_LIKELIHOODS, RISK_SCORE_RANGE, TIME_FIELDS,
+)
+
+# Uncompressed files larger than this are split into byte ranges
+SPLIT_BYTES = 32 << 20
+# Columnar datasets are split into row ranges of this size
+SPLIT_ROWS = 1 << 20
+
+DEFAULT_MAX_EXAMPLES = 20
+
+_NAME_PATTERN = re.compile(r'^({})(?:_\d{{8}}_\d{{6}})?(?:\.|$)'.format(
+    '|'.join(sorted(TIME_FIELDS, key=len, reverse=True))))
+
+# Time-ordered evidence types whose files must not go backwards in time
+ORDERED_TYPES = ('access_logs', 'audit_trails')
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def _domain(record, field, values, found):
+    value = record.get(field)
+    if value not in values:
+        found.append((f"{field}:domain", f"{field}={value!r}"))
+
+
+def _foreign_key(record, field, employee_ids, found, label=None, nullable=False):
+    value = record.get(field)
+    if value is None and nullable:
+        return
+    if employee_ids is not None and value not in employee_ids:
+        found.append((f"{label or field}:foreign_key", f"{label or field}={value!r}"))
+
+
+def check_employee(record, employee_ids):
+    found = []
+    _domain(record, 'department', DEPARTMENTS, found)
+    _domain(record, 'access_level', ACCESS_LEVELS, found)
+    if record.get('job_title') not in JOB_TITLES.get(record.get('department'), ()):
+        found.append(('job_title:domain', f"job_title={record.get('job_title')!r} "
+                                          f"in {record.get('department')!r}"))
+    _foreign_key(record, 'manager_id', employee_ids, found, nullable=True)
+    if record.get('manager_id') is not None and \
+            record.get('manager_id') == record.get('employee_id'):
+        found.append(('manager_id:self', f"employee_id={record.get('employee_id')!r}"))
+    return found
+
+
+def check_access_log(record, employee_ids):
+    found = []
+    _foreign_key(record, 'employee_id', employee_ids, found)
+    _domain(record, 'action', ACCESS_ACTIONS, found)
+    _domain(record, 'resource', ACCESS_RESOURCES, found)
+    _domain(record, 'status', ACCESS_STATUSES, found)
+    return found
+
+
+def check_audit_trail(record, employee_ids):
+    found = []
+    _foreign_key(record, 'employee_id', employee_ids, found)
+    _domain(record, 'action', AUDIT_ACTIONS, found)
+    _domain(record, 'object_type', AUDIT_OBJECTS, found)
+    try:
+        changes = json.loads(record.get('changes'))
+    except (TypeError, ValueError):
+        changes = None
+    if not isinstance(changes, dict) or set(changes) != {'old_value', 'new_value'}:
+        found.append(('changes:format', f"changes={record.get('changes')!r}"))
+    return found
+
+
+def check_incident(record, employee_ids):
+    found = []
+    _foreign_key(record, 'reported_by', employee_ids, found)
+    _domain(record, 'incident_type', INCIDENT_TYPES, found)
+    _domain(record, 'severity', INCIDENT_SEVERITIES, found)
+    reported = _iso(record.get('reported_date'))
+    resolved = _iso(record.get('resolved_date'))
+    if reported and resolved and resolved < reported:
+        found.append(('resolved_date:before_reported_date',
+                      f"reported {reported}, resolved {resolved}"))
+    previous = None
+    for step in record.get('resolution_steps') or []:
+        _foreign_key(step, 'completed_by', employee_ids, found,
+                     label='resolution_steps.completed_by')
+        completed = _iso(step.get('completed_at'))
+        if completed and ((reported and completed < reported) or
+                          (resolved and completed > resolved)):
+            found.append(('resolution_steps.completed_at:outside_incident',
+                          f"completed {completed}, incident {reported} to {resolved}"))
+        if completed and previous and completed < previous:
+            found.append(('resolution_steps.completed_at:out_of_order',
+                          f"{step.get('step')} completed {completed} after {previous}"))
+        previous = completed or previous
+    return found
+
+
+def check_risk(record, employee_ids):
+    found = []
+    _domain(record, 'category', RISK_CATEGORIES, found)
+    _domain(record, 'likelihood', RISK_LIKELIHOODS, found)
+    _domain(record, 'impact', RISK_IMPACTS, found)
+    score = record.get('risk_score')
+    low, high = RISK_SCORE_RANGE
+    if not isinstance(score, (int, float)) or not low <= score <= high:
+        found.append(('risk_score:range', f"risk_score={score!r}"))
+    for plan in record.get('mitigation_plans') or []:
+        _foreign_key(plan, 'owner', employee_ids, found, label='mitigation_plans.owner')
+    review = _iso(record.get('review_date'))
+    next_review = _iso(record.get('next_review_date'))
+    if review and next_review and next_review < review:
+        found.append(('next_review_date:before_review_date',
+                      f"review {review}, next review {next_review}"))
+    return found
+
+
+CHECKS = {
+    'employees': check_employee,
+    'access_logs': check_access_log,
+    'audit_trails': check_audit_trail,
+    'incident_reports': check_incident,
+    'risk_assessment_reports': check_risk,
+}
+
+
+def evidence_type_of(path: Path):
+    """Evidence type of a file or dataset named like access_logs_20251015_191616.json"""
+    match = _NAME_PATTERN.match(path.name)
+    return match.group(1) if match else None
+
+
+def _line_per_record(path: Path) -> bool:
+    """Whether an uncompressed file holds one record per line (as written by
+    EvidenceWriter) rather than indented JSON"""
+    with open(path, 'rb') as f:
+        first = f.readline().strip()
+        if first.startswith(b'{'):
+            return True
+        second = f.readline().strip()
+    return first == b'[' and (not second or second == b']' or
+                              (second.startswith(b'{') and second.rstrip(b',').endswith(b'}')))
+
+
+def _file_units(evidence_type: str, path: Path):
+    if path.suffix in ('.json', '.ndjson') and _line_per_record(path):
+        size = path.stat().st_size
+        return [('lines', evidence_type, str(path), start, min(start + SPLIT_BYTES, size))
+                for start in range(0, max(size, 1), SPLIT_BYTES)]
+    return [('file', evidence_type, str(path))]
+
+
+def plan_units(paths):
+    """(units, roster files, skipped paths) for evidence files, chunked or
+    columnar datasets, and directories holding any of them"""
+    units, rosters, skipped = [], [], []
+    pending = [Path(path) for path in paths]
+    while pending:
+        path = pending.pop(0)
+        if path.name.startswith('.') or path.name.endswith('.index'):
+            continue
+        if path.is_dir() and (path / MANIFEST_FILE).exists():
+            manifest = read_manifest(path)
+            evidence_type = manifest['evidence_type']
+            for chunk in manifest['chunks']:
+                units.extend(_file_units(evidence_type, path / chunk['file']))
+                if evidence_type == 'employees':
+                    rosters.append(path / chunk['file'])
+        elif path.is_dir() and (path / 'meta.json').exists():
+            with open(path / 'meta.json') as f:
+                meta = json.load(f)
+            units.extend(('columnar', meta['evidence_type'], str(path), start,
+                          min(start + SPLIT_ROWS, meta['rows']))
+                         for start in range(0, meta['rows'], SPLIT_ROWS))
+        elif path.is_dir():
+            pending.extend(sorted(path.iterdir()))
+        else:
+            evidence_type = evidence_type_of(path)
+            if evidence_type is None:
+                skipped.append(str(path))
+                continue
+            units.extend(_file_units(evidence_type, path))
+            if evidence_type == 'employees':
+                rosters.append(path)
+    return units, rosters, skipped
+
+
+def _iter_lines(path: str, start: int, end: int):
+    """Yield (byte offset, record or None if unparsable) for the lines that
+    start in [start, end)"""
+    with open(path, 'rb') as f:
+        if start:
+            # Finish the line in progress; it belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            offset = position
+            position += len(line)
+            text = line.strip()
+            if text.endswith(b','):
+                text = text[:-1]
+            if not text or text in (b'[', b']'):
+                continue
+            try:
+                yield offset, json.loads(text)
+            except ValueError:
+                yield offset, None
+
+
+def _iter_unit(unit):
+    kind, _, path = unit[:3]
+    if kind == 'lines':
+        yield from _iter_lines(path, unit[3], unit[4])
+    elif kind == 'file':
+        yield from enumerate(iter_file_records(path))
+    else:
+        from evidence_columnar import ColumnarReader
+
+        start, end = unit[3], unit[4]
+        yield from enumerate(ColumnarReader(path).records(slice(start, end)), start)
+
+
+# Roster employee ids for the current worker process, set by init_worker
+_employee_ids = None
+
+
+def init_worker(employee_ids):
+    """Process pool initializer: receive the roster's id set once per worker"""
+    global _employee_ids
+    _employee_ids = employee_ids
+
+
+def validate_unit(unit, max_examples: int = DEFAULT_MAX_EXAMPLES) -> dict:
+    """Check every record of one unit of work"""
+    kind, evidence_type, path = unit[:3]
+    check = CHECKS[evidence_type]
+    time_field = TIME_FIELDS[evidence_type] if evidence_type in ORDERED_TYPES else None
+    counts = Counter()
+    examples = []
+    rows = 0
+    first = last = None
+
+    def violation(rule, location, detail):
+        counts[rule] += 1
+        if counts[rule] <= max_examples:
+            examples.append({'evidence_type': evidence_type, 'path': path,
+                             'location': location, 'rule': rule, 'detail': detail})
+
+    location_name = 'offset' if kind == 'lines' else 'row' if kind == 'columnar' else 'record'
+    for position, record in _iter_unit(unit):
+        location = {location_name: position}
+        rows += 1
+        if not isinstance(record, dict):
+            violation('record:invalid_json', location, "not a JSON object")
+            continue
+        for rule, detail in check(record, _employee_ids):
+            violation(rule, location, detail)
+        if time_field:
+            timestamp = _iso(record.get(time_field))
+            if last is not None and timestamp is not None and timestamp < last:
+                violation(f"{time_field}:out_of_order", location,
+                          f"{timestamp} after {last}")
+            if timestamp is not None:
+                first = first or timestamp
+                last = timestamp
+    return {'unit': unit, 'rows': rows, 'counts': dict(counts), 'examples': examples,
+            'first': first, 'last': last}
+
+
+def load_roster(paths):
+    """Employee id set from roster files, plus duplicate-id violations"""
+    employee_ids = set()
+    duplicates = []
+    for path in paths:
+        for position, record in enumerate(iter_file_records(path)):
+            employee_id = record.get('employee_id')
+            if employee_id in employee_ids:
+                duplicates.append({'evidence_type': 'employees', 'path': str(path),
+                                   'location': {'record': position},
+                                   'rule': 'employee_id:duplicate',
+                                   'detail': f"employee_id={employee_id!r}"})
+            employee_ids.add(employee_id)
+    return frozenset(employee_ids), duplicates
+
+
+def validate(paths, roster=None, workers: int = 1,
+             max_examples: int = DEFAULT_MAX_EXAMPLES) -> dict:
+    """Validate evidence files and datasets and return the violation report"""
+    units, rosters, skipped = plan_units(paths)
+    if roster is not None:
+        rosters = [Path(roster)]
+    employee_ids, duplicates = load_roster(rosters) if rosters else (None, [])
+
+    if workers > 1 and len(units) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(employee_ids,)) as pool:
+            results = list(pool.map(validate_unit, units,
+                                    [max_examples] * len(units)))
+    else:
+        init_worker(employee_ids)
+        results = [validate_unit(unit, max_examples) for unit in units]
+
+    rules = {}
+    examples = list(duplicates[:max_examples])
+    if duplicates:
+        rules.setdefault('employees', Counter())['employee_id:duplicate'] = len(duplicates)
+    kept = Counter()
+    previous = {}
+    datasets = {}
+    for result in results:
+        kind, evidence_type, path = result['unit'][:3]
+        # Chunks of a dataset share one order; units come in manifest order
+        dataset = datasets.get(path)
+        if dataset is None:
+            parent = Path(path).parent
+            dataset = datasets[path] = str(parent) if (parent / MANIFEST_FILE).exists() \
+                else path
+        counts = rules.setdefault(evidence_type, Counter())
+        counts.update(result['counts'])
+        for example in result['examples']:
+            key = (evidence_type, example['rule'])
+            if kept[key] < max_examples:
+                kept[key] += 1
+                examples.append(example)
+        # Ranges and chunks are validated apart; check order across them
+        last = previous.get(dataset)
+        if last is not None and result['first'] is not None and result['first'] < last:
+            time_field = TIME_FIELDS[evidence_type]
+            counts[f"{time_field}:out_of_order"] += 1
+            examples.append({'evidence_type': evidence_type, 'path': path,
+                             'location': {'offset': result['unit'][3]}
+                             if kind == 'lines' else {},
+                             'rule': f"{time_field}:out_of_order",
+                             'detail': f"{result['first']} after {last}"})
+        if result['last'] is not None:
+            previous[dataset] = result['last']
+
+    violations = sum(sum(counts.values()) for counts in rules.values())
+    return {
+        'valid': violations == 0,
+        'records': sum(result['rows'] for result in results),
+        'violations': violations,
+        'roster': [str(path) for path in rosters] or None,
+        'units': len(units),
+        'skipped': skipped,
+        'rules': {evidence_type: dict(sorted(counts.items()))
+                  for evidence_type, counts in sorted(rules.items()) if counts},
+        'examples': examples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a synthetic evidence set")
+    parser.add_argument('paths', type=Path, nargs='*', default=[Path("./audit_evidence")],
+                        help="evidence files, datasets or directories (default: ./audit_evidence)")
+    parser.add_argument('--roster', type=Path,
+                        help="employees evidence file (default: the one found among paths)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="processes to validate with")
+    parser.add_argument('--max-examples', type=int, default=DEFAULT_MAX_EXAMPLES,
+                        help="examples kept per rule")
+    parser.add_argument('--report', type=Path,
+                        help="write the violation report to this JSON file")
+    args = parser.parse_args()
+
+    report = validate(args.paths, args.roster, args.workers, args.max_examples)
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2) + '\n')
+
+    if report['roster'] is None:
+        print("No employees roster found; foreign keys were not checked")
+    print(f"Validated {report['records']} records in {report['units']} units: "
+          f"{report['violations']} violations")
+    for evidence_type, counts in report['rules'].items():
+        for rule, count in counts.items():
+            print(f"  {evidence_type} {rule}: {count}")
+    sys.exit(0 if report['valid'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Pre-generated pools of Faker values for bulk evidence generation
+
+Free text, IP addresses and names are the most expensive Faker
+calls per row, yet their realism hardly matters in bulk. Each pool is generated
+once, cached on disk and then sampled by index.
+
+Importing Faker alone takes longer than a short run, so it is only imported
+when values really have to be generated, and then restricted to one locale
+and the providers used here.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+DEFAULT_POOL_SIZE = 4096
+DEFAULT_CACHE_DIR = Path(os.environ.get(
+    'EVIDENCE_POOL_CACHE', Path.home() / '.cache' / 'saasx-evidence'))
+
+FAKER_LOCALE = 'en_US'
+
+# Every Faker provider the evidence generators call
+FAKER_PROVIDERS = ('date_time', 'internet', 'lorem', 'misc', 'person')
+
+# Pool name -> Faker call that produces one value
+POOL_FIELDS = {
+    'details': lambda fake: fake.text(max_nb_chars=100),
+    'change_values': lambda fake: fake.text(max_nb_chars=50),
+    'ipv4': lambda fake: fake.ipv4(),
+    'first_names': lambda fake: fake.first_name(),
+    'last_names': lambda fake: fake.last_name(),
+    'user_names': lambda fake: fake.user_name(),
+}
+
+
+def make_faker(seed: int = None):
+    """Faker with only FAKER_LOCALE and FAKER_PROVIDERS, seeded if seed is given"""
+    from faker import Faker
+
+    fake = Faker(FAKER_LOCALE,
+                 providers=[f"faker.providers.{name}" for name in FAKER_PROVIDERS])
+    if seed is not None:
+        fake.seed_instance(seed)
+    return fake
+
+
+def faker_version() -> str:
+    """Installed Faker version, from package metadata rather than an import"""
+    from importlib.metadata import version
+
+    return version('faker')
+
+
+class ValuePools:
+    """Fixed-size pools of Faker values, cached between runs
+
+    Pools depend only on size, seed and the Faker version, so every run with
+    the same settings samples from identical values. Pass cache_dir=None to
+    skip the disk cache.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE,
+                 cache_dir=DEFAULT_CACHE_DIR, seed: int = 0):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.size = size
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.seed = seed
+        self._pools = None
+
+    def __getitem__(self, name: str) -> list:
+        return self.pools[name]
+
+    @property
+    def pools(self) -> dict:
+        if self._pools is None:
+            self._pools = self._load() or self._build()
+        return self._pools
+
+    @property
+    def cache_path(self):
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / \
+            f"value_pools-faker{faker_version()}-seed{self.seed}-n{self.size}.json"
+
+    def _load(self):
+        path = self.cache_path
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path) as f:
+                pools = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if set(pools) != set(POOL_FIELDS) or any(len(values) != self.size
+                                                 for values in pools.values()):
+            return None
+        return pools
+
+    def _build(self) -> dict:
+        fake = make_faker(self.seed)
+        pools = {name: [make(fake) for _ in range(self.size)]
+                 for name, make in POOL_FIELDS.items()}
+        self._save(pools)
+        return pools
+
+    def _save(self, pools: dict):
+        path = self.cache_path
+        if path is None:
+            return
+        # The cache is an optimisation; an unwritable location is not fatal
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(pools, f)
+            os.replace(tmp_name, path)
+        except OSError:
+            os.unlink(tmp_name)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the issue sync engines against the bundled fake GitHub server
+"""
+
+import argparse
+import asyncio
+import json
+from collections import Counter
+
+import pytest
+
+from fake_github_server import FakeGitHub
+from generate_all_issues import ISSUES, dry_run
+from issue_sync import sync_issues
+from request_scheduler import RateLimiter
+
+# (calls, writes, listing pages) of a first sync into an empty repository:
+# the REST engine lists issues, labels and milestones once and creates 19
+# labels, 3 milestones and 21 issues one request each; the GraphQL engine
+# resolves IDs in one query, again after provisioning, and creates the
+# issues in 3 batches
+FIRST_SYNC = {
+    "rest": (48, 43, 3),
+    "graphql": (28, 25, 2),
+}
+
+
+def sync(github, backend, state_path):
+    result, client = asyncio.run(sync_issues(
+        "token", github.repo, ISSUES, github.url, 8, False, None, None, RateLimiter(),
+        state_path, backend))
+    client.close()
+    return result
+
+
+def titles(github):
+    return Counter(issue["title"] for issue in github.issues)
+
+
+@pytest.mark.parametrize("backend", ["rest", "graphql"])
+def test_sync_creates_every_issue_then_reruns_without_writes(tmp_path, backend):
+    state_path = tmp_path / "state.json"
+    with FakeGitHub() as github:
+        result = sync(github, backend, state_path)
+        traffic = github.reset_traffic()
+
+        assert len(result.created) == len(ISSUES)
+        assert not result.failed
+        assert (traffic["calls"], traffic["writes"], traffic["pages"]) == FIRST_SYNC[backend]
+        assert titles(github) == Counter(issue["title"] for issue in ISSUES)
+
+        result = sync(github, backend, state_path)
+        traffic = github.reset_traffic()
+
+        assert not result.created and not result.failed
+        assert len(result.skipped) == len(ISSUES)
+        assert traffic["writes"] == 0
+        assert max(titles(github).values()) == 1
+
+
+def test_sync_without_state_skips_existing_titles():
+    with FakeGitHub() as github:
+        sync(github, "rest", None)
+        github.reset_traffic()
+        result = sync(github, "rest", None)
+
+        assert len(result.skipped) == len(ISSUES)
+        assert github.reset_traffic()["writes"] == 0
+        assert len(github.issues) == len(ISSUES)
+
+
+@pytest.fixture(scope="module")
+def dry_run_report(tmp_path_factory):
+    report = tmp_path_factory.mktemp("dry_run") / "report.json"
+    args = argparse.Namespace(
+        label=None, since=None, engine="async", batch_size=10, concurrency=8, ordered=False,
+        state=None, no_state=False, reserve=0, max_retries=5, api_url=None,
+        repo="saasx-soc2-certification", dry_run=True, latency=0.0, existing=150,
+        report=report)
+    assert dry_run(args, args.repo) == 0
+    return {row["strategy"]: row for row in json.loads(report.read_text())["strategies"]}
+
+
+@pytest.mark.parametrize("strategy, calls, writes, pages", [
+    # 150 unrelated issues put the issue listing on a second page
+    ("pygithub", 49, 43, 4),
+    ("async", 49, 43, 4),
+    ("graphql", 29, 25, 3),
+    ("async rerun", 3, 0, 1),
+])
+def test_dry_run_accounts_each_strategy(dry_run_report, strategy, calls, writes, pages):
+    row = dry_run_report[strategy]
+    assert row["ok"]
+    assert (row["calls"], row["writes"], row["pages"]) == (calls, writes, pages)
+    assert row["bytes_in"] > 0 and row["bytes_out"] > 0